@@ -0,0 +1,576 @@
+# -*- coding: utf-8 -*-
+"""
+In-process stand-in for the Pi-hole v6 API.
+
+Implements the endpoints the collection uses (auth, groups, clients, lists,
+domains, configuration sections, DHCP leases, gravity and teleporter) on a
+threaded HTTP server, keeps its state in memory and counts every request.
+It is meant for measuring the modules, not for checking Pi-hole semantics:
+validation is minimal and responses carry only the fields the modules read.
+
+Start it from Python:
+
+    server = FakePihole(latency=0.005)
+    url = server.start()
+    ...
+    print(server.stats())
+    server.stop()
+
+or standalone:
+
+    python benchmarks/fake_pihole.py --port 8081 --latency 0.005
+"""
+
+import argparse
+import copy
+import importlib.util
+import io
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import zipfile
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+DEFAULT_PASSWORD = 'benchmark'
+
+STATS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'plugins', 'module_utils', 'stats.py')
+
+
+def _load_stats():
+    # stats.py has no dependencies, so it is loaded from the tree without installing the collection
+    spec = importlib.util.spec_from_file_location('pihole_stats', STATS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# The same endpoint keys as the api_stats the modules return
+endpoint_template = _load_stats().endpoint_template
+
+EMPTY_STATE = {
+    'groups': [{'id': 0, 'name': 'Default', 'comment': 'The default group', 'enabled': True}],
+    'clients': [],
+    'lists': [],
+    'domains': [],
+    'config': {
+        'dns': {'hosts': [], 'cnameRecords': [], 'listeningMode': 'LOCAL'},
+        'dhcp': {
+            'active': False, 'start': '', 'end': '', 'router': '', 'netmask': '', 'leaseTime': '',
+            'ipv6': False, 'rapidCommit': False, 'multiDNS': False, 'ignoreUnknownClients': False, 'hosts': [],
+        },
+    },
+    'leases': [],
+    'devices': [],
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakePihole/6'
+    # Headers and body are separate writes; without this every keep-alive response waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    # Every verb goes through the same dispatcher
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _send(self, code, obj=None, raw=None, content_type='application/json'):
+        body = raw if raw is not None else (json.dumps(obj).encode() if obj is not None else b'')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.pihole._count_out(len(body))
+
+    def _handle(self, method):
+        pihole = self.server.pihole
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        pihole._count_in(len(raw) + len(self.path))
+
+        if not url.path.startswith('/api/'):
+            return self._send(404, {'error': {'key': 'not_found'}})
+        parts = [unquote(part) for part in url.path[len('/api/'):].split('/') if part]
+        if not parts:
+            return self._send(404, {'error': {'key': 'not_found'}})
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        body = None
+        if raw and 'multipart' not in (self.headers.get('Content-Type') or ''):
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                return self._send(400, {'error': {'key': 'bad_request', 'message': 'Invalid JSON'}})
+
+        if pihole.latency:
+            time.sleep(pihole.latency)
+
+        pihole._count_call(method, url.path[len('/api/'):])
+        if parts[0] == 'auth':
+            return self._auth(method, body)
+        if not pihole._valid_sid(self.headers.get('X-FTL-SID')):
+            return self._send(401, {'error': {'key': 'unauthorized', 'message': 'Unauthorized'}})
+
+        if parts[0] == 'action' and parts[1:] == ['gravity']:
+            return self._gravity()
+        with pihole.lock:
+            code, obj, rawout, content_type = pihole.route(method, parts, query, body, raw)
+        if rawout is not None:
+            return self._send(code, raw=rawout, content_type=content_type)
+        return self._send(code, obj)
+
+    def _auth(self, method, body):
+        pihole = self.server.pihole
+        if method == 'POST':
+            if not body or body.get('password') != pihole.password:
+                return self._send(401, {'session': {'valid': False, 'message': 'password incorrect'}})
+            sid = pihole._login()
+            return self._send(200, {'session': {'valid': True, 'sid': sid, 'csrf': secrets.token_hex(8),
+                                                'validity': pihole.validity, 'message': 'password correct'}})
+        if method == 'DELETE':
+            pihole._logout(self.headers.get('X-FTL-SID'))
+            return self._send(204)
+        return self._send(200, {'session': {'valid': pihole._valid_sid(self.headers.get('X-FTL-SID'))}})
+
+    def _gravity(self):
+        pihole = self.server.pihole
+        with pihole.lock:
+            targets = [item['address'] for item in pihole.state['lists'] if item['enabled']]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        lines = ['  [i] Neutrino emissions detected...']
+        for address in targets:
+            lines += [f'  [i] Target: {address}', '  [✓] Status: Retrieval successful']
+        lines += [f'  [i] Number of gravity domains: {1000 * len(targets)} ({900 * len(targets)} unique domains)',
+                  '  [✓] Done.']
+        delay = pihole.gravity_seconds / max(1, len(lines))
+        for line in lines:
+            if delay:
+                time.sleep(delay)
+            chunk = (line + '\n').encode()
+            self.wfile.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+            pihole._count_out(len(chunk))
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class FakePihole:
+    """
+    A fake Pi-hole v6 instance served from a background thread.
+
+    Args:
+        password: The API password
+        latency: Seconds added to every request
+        gravity_seconds: Duration of a gravity run
+        batch: Whether the :batchDelete endpoints exist
+        port: Port to listen on, 0 for any free port
+    """
+
+    def __init__(self, password=DEFAULT_PASSWORD, latency=0.0, gravity_seconds=0.0, batch=True, port=0):
+        self.password = password
+        self.latency = latency
+        self.gravity_seconds = gravity_seconds
+        self.batch = batch
+        self.port = port
+        self.validity = 1800
+        self.lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.reset()
+
+    # Lifecycle
+
+    def start(self):
+        """Start serving and return the instance URL."""
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.pihole = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def reset(self):
+        """Drop all state, sessions and counters."""
+        with self.lock:
+            self.state = copy.deepcopy(EMPTY_STATE)
+            self.sessions = {}
+            self._next_id = 1
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.calls = Counter()
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.logins = 0
+
+    def stats(self):
+        """
+        Return the counters since the last reset.
+
+        Returns:
+            dict: calls (total, logins excluded), logins, bytes_in, bytes_out
+                  and by_endpoint ('METHOD endpoint' -> count)
+        """
+        with self._stats_lock:
+            by_endpoint = dict(sorted(self.calls.items()))
+            return dict(
+                calls=sum(count for key, count in by_endpoint.items() if not key.endswith(' auth')),
+                logins=self.logins,
+                bytes_in=self.bytes_in,
+                bytes_out=self.bytes_out,
+                by_endpoint=by_endpoint,
+            )
+
+    # Seeding
+
+    def seed(self, groups=(), clients=(), lists=(), domains=(), hosts=(), cnames=(), leases=(), devices=()):
+        """
+        Add items directly to the state, without going through the API.
+
+        groups, clients, lists and domains take dicts with the fields of the
+        API objects (ids are assigned); hosts and cnames take the raw
+        dns.hosts and dns.cnameRecords strings.
+        """
+        with self.lock:
+            for group in groups:
+                self.state['groups'].append(self._new(group, comment=None, enabled=True))
+            for item in clients:
+                self.state['clients'].append(self._new(item, comment=None, groups=[0]))
+            for item in lists:
+                self.state['lists'].append(self._new(item, comment=None, groups=[0], enabled=True, type='block'))
+            for item in domains:
+                self.state['domains'].append(self._new(item, comment=None, groups=[0], enabled=True))
+            self.state['config']['dns']['hosts'].extend(hosts)
+            self.state['config']['dns']['cnameRecords'].extend(cnames)
+            self.state['leases'].extend(copy.deepcopy(list(leases)))
+            self.state['devices'].extend(copy.deepcopy(list(devices)))
+
+    # Internals
+
+    def _new(self, item, **defaults):
+        self._next_id += 1
+        now = int(time.time())
+        return dict(defaults, id=self._next_id, date_added=now, date_modified=now, **item)
+
+    def _count_in(self, size):
+        with self._stats_lock:
+            self.bytes_in += size
+
+    def _count_out(self, size):
+        with self._stats_lock:
+            self.bytes_out += size
+
+    def _count_call(self, method, endpoint):
+        with self._stats_lock:
+            self.calls[f'{method} {endpoint_template(method, endpoint)}'] += 1
+
+    def _login(self):
+        sid = secrets.token_urlsafe(18)
+        with self._stats_lock:
+            self.logins += 1
+        with self.lock:
+            self.sessions[sid] = time.time()
+        return sid
+
+    def _logout(self, sid):
+        with self.lock:
+            self.sessions.pop(sid, None)
+
+    def _valid_sid(self, sid):
+        with self.lock:
+            started = self.sessions.get(sid)
+            if started is None:
+                return False
+            self.sessions[sid] = time.time()
+            return True
+
+    def route(self, method, parts, query, body, raw):
+        """
+        Handle one authenticated request.
+
+        Returns:
+            tuple: (status, JSON object, raw body or None, content type)
+        """
+        head = parts[0]
+        name = head.split(':')[0]
+        handler = getattr(self, f'_route_{name}', None)
+        if handler is None:
+            return 404, {'error': {'key': 'not_found', 'message': 'Not found'}}, None, None
+        if head.endswith(':batchDelete'):
+            if not self.batch:
+                return 404, {'error': {'key': 'not_found', 'message': 'Not found'}}, None, None
+            return self._batch_delete(name, body or [])
+        return handler(method, parts, query, body, raw)
+
+    @staticmethod
+    def _ok(obj=None, code=200):
+        return code, obj, None, None
+
+    @staticmethod
+    def _processed(items):
+        return {'success': [{'item': item} for item in items], 'errors': []}
+
+    def _batch_delete(self, name, items):
+        collection = self.state[name]
+        if name == 'groups':
+            names = {entry['item'] if isinstance(entry, dict) else entry for entry in items}
+            collection[:] = [group for group in collection if group['name'] not in names]
+        elif name == 'clients':
+            names = {entry['item'] for entry in items}
+            collection[:] = [item for item in collection if item['client'] not in names]
+        elif name == 'lists':
+            keys = {(entry['item'], entry.get('type')) for entry in items}
+            collection[:] = [item for item in collection if (item['address'], item['type']) not in keys]
+        elif name == 'domains':
+            keys = {(entry['item'], entry['type'], entry['kind']) for entry in items}
+            collection[:] = [item for item in collection if (item['domain'], item['type'], item['kind']) not in keys]
+        return self._ok(code=204)
+
+    def _route_groups(self, method, parts, query, body, raw):
+        return self._named('groups', 'name', method, parts, body, defaults=dict(comment=None, enabled=True))
+
+    def _route_clients(self, method, parts, query, body, raw):
+        return self._named('clients', 'client', method, parts, body, defaults=dict(comment=None, groups=[0]))
+
+    def _named(self, collection_name, key, method, parts, body, defaults):
+        collection = self.state[collection_name]
+        item_name = parts[1] if len(parts) > 1 else None
+        if method == 'GET':
+            items = collection if item_name is None else [item for item in collection if item[key] == item_name]
+            return self._ok({collection_name: items})
+        if method == 'POST':
+            names = body[key] if isinstance(body[key], list) else [body[key]]
+            existing = {item[key] for item in collection}
+            created = []
+            for new_name in names:
+                if new_name in existing:
+                    continue
+                fields = {field: body.get(field, default) for field, default in defaults.items()}
+                if collection_name == 'clients' and not fields['groups']:
+                    fields['groups'] = [0]
+                created.append(self._new({key: new_name}, **fields))
+            collection.extend(created)
+            return self._ok({collection_name: created, 'processed': self._processed(names)}, 201)
+        if method == 'PUT':
+            for item in collection:
+                if item[key] == item_name:
+                    item.update((field, body.get(field, item.get(field))) for field in defaults)
+                    if key == 'name' and body.get('name'):
+                        item['name'] = body['name']
+                    item['date_modified'] = int(time.time())
+                    return self._ok({collection_name: [item], 'processed': self._processed([item_name])})
+            return 404, {'error': {'key': 'not_found'}}, None, None
+        if method == 'DELETE':
+            collection[:] = [item for item in collection if item[key] != item_name]
+            return self._ok(code=204)
+        return 405, {'error': {'key': 'method_not_allowed'}}, None, None
+
+    def _route_lists(self, method, parts, query, body, raw):
+        collection = self.state['lists']
+        list_type = query.get('type')
+        address = parts[1] if len(parts) > 1 else None
+
+        def matches(item):
+            return (list_type is None or item['type'] == list_type) and (address is None or item['address'] == address)
+
+        if method == 'GET':
+            return self._ok({'lists': [item for item in collection if matches(item)]})
+        if method == 'POST':
+            addresses = body['address'] if isinstance(body['address'], list) else [body['address']]
+            existing = {(item['address'], item['type']) for item in collection}
+            created = [
+                self._new({'address': new}, type=list_type, comment=body.get('comment'),
+                          groups=body.get('groups') or [0], enabled=body.get('enabled', True))
+                for new in addresses if (new, list_type) not in existing
+            ]
+            collection.extend(created)
+            return self._ok({'lists': created, 'processed': self._processed(addresses)}, 201)
+        if method == 'PUT':
+            for item in collection:
+                if matches(item):
+                    item.update(comment=body.get('comment'), groups=body.get('groups') or [0],
+                                enabled=body.get('enabled', True), date_modified=int(time.time()))
+                    return self._ok({'lists': [item], 'processed': self._processed([address])})
+            return 404, {'error': {'key': 'not_found'}}, None, None
+        if method == 'DELETE':
+            collection[:] = [item for item in collection if not matches(item)]
+            return self._ok(code=204)
+        return 405, {'error': {'key': 'method_not_allowed'}}, None, None
+
+    def _route_domains(self, method, parts, query, body, raw):
+        collection = self.state['domains']
+        domain_type, kind, domain = (parts[1:] + [None, None, None])[:3]
+
+        def matches(item):
+            return ((domain_type is None or item['type'] == domain_type)
+                    and (kind is None or item['kind'] == kind)
+                    and (domain is None or item['domain'] == domain))
+
+        if method == 'GET':
+            return self._ok({'domains': [item for item in collection if matches(item)]})
+        if method == 'POST':
+            domains = body['domain'] if isinstance(body['domain'], list) else [body['domain']]
+            existing = {(item['domain'], item['type'], item['kind']) for item in collection}
+            created = [
+                self._new({'domain': new}, type=domain_type, kind=kind, comment=body.get('comment'),
+                          groups=body.get('groups') or [0], enabled=body.get('enabled', True))
+                for new in domains if (new, domain_type, kind) not in existing
+            ]
+            collection.extend(created)
+            return self._ok({'domains': created, 'processed': self._processed(domains)}, 201)
+        if method == 'PUT':
+            for item in collection:
+                if matches(item):
+                    item.update(comment=body.get('comment'), groups=body.get('groups') or [0],
+                                enabled=body.get('enabled', True), type=body.get('type', item['type']),
+                                kind=body.get('kind', item['kind']), date_modified=int(time.time()))
+                    return self._ok({'domains': [item], 'processed': self._processed([domain])})
+            return 404, {'error': {'key': 'not_found'}}, None, None
+        if method == 'DELETE':
+            collection[:] = [item for item in collection if not matches(item)]
+            return self._ok(code=204)
+        return 405, {'error': {'key': 'method_not_allowed'}}, None, None
+
+    def _route_config(self, method, parts, query, body, raw):
+        config = self.state['config']
+        path = parts[1:]
+        if method == 'GET':
+            node = config
+            for key in path:
+                if not isinstance(node, dict) or key not in node:
+                    return 400, {'error': {'key': 'bad_request', 'message': 'Config item does not exist'}}, None, None
+                node = node[key]
+            for key in reversed(path):
+                node = {key: node}
+            return self._ok({'config': copy.deepcopy(node)})
+        if method == 'PATCH':
+            def merge(target, changes):
+                for key, value in changes.items():
+                    if isinstance(value, dict) and isinstance(target.get(key), dict):
+                        merge(target[key], value)
+                    else:
+                        target[key] = value
+            merge(config, (body or {}).get('config', {}))
+            return self._ok({'config': config})
+        if method in ('PUT', 'DELETE') and len(path) >= 2:
+            node = config
+            for key in path[:-2]:
+                node = node.get(key, {})
+            values = node.get(path[-2])
+            if not isinstance(values, list):
+                return 400, {'error': {'key': 'bad_request', 'message': 'Not an array'}}, None, None
+            value = path[-1]
+            if method == 'PUT':
+                if value in values:
+                    return 400, {'error': {'key': 'bad_request', 'message': 'Item already present'}}, None, None
+                values.append(value)
+                return self._ok({}, 201)
+            if value not in values:
+                return 404, {'error': {'key': 'not_found', 'message': 'Item not found'}}, None, None
+            values.remove(value)
+            return self._ok(code=204)
+        return 405, {'error': {'key': 'method_not_allowed'}}, None, None
+
+    def _route_dhcp(self, method, parts, query, body, raw):
+        leases = self.state['leases']
+        if parts[1:2] != ['leases']:
+            return 404, {'error': {'key': 'not_found'}}, None, None
+        if method == 'GET':
+            return self._ok({'leases': leases})
+        if method == 'DELETE' and len(parts) > 2:
+            before = len(leases)
+            leases[:] = [lease for lease in leases if lease['ip'] != parts[2]]
+            if len(leases) == before:
+                return 404, {'error': {'key': 'not_found', 'message': 'Lease not found'}}, None, None
+            return self._ok(code=204)
+        return 405, {'error': {'key': 'method_not_allowed'}}, None, None
+
+    def _route_network(self, method, parts, query, body, raw):
+        devices = self.state['devices']
+        if parts[1:2] != ['devices']:
+            return 404, {'error': {'key': 'not_found'}}, None, None
+        if method == 'GET':
+            limit = int(query.get('max_devices', len(devices)) or len(devices))
+            return self._ok({'devices': devices[:limit]})
+        return 405, {'error': {'key': 'method_not_allowed'}}, None, None
+
+    def _route_teleporter(self, method, parts, query, body, raw):
+        if method == 'GET':
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr('etc/pihole/pihole.toml',
+                                 f'# Pi-hole configuration file (v6)\n# Last updated on {time.ctime()}\n'
+                                 + json.dumps(self.state['config'], sort_keys=True, indent=2) + '\n')
+                archive.writestr('etc/pihole/gravity.db', json.dumps(
+                    {key: self.state[key] for key in ('groups', 'clients', 'lists', 'domains')}, sort_keys=True))
+                archive.writestr('etc/pihole/dhcp.leases', '\n'.join(
+                    f"{lease.get('expires', 0)} {lease.get('hwaddr', '')} {lease['ip']} {lease.get('name', '*')} *"
+                    for lease in self.state['leases']))
+            return 200, None, buffer.getvalue(), 'application/zip'
+        if method == 'POST':
+            match = re.search(rb'PK\x03\x04.*', raw or b'', re.DOTALL)
+            if not match:
+                return 400, {'error': {'key': 'bad_request', 'message': 'No archive uploaded'}}, None, None
+            return self._ok({'files': ['etc/pihole/pihole.toml', 'etc/pihole/gravity.db'], 'took': 0.01})
+        return 405, {'error': {'key': 'method_not_allowed'}}, None, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a fake Pi-hole v6 API')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--gravity-seconds', type=float, default=0.0, help='duration of a gravity run')
+    parser.add_argument('--no-batch', action='store_true', help='answer the :batchDelete endpoints with 404')
+    args = parser.parse_args()
+
+    server = FakePihole(password=args.password, latency=args.latency, gravity_seconds=args.gravity_seconds,
+                        batch=not args.no_batch, port=args.port)
+    print(f'Serving a fake Pi-hole on {server.start()} (password: {args.password})')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats(), indent=2))
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Scale benchmarks for the modules and roles of the collection.
+
+Every scenario runs a one-task playbook against an in-process FakePihole,
+first from an empty (or seeded) instance and then again on the converged
+instance, at each requested size. For every run the harness records the
+wall time of ansible-playbook, the number of API requests by endpoint, the
+logins and the bytes sent and received.
+
+    python benchmarks/run.py                         # every scenario at 10, 1000 and 10000 items
+    python benchmarks/run.py --sizes 10,100 --scenario groups --scenario pihole_state
+    python benchmarks/run.py --latency 0.005 --output results.json
+
+Requires ansible-core and pihole6api in the running Python environment.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_pihole import DEFAULT_PASSWORD, FakePihole  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SIZES = [10, 1000, 10000]
+
+PHASES = ('apply', 'rerun')
+
+
+def _ip(index, prefix='10'):
+    return f'{prefix}.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}'
+
+
+def _groups(n):
+    return [{'name': f'group-{i}', 'comment': f'Benchmark group {i}', 'state': 'present'} for i in range(n)]
+
+
+def _clients(n):
+    return [{'name': _ip(i), 'comment': f'Client {i}', 'groups': ['Default'], 'state': 'present'} for i in range(n)]
+
+
+def _lists(n, list_type=None):
+    items = [{'address': f'https://lists.example.com/{i}.txt', 'comment': f'List {i}', 'state': 'present'}
+             for i in range(n)]
+    if list_type:
+        for item in items:
+            item['type'] = list_type
+    return items
+
+
+def _records(n):
+    hosts = [{'name': f'host-{i}.bench.lan', 'type': 'A', 'data': _ip(i)} for i in range(n - n // 5)]
+    aliases = [{'name': f'alias-{i}.bench.lan', 'type': 'CNAME', 'data': f'host-{i}.bench.lan'} for i in range(n // 5)]
+    return hosts + aliases
+
+
+def _domains(n):
+    exact = [{'domain': f'ads-{i}.bench.example'} for i in range(n - n // 10)]
+    regex = [{'domain': f'(^|\\.)tracker-{i}\\.example$', 'kind': 'regex'} for i in range(n // 10)]
+    return exact + regex
+
+
+def _reservations(n):
+    return [{'mac': ':'.join(f'{byte:02x}' for byte in (2, 0, i >> 24 & 255, i >> 16 & 255, i >> 8 & 255, i & 255)),
+             'ip': _ip(i, '172'), 'hostname': f'device-{i}'} for i in range(n)]
+
+
+def _state(n):
+    share = max(1, n // 4)
+    lists = _lists(share, 'block')
+    return {
+        'groups': [{'name': group['name'], 'comment': group['comment']} for group in _groups(share)],
+        'clients': [{'name': item['name'], 'comment': item['comment'], 'groups': ['group-0']} for item in _clients(share)],
+        'lists': [dict(item, groups=['group-0']) for item in lists],
+        'records': _records(share),
+    }
+
+
+# Scenario name -> (task template, callable building the playbook variables for n items)
+# Templates see pihole_url, pihole_password and pihole_hosts besides the built variables.
+SCENARIOS = {
+    'groups': (
+        {'sbarbett.pihole.groups': {'groups': '{{ items }}', 'url': '{{ pihole_url }}',
+                                    'password': '{{ pihole_password }}'}},
+        lambda n: {'items': _groups(n)},
+    ),
+    'clients': (
+        {'sbarbett.pihole.clients': {'clients': '{{ items }}', 'url': '{{ pihole_url }}',
+                                     'password': '{{ pihole_password }}'}},
+        lambda n: {'items': _clients(n)},
+    ),
+    'block_list': (
+        {'sbarbett.pihole.block_list': {'lists': '{{ items }}', 'url': '{{ pihole_url }}',
+                                        'password': '{{ pihole_password }}'}},
+        lambda n: {'items': _lists(n)},
+    ),
+    'local_records': (
+        {'sbarbett.pihole.local_records': {'records': '{{ items }}', 'url': '{{ pihole_url }}',
+                                           'password': '{{ pihole_password }}'}},
+        lambda n: {'items': _records(n)},
+    ),
+    'domains': (
+        {'sbarbett.pihole.domains': {'domains': '{{ items }}', 'url': '{{ pihole_url }}',
+                                     'password': '{{ pihole_password }}'}},
+        lambda n: {'items': _domains(n)},
+    ),
+    'dhcp_static_hosts': (
+        {'sbarbett.pihole.dhcp_static_hosts': {'hosts': '{{ items }}', 'url': '{{ pihole_url }}',
+                                               'password': '{{ pihole_password }}'}},
+        lambda n: {'items': _reservations(n)},
+    ),
+    'pihole_state': (
+        {'sbarbett.pihole.pihole_state': {'groups': '{{ desired.groups }}', 'clients': '{{ desired.clients }}',
+                                          'lists': '{{ desired.lists }}', 'records': '{{ desired.records }}',
+                                          'url': '{{ pihole_url }}', 'password': '{{ pihole_password }}'}},
+        lambda n: {'desired': _state(n)},
+    ),
+    'role_group_client_manager': (
+        {'ansible.builtin.include_role': {'name': 'sbarbett.pihole.group_client_manager'}},
+        lambda n: {'pihole_groups': _groups(max(1, n // 2)), 'pihole_clients': _clients(max(1, n // 2))},
+    ),
+    'role_manage_lists': (
+        {'ansible.builtin.include_role': {'name': 'sbarbett.pihole.manage_lists'}},
+        lambda n: {'pihole_lists': _lists(n // 2, 'allow') + [
+            dict(item, address=item['address'].replace('lists.', 'block.')) for item in _lists(n - n // 2, 'block')]},
+    ),
+    'role_manage_local_records': (
+        {'ansible.builtin.include_role': {'name': 'sbarbett.pihole.manage_local_records'}},
+        lambda n: {'pihole_records': _records(n)},
+    ),
+}
+
+
+def _playbook(task):
+    task = dict(task, name='benchmark')
+    return [{'hosts': 'localhost', 'gather_facts': False, 'connection': 'local', 'tasks': [task]}]
+
+
+def run_playbook(workdir, env, task, variables):
+    """
+    Run a one-task playbook.
+
+    Returns:
+        tuple: (wall seconds, return code, output tail)
+    """
+    playbook = os.path.join(workdir, 'playbook.json')
+    extra_vars = os.path.join(workdir, 'vars.json')
+    with open(playbook, 'w') as f:
+        json.dump(_playbook(task), f)
+    with open(extra_vars, 'w') as f:
+        json.dump(variables, f)
+
+    started = time.perf_counter()
+    process = subprocess.run(
+        ['ansible-playbook', playbook, '-e', f'@{extra_vars}'],
+        cwd=workdir, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+    )
+    wall = time.perf_counter() - started
+    return wall, process.returncode, process.stdout.decode(errors='replace')[-2000:]
+
+
+def _environment(workdir):
+    collections = os.path.join(workdir, 'collections', 'ansible_collections', 'sbarbett')
+    os.makedirs(collections)
+    os.symlink(REPO_ROOT, os.path.join(collections, 'pihole'))
+    env = dict(os.environ)
+    env.update(
+        ANSIBLE_COLLECTIONS_PATH=os.path.join(workdir, 'collections'),
+        ANSIBLE_LOCALHOST_WARNING='false',
+        ANSIBLE_INVENTORY_UNPARSED_WARNING='false',
+        ANSIBLE_RETRY_FILES_ENABLED='false',
+        ANSIBLE_NOCOLOR='true',
+        # Each benchmark run starts without cached sessions or groups
+        PIHOLE_SESSION_CACHE_PATH=os.path.join(workdir, 'cache', 'sessions.json'),
+    )
+    return env
+
+
+def run_scenario(server, name, size, workdir, env):
+    task, build = SCENARIOS[name]
+    variables = dict(build(size))
+    variables.update(
+        pihole_url=server.url,
+        pihole_password=server.password,
+        pihole_hosts=[{'name': server.url, 'password': server.password}],
+    )
+
+    server.reset()
+    shutil.rmtree(os.path.join(workdir, 'cache'), ignore_errors=True)
+
+    results = []
+    for phase in PHASES:
+        server.reset_stats()
+        wall, returncode, output = run_playbook(workdir, env, task, variables)
+        stats = server.stats()
+        results.append(dict(
+            scenario=name, items=size, phase=phase, wall=round(wall, 3), ok=returncode == 0,
+            calls=stats['calls'], logins=stats['logins'], bytes_in=stats['bytes_in'], bytes_out=stats['bytes_out'],
+            by_endpoint=stats['by_endpoint'],
+        ))
+        if returncode != 0:
+            results[-1]['output'] = output
+            break
+    return results
+
+
+def print_table(results):
+    header = f"{'scenario':<28}{'items':>7} {'phase':<6}{'wall s':>9}{'calls':>8}{'logins':>7}{'KiB out':>10}{'KiB in':>10}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        print(f"{result['scenario']:<28}{result['items']:>7} {result['phase']:<6}{result['wall']:>9.2f}"
+              f"{result['calls']:>8}{result['logins']:>7}{result['bytes_in'] / 1024:>10.1f}"
+              f"{result['bytes_out'] / 1024:>10.1f}{'' if result['ok'] else '  FAILED'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='comma separated item counts (default: %(default)s)')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run; repeat for several (default: all)')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the fake server adds to every request')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    scenarios = args.scenario or list(SCENARIOS)
+
+    server = FakePihole(password=DEFAULT_PASSWORD, latency=args.latency)
+    server.start()
+    workdir = tempfile.mkdtemp(prefix='pihole-bench-')
+    results = []
+    try:
+        env = _environment(workdir)
+        for name in scenarios:
+            for size in sizes:
+                runs = run_scenario(server, name, size, workdir, env)
+                results.extend(runs)
+                for result in runs:
+                    status = 'ok' if result['ok'] else 'FAILED'
+                    print(f"{name} x{size} {result['phase']}: {result['wall']:.2f}s, {result['calls']} calls ({status})",
+                          file=sys.stderr)
+                    if not result['ok']:
+                        print(result['output'], file=sys.stderr)
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(dict(latency=args.latency, results=results), f, indent=2)
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
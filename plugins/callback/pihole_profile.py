@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+name: pihole_profile
+type: aggregate
+short_description: Profile sbarbett.pihole tasks per Pi-hole instance and module
+description:
+    - Records how long every task of the C(sbarbett.pihole) collection took, attributed to the Pi-hole instance it
+      talked to and the module it ran, together with the C(api_stats) block the modules return when their
+      C(api_stats) option is enabled.
+    - Modules applied to several instances through C(instances) are attributed per instance, using the elapsed time
+      and API statistics of every instance entry. Loops are attributed per item.
+    - At the end of the play a summary table grouped by instance and module is shown, and a report is written to
+      O(output_path) when it is set, so runs can be compared to find slow instances and slow modules.
+    - Tasks of other collections are ignored.
+version_added: "1.2.0"
+requirements:
+    - Enable the callback in C(ansible.cfg) with C(callbacks_enabled = sbarbett.pihole.pihole_profile).
+options:
+    output_path:
+        description:
+            - File the report is written to at the end of the play. No report is written when unset.
+            - The file is replaced atomically, so it can be read by the Prometheus node exporter textfile collector.
+        type: path
+        env:
+            - name: PIHOLE_PROFILE_OUTPUT
+        ini:
+            - section: callback_pihole_profile
+              key: output_path
+    output_format:
+        description:
+            - V(json) writes the run, one entry per instance and module, and its requests by endpoint.
+            - V(prometheus) writes gauges in the Prometheus text exposition format, labelled with C(url) and C(module).
+        type: str
+        default: json
+        choices: ['json', 'prometheus']
+        env:
+            - name: PIHOLE_PROFILE_FORMAT
+        ini:
+            - section: callback_pihole_profile
+              key: output_format
+    summary_limit:
+        description:
+            - Number of rows of the summary table, slowest first. V(0) shows every row.
+        type: int
+        default: 20
+        env:
+            - name: PIHOLE_PROFILE_SUMMARY_LIMIT
+        ini:
+            - section: callback_pihole_profile
+              key: summary_limit
+'''
+
+import json
+import os
+import tempfile
+import time
+
+from ansible.module_utils.common.text.converters import to_text
+from ansible.plugins.callback import CallbackBase
+
+COLLECTION_PREFIX = 'sbarbett.pihole.'
+
+# Prometheus metric name -> (help text, entry key)
+PROMETHEUS_GAUGES = [
+    ('pihole_ansible_task_seconds', 'Time spent in tasks by Pi-hole instance and module.', 'seconds'),
+    ('pihole_ansible_task_max_seconds', 'Duration of the slowest task by Pi-hole instance and module.', 'max_seconds'),
+    ('pihole_ansible_tasks', 'Tasks run by Pi-hole instance and module.', 'tasks'),
+    ('pihole_ansible_tasks_changed', 'Tasks that reported a change by Pi-hole instance and module.', 'changed'),
+    ('pihole_ansible_tasks_failed', 'Tasks that failed by Pi-hole instance and module.', 'failed'),
+    ('pihole_ansible_api_requests', 'API requests by Pi-hole instance and module.', 'requests'),
+    ('pihole_ansible_api_seconds', 'Time spent in API requests by Pi-hole instance and module.', 'api_seconds'),
+    ('pihole_ansible_api_logins', 'API logins by Pi-hole instance and module.', 'logins'),
+    ('pihole_ansible_api_bytes_in', 'Response bytes received by Pi-hole instance and module.', 'bytes_in'),
+    ('pihole_ansible_api_bytes_out', 'Request bytes sent by Pi-hole instance and module.', 'bytes_out'),
+]
+
+
+def _label(value):
+    return to_text(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _new_entry(url, module):
+    return dict(url=url, module=module, tasks=0, changed=0, failed=0, seconds=0.0, max_seconds=0.0,
+                requests=0, api_seconds=0.0, logins=0, bytes_in=0, bytes_out=0, endpoints={})
+
+
+class CallbackModule(CallbackBase):
+    """
+    Aggregates the duration and API statistics of sbarbett.pihole tasks by instance URL and module.
+    """
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'sbarbett.pihole.pihole_profile'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self.started = time.time()
+        self.playbook = None
+        self.entries = {}
+        # (host, task uuid) -> time the task, or its previous loop item, finished
+        self.marks = {}
+
+    def _module(self, task):
+        action = getattr(task, 'resolved_action', None) or task.action
+        if not action or not action.startswith(COLLECTION_PREFIX):
+            return None
+        return action[len(COLLECTION_PREFIX):]
+
+    def _elapsed(self, result):
+        key = (result._host.get_name(), result._task._uuid)
+        now = time.time()
+        started = self.marks.get(key, now)
+        self.marks[key] = now
+        return now - started
+
+    def _entry(self, url, module):
+        key = (url, module)
+        if key not in self.entries:
+            self.entries[key] = _new_entry(url, module)
+        return self.entries[key]
+
+    def _add(self, url, module, seconds, changed, failed, stats):
+        entry = self._entry(url, module)
+        entry['tasks'] += 1
+        entry['changed'] += int(bool(changed))
+        entry['failed'] += int(bool(failed))
+        entry['seconds'] += seconds
+        entry['max_seconds'] = max(entry['max_seconds'], seconds)
+        if not stats:
+            return
+        entry['requests'] += stats.get('requests', 0)
+        entry['api_seconds'] += stats.get('total_seconds', 0)
+        entry['logins'] += stats.get('logins', 0)
+        entry['bytes_in'] += stats.get('bytes_in', 0)
+        entry['bytes_out'] += stats.get('bytes_out', 0)
+        for endpoint, counts in stats.get('endpoints', {}).items():
+            target = entry['endpoints'].setdefault(endpoint, {'count': 0, 'seconds': 0.0})
+            target['count'] += counts.get('count', 0)
+            target['seconds'] += counts.get('seconds', 0)
+
+    def _record(self, result, failed=False):
+        module = self._module(result._task)
+        if module is None:
+            return
+        seconds = self._elapsed(result)
+        data = result._result
+        # Loop tasks are accounted item by item; the final result only repeats them
+        if isinstance(data.get('results'), list):
+            return
+
+        instances = data.get('instances')
+        if isinstance(instances, list) and instances and isinstance(instances[0], dict) and 'url' in instances[0]:
+            for instance in instances:
+                self._add(instance['url'], module, instance.get('elapsed') or 0.0, instance.get('changed'),
+                          instance.get('failed'), instance.get('api_stats'))
+            return
+
+        args = data.get('invocation', {}).get('module_args', {})
+        url = args.get('url') or result._task.args.get('url') or 'unknown'
+        self._add(to_text(url), module, seconds, data.get('changed'), failed, data.get('api_stats'))
+
+    def v2_playbook_on_start(self, playbook):
+        self.playbook = os.path.basename(playbook._file_name)
+
+    def v2_runner_on_start(self, host, task):
+        self.marks[(host.get_name(), task._uuid)] = time.time()
+
+    def v2_runner_on_ok(self, result):
+        self._record(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record(result, failed=True)
+
+    def v2_runner_item_on_ok(self, result):
+        self._record(result)
+
+    def v2_runner_item_on_failed(self, result):
+        self._record(result, failed=True)
+
+    def _rows(self):
+        return sorted(self.entries.values(), key=lambda entry: entry['seconds'], reverse=True)
+
+    def _show_summary(self):
+        rows = self._rows()
+        limit = self.get_option('summary_limit')
+        width = max([len('instance')] + [len(row['url']) for row in rows])
+        header = (f"{'instance':<{width}}  {'module':<18}{'tasks':>6}{'failed':>7}{'seconds':>10}{'max':>9}"
+                  f"{'requests':>10}{'logins':>7}{'KiB out':>9}{'KiB in':>9}")
+        self._display.banner('PI-HOLE PROFILE')
+        self._display.display(header)
+        self._display.display('-' * len(header))
+        for row in rows[:limit] if limit else rows:
+            self._display.display(
+                f"{row['url']:<{width}}  {row['module']:<18}{row['tasks']:>6}{row['failed']:>7}"
+                f"{row['seconds']:>10.2f}{row['max_seconds']:>9.2f}{row['requests']:>10}{row['logins']:>7}"
+                f"{row['bytes_out'] / 1024:>9.1f}{row['bytes_in'] / 1024:>9.1f}"
+            )
+        if limit and len(rows) > limit:
+            self._display.display(f'... {len(rows) - limit} more rows in the report')
+
+    def _json_report(self, finished):
+        rows = []
+        for row in self._rows():
+            row = dict(row, seconds=round(row['seconds'], 4), max_seconds=round(row['max_seconds'], 4),
+                       api_seconds=round(row['api_seconds'], 4))
+            row['endpoints'] = dict(
+                (endpoint, {'count': counts['count'], 'seconds': round(counts['seconds'], 4)})
+                for endpoint, counts in sorted(row['endpoints'].items())
+            )
+            rows.append(row)
+        report = dict(playbook=self.playbook, started=self.started, finished=finished,
+                      duration=round(finished - self.started, 3), entries=rows)
+        return json.dumps(report, indent=2, sort_keys=True) + '\n'
+
+    def _prometheus_report(self, finished):
+        rows = self._rows()
+        lines = []
+        for name, help_text, key in PROMETHEUS_GAUGES:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for row in rows:
+                value = round(row[key], 4) if isinstance(row[key], float) else row[key]
+                lines.append(f'{name}{{url="{_label(row["url"])}",module="{_label(row["module"])}"}} {value}')
+        name = 'pihole_ansible_api_endpoint_requests'
+        lines.append(f'# HELP {name} API requests by Pi-hole instance, module, method and endpoint.')
+        lines.append(f'# TYPE {name} gauge')
+        for row in rows:
+            for endpoint, counts in sorted(row['endpoints'].items()):
+                method, _, path = endpoint.partition(' ')
+                lines.append(f'{name}{{url="{_label(row["url"])}",module="{_label(row["module"])}",'
+                             f'method="{_label(method)}",endpoint="{_label(path)}"}} {counts["count"]}')
+        lines.append('# HELP pihole_ansible_run_finished_timestamp_seconds Time the profiled run finished.')
+        lines.append('# TYPE pihole_ansible_run_finished_timestamp_seconds gauge')
+        lines.append(f'pihole_ansible_run_finished_timestamp_seconds{{playbook="{_label(self.playbook or "")}"}} {round(finished, 3)}')
+        return '\n'.join(lines) + '\n'
+
+    def _write_report(self, path, content):
+        """Replace the report atomically so readers never see a partial file."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.pihole-profile-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+            os.chmod(tmp_path, 0o644)
+            os.rename(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def v2_playbook_on_stats(self, stats):
+        if not self.entries:
+            return
+        self._show_summary()
+
+        path = self.get_option('output_path')
+        if not path:
+            return
+        finished = time.time()
+        if self.get_option('output_format') == 'prometheus':
+            content = self._prometheus_report(finished)
+        else:
+            content = self._json_report(finished)
+        try:
+            self._write_report(path, content)
+        except (IOError, OSError) as e:
+            self._display.warning(f'Could not write the Pi-hole profile report to {path}: {to_text(e)}')
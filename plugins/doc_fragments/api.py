@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+class ModuleDocFragment(object):
+
+    # Options shared by every module that talks to the Pi-hole API
+    DOCUMENTATION = r'''
+options:
+    session_cache:
+        description:
+            - Reuse Pi-hole API sessions across tasks through a shared cache file on the host running the module.
+            - When enabled the module borrows a cached session for the instance and hands it back when it finishes
+              instead of logging in and out, so a play only logs in again after the session expires or the server rejects it.
+            - When disabled the module logs in and logs out on every run.
+            - Can also be set with the E(PIHOLE_SESSION_CACHE) environment variable.
+        required: false
+        type: bool
+        default: true
+    session_cache_path:
+        description:
+            - Path of the session cache file.
+            - The file and its directory are created with owner-only permissions because they hold session IDs.
+            - Defaults to C(~/.ansible/pihole/sessions.json).
+            - Can also be set with the E(PIHOLE_SESSION_CACHE_PATH) environment variable.
+        required: false
+        type: path
+    max_sessions:
+        description:
+            - Maximum number of cached sessions (seats) kept open on a single Pi-hole instance.
+            - When a new login is needed and the cap is reached, the least recently used cached session is logged out first.
+            - Can also be set with the E(PIHOLE_MAX_SESSIONS) environment variable.
+        required: false
+        type: int
+        default: 2
+    retries:
+        description:
+            - Number of times a request is retried after a refused or broken connection, or an HTTP 429, 500, 502, 503
+              or 504 response.
+            - Requests the server may already have acted on are only retried for the idempotent methods GET, PUT and
+              DELETE. POST and PATCH requests are only retried when the connection was refused before they were sent.
+            - Waits follow the C(Retry-After) header of the response when there is one, up to 30 seconds.
+            - Can also be set with the E(PIHOLE_RETRIES) environment variable.
+        required: false
+        type: int
+        default: 3
+    retry_backoff:
+        description:
+            - Base delay in seconds before the first retry of a request. It doubles on every further retry, up to 30
+              seconds, and a random jitter of up to half the delay is taken off so parallel tasks spread out.
+            - Can also be set with the E(PIHOLE_RETRY_BACKOFF) environment variable.
+        required: false
+        type: float
+        default: 0.5
+    retry_budget:
+        description:
+            - Total number of retries one module run may spend across all its requests and instances.
+            - Once spent, failing requests fail at once, so an instance that is down cannot stall a large batch
+              with retries of every request.
+            - Can also be set with the E(PIHOLE_RETRY_BUDGET) environment variable.
+        required: false
+        type: int
+        default: 30
+    connect_timeout:
+        description:
+            - Seconds to wait for a connection to the Pi-hole API to be established.
+            - Can also be set with the E(PIHOLE_CONNECT_TIMEOUT) environment variable.
+        required: false
+        type: float
+        default: 10
+    read_timeout:
+        description:
+            - Seconds to wait for the response to a request once it was sent.
+            - Can also be set with the E(PIHOLE_READ_TIMEOUT) environment variable.
+        required: false
+        type: float
+        default: 30
+    long_timeout:
+        description:
+            - Seconds to wait for the response to a long operation instead of O(read_timeout). Long operations are
+              configuration changes, which make Pi-hole reload its resolver, teleporter exports and imports, and actions.
+            - Does not apply to gravity runs, whose output is streamed and bounded by the C(timeout) option of the
+              modules running gravity.
+            - Can also be set with the E(PIHOLE_LONG_TIMEOUT) environment variable.
+        required: false
+        type: float
+        default: 300
+    api_stats:
+        description:
+            - Return an C(api_stats) block with the API requests the module made.
+            - It holds the number of C(requests) and C(logins), the request body sizes in C(bytes_out) and the response
+              sizes as received, compressed or not, in C(bytes_in), the C(total_seconds) and C(p95_seconds) latency of the requests, and an C(endpoints) dict
+              keyed by method and path, with item names collapsed (for example C(PUT groups/{item})), holding the
+              C(count) and C(seconds) of each.
+            - With O(instances), every entry of C(instances) carries the block for its instance and the top-level block
+              adds them up.
+            - Can also be set with the E(PIHOLE_API_STATS) environment variable.
+        required: false
+        type: bool
+        default: false
+'''
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+class ModuleDocFragment(object):
+
+    # Option for modules that can start from a pihole_facts snapshot
+    DOCUMENTATION = r'''
+options:
+    current_state:
+        description:
+            - State of the instance as collected by M(sbarbett.pihole.pihole_facts), used instead of reading it from the API.
+            - Accepts the registered result of M(sbarbett.pihole.pihole_facts), its RV(sbarbett.pihole.pihole_facts#module:state)
+              or RV(sbarbett.pihole.pihole_facts#module:instances), or a list of snapshots. Snapshots are matched to the instance by URL.
+            - Sections missing from the snapshot, and instances without a snapshot, are read from the API as usual.
+            - The snapshot is not updated by the module. Only pass it to tasks whose sections were not changed since it was taken.
+        required: false
+        type: raw
+'''
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+class ModuleDocFragment(object):
+
+    # Options for modules that can apply the same state to several instances
+    DOCUMENTATION = r'''
+options:
+    instances:
+        description:
+            - Apply the same desired state to several Pi-hole instances concurrently.
+            - Each instance runs with its own API session on a bounded worker pool, so the task takes roughly
+              as long as the slowest instance instead of the sum of all of them.
+            - The module then returns one entry per instance in RV(instances) instead of the single-instance return values.
+            - Mutually exclusive with O(url).
+        required: false
+        type: list
+        elements: dict
+        suboptions:
+            url:
+                description:
+                    - The URL of the Pi-hole instance.
+                required: true
+                type: str
+                aliases: [ name ]
+            password:
+                description:
+                    - The API password for the Pi-hole instance.
+                required: true
+                type: str
+    max_workers:
+        description:
+            - Maximum number of instances processed at the same time when O(instances) is used.
+        required: false
+        type: int
+        default: 8
+'''
+
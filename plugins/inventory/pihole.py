@@ -0,0 +1,479 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+name: pihole
+short_description: Pi-hole DHCP leases, network devices and clients as inventory hosts
+description:
+    - Builds an inventory from the DHCP leases, the network table and the configured clients of one or more Pi-hole
+      instances.
+    - Every instance is read in parallel, and the sources of one instance are read in parallel too, one GET each.
+      Sessions are shared with the modules of the collection through the session cache.
+    - A device seen in several sources or on several instances becomes one host. Observations are merged by hardware
+      address, or by IP address when the hardware address is unknown.
+    - The inventory hostname is the name Pi-hole knows the device by, or its IP address when it has none.
+    - Hosts are grouped by the Pi-hole groups of the client they match, C(<group_prefix>group_<name>), and by subnet,
+      C(<group_prefix>subnet_<network>). Like FTL, a host matches the client of its hardware or IP address first,
+      then of its hostname, then of the most specific subnet and last of its interface; hosts matching no client are
+      in the C(Default) group.
+    - With O(cache) enabled, the data read from the instances is kept in the inventory cache for O(cache_timeout)
+      seconds, so repeated C(ansible-inventory) and C(ansible-playbook) runs do not contact the instances.
+    - Uses a YAML configuration file that ends with C(pihole.yml) or C(pihole.yaml).
+version_added: "1.2.0"
+author:
+    - Shane Barbetta (@sbarbett)
+requirements:
+    - pihole6api
+extends_documentation_fragment:
+    - constructed
+    - inventory_cache
+options:
+    plugin:
+        description: Token that ensures this is a source file for the plugin.
+        required: true
+        type: str
+        choices: ['sbarbett.pihole.pihole']
+    instances:
+        description:
+            - The Pi-hole instances to read.
+        required: true
+        type: list
+        elements: dict
+        suboptions:
+            url:
+                description:
+                    - The URL of the Pi-hole instance.
+                required: true
+                type: str
+                aliases: [ name ]
+            password:
+                description:
+                    - The API password for the Pi-hole instance. Defaults to O(password).
+                    - Vault encrypted values can be used; the value is not templated.
+                required: false
+                type: str
+    password:
+        description:
+            - API password for instances that do not set their own.
+        required: false
+        type: str
+        env:
+            - name: PIHOLE_PASSWORD
+    sources:
+        description:
+            - What to read from every instance.
+            - V(leases) adds the current DHCP leases, V(devices) the network table and V(clients) the configured
+              clients with a single IP or hardware address. Group membership needs V(clients).
+        type: list
+        elements: str
+        choices: ['leases', 'devices', 'clients']
+        default: ['leases', 'devices', 'clients']
+    max_workers:
+        description:
+            - Maximum number of instances read at the same time.
+        type: int
+        default: 8
+    group_prefix:
+        description:
+            - Prefix of the Pi-hole group and subnet groups.
+        type: str
+        default: pihole_
+    subnets:
+        description:
+            - Networks to group hosts by, like V(192.168.1.0/24).
+            - When empty, hosts are grouped by their network of O(ipv4_prefix) or O(ipv6_prefix) bits.
+        type: list
+        elements: str
+        default: []
+    ipv4_prefix:
+        description:
+            - Prefix length of the subnet groups of IPv4 addresses when O(subnets) is empty.
+        type: int
+        default: 24
+    ipv6_prefix:
+        description:
+            - Prefix length of the subnet groups of IPv6 addresses when O(subnets) is empty.
+        type: int
+        default: 64
+    session_cache:
+        description:
+            - Reuse API sessions through the session cache of the collection instead of logging in on every refresh.
+        type: bool
+        default: true
+    connect_timeout:
+        description:
+            - Seconds to wait for a connection to an instance.
+        type: float
+        default: 5
+    read_timeout:
+        description:
+            - Seconds to wait for a response from an instance.
+        type: float
+        default: 30
+'''
+
+EXAMPLES = r'''
+# pihole.yml, with the password of both instances in PIHOLE_PASSWORD
+plugin: sbarbett.pihole.pihole
+instances:
+  - url: https://pihole1.example.com
+  - url: https://pihole2.example.com
+cache: true
+cache_plugin: ansible.builtin.jsonfile
+cache_connection: ~/.ansible/pihole/inventory
+cache_timeout: 300
+
+# Only leases, grouped by the networks of the DHCP ranges
+plugin: sbarbett.pihole.pihole
+instances:
+  - url: https://pihole.example.com
+sources: [leases]
+subnets: [192.168.1.0/24, 192.168.20.0/24]
+
+# Constructed groups and variables from the host variables
+plugin: sbarbett.pihole.pihole
+instances:
+  - url: https://pihole.example.com
+keyed_groups:
+  - key: pihole_vendor | default('unknown')
+    prefix: vendor
+groups:
+  leased: "'leases' in pihole_sources"
+compose:
+  ansible_user: "'pi' if (pihole_vendor | default('')) is search('Raspberry') else 'root'"
+'''
+
+import ipaddress
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.errors import AnsibleParserError
+from ansible.inventory.group import to_safe_group_name
+from ansible.module_utils.common.text.converters import to_native
+from ansible.plugins.inventory import BaseInventoryPlugin, Cacheable, Constructable
+from ansible.utils.display import Display
+
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import (
+    HAS_PIHOLE6API,
+    SESSION_CACHE_FILE,
+    PiholeClient,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.cache import FileCache, cache_path
+from ansible_collections.sbarbett.pihole.plugins.module_utils.retry import request_retry
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import take_snapshot
+from ansible_collections.sbarbett.pihole.plugins.module_utils.transport import DEFAULT_LONG_TIMEOUT
+
+display = Display()
+
+# Source -> snapshot sections it reads; group names come with the clients
+SOURCE_SECTIONS = {
+    'leases': ['leases'],
+    'devices': ['devices'],
+    'clients': ['clients', 'groups'],
+}
+
+_MAC = re.compile(r'^[0-9a-f]{2}(:[0-9a-f]{2}){5}$')
+
+
+def _mac(value):
+    """Return a hardware address lowercase, or None for empty, all-zero and pseudo addresses like 'ip-10.0.0.5'."""
+    value = (value or '').strip().lower().replace('-', ':')
+    if not _MAC.match(value) or value == '00:00:00:00:00:00':
+        return None
+    return value
+
+
+def _address(value):
+    try:
+        return ipaddress.ip_address((value or '').strip())
+    except ValueError:
+        return None
+
+
+def _name(value):
+    # Pi-hole reports unknown lease names as '*'
+    value = (value or '').strip().rstrip('.')
+    return value if value and value != '*' else None
+
+
+class _Host(object):
+    """One device, merged from every source and instance it was seen in."""
+
+    def __init__(self):
+        self.hwaddr = None
+        self.addresses = []
+        self.names = []
+        self.sources = set()
+        self.instances = set()
+        self.variables = {}
+
+    def hostname(self):
+        if self.names:
+            return self.names[0]
+        return str(self.addresses[0]) if self.addresses else self.hwaddr
+
+    def host_vars(self, prefix='pihole_'):
+        addresses = sorted(self.addresses, key=lambda address: (address.version, address))
+        hostvars = dict(
+            ips=[str(address) for address in addresses],
+            hwaddr=self.hwaddr,
+            name=self.names[0] if self.names else None,
+            sources=sorted(self.sources),
+            instances=sorted(self.instances),
+        )
+        hostvars.update(self.variables)
+        hostvars = dict((prefix + key, value) for key, value in hostvars.items())
+        if addresses:
+            hostvars['ansible_host'] = str(addresses[0])
+        return hostvars
+
+
+class _Hosts(object):
+    """Hosts indexed by hardware and IP address while observations are merged in."""
+
+    def __init__(self):
+        self.hosts = []
+        self.by_hwaddr = {}
+        self.by_address = {}
+
+    def observe(self, url, source, hwaddr=None, addresses=(), name=None, **variables):
+        hwaddr = _mac(hwaddr)
+        addresses = [address for address in map(_address, addresses) if address is not None]
+        host = self.by_hwaddr.get(hwaddr) if hwaddr else None
+        if host is None:
+            # An address only joins a host that has no other hardware address
+            host = next((self.by_address[address] for address in addresses if address in self.by_address
+                         and not (hwaddr and self.by_address[address].hwaddr not in (None, hwaddr))), None)
+        if host is None:
+            if not (hwaddr or addresses):
+                return None
+            host = _Host()
+            self.hosts.append(host)
+        if hwaddr and host.hwaddr is None:
+            host.hwaddr = hwaddr
+            self.by_hwaddr[hwaddr] = host
+        for address in addresses:
+            if address not in host.addresses:
+                host.addresses.append(address)
+            self.by_address.setdefault(address, host)
+        name = _name(name)
+        if name and name not in host.names:
+            host.names.append(name)
+        host.sources.add(source)
+        host.instances.add(url)
+        host.variables.update((key, value) for key, value in variables.items() if value not in (None, ''))
+        return host
+
+
+def _client_groups(snapshot):
+    """
+    Return the matchers of the configured clients of one instance, most specific kind first.
+
+    Returns:
+        tuple: (exact hardware and IP address -> group names, hostname -> group names,
+                [(network, group names)] longest prefix first, interface -> group names,
+                name of the default group)
+    """
+    names = dict((group['id'], group['name']) for group in snapshot.get('groups', []))
+    exact, hostnames, networks, interfaces = {}, {}, [], {}
+    for client in snapshot.get('clients', []):
+        value = (client.get('client') or '').strip()
+        groups = [names[group] for group in client.get('groups', []) if group in names]
+        if value.startswith(':'):
+            interfaces[value[1:]] = groups
+        elif _mac(value):
+            exact[_mac(value)] = groups
+        elif _address(value):
+            exact[_address(value)] = groups
+        elif '/' in value:
+            try:
+                networks.append((ipaddress.ip_network(value, strict=False), groups))
+            except ValueError:
+                pass
+        elif value:
+            hostnames[value.lower()] = groups
+    networks.sort(key=lambda item: item[0].prefixlen, reverse=True)
+    return exact, hostnames, networks, interfaces, names.get(0, 'Default')
+
+
+def _groups_of(host, matchers):
+    exact, hostnames, networks, interfaces, default = matchers
+    for key in [host.hwaddr] + host.addresses:
+        if key in exact:
+            return exact[key]
+    for name in host.names:
+        if name.lower() in hostnames:
+            return hostnames[name.lower()]
+    for network, groups in networks:
+        if any(address.version == network.version and address in network for address in host.addresses):
+            return groups
+    if host.variables.get('interface') in interfaces:
+        return interfaces[host.variables['interface']]
+    return [default]
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+
+    NAME = 'sbarbett.pihole.pihole'
+
+    def verify_file(self, path):
+        return super(InventoryModule, self).verify_file(path) and path.endswith(('pihole.yml', 'pihole.yaml'))
+
+    def _client(self, url, password):
+        cache = FileCache(cache_path(SESSION_CACHE_FILE)) if self.get_option('session_cache') else None
+        return PiholeClient(
+            url,
+            password,
+            cache=cache,
+            retry=request_retry(3, 0.5, None),
+            timeouts=(self.get_option('connect_timeout'), self.get_option('read_timeout'), DEFAULT_LONG_TIMEOUT),
+        )
+
+    def _read_instance(self, instance, sections):
+        url = instance.get('url') or instance.get('name')
+        password = instance.get('password') or self.get_option('password')
+        if not url or not password:
+            raise AnsibleParserError('Every Pi-hole instance needs a url and a password')
+        client = self._client(url, password)
+        try:
+            return take_snapshot(client, sections)
+        finally:
+            client.close_session()
+
+    def _read(self):
+        """
+        Read the sources of every instance in parallel.
+
+        Returns:
+            tuple: (snapshots by URL, errors by URL)
+        """
+        sections = []
+        for source in self.get_option('sources'):
+            sections.extend(section for section in SOURCE_SECTIONS[source] if section not in sections)
+        instances = self.get_option('instances')
+        if not instances:
+            raise AnsibleParserError('The pihole inventory needs at least one instance')
+
+        def read(instance):
+            try:
+                return self._read_instance(instance, sections), None
+            except AnsibleParserError:
+                raise
+            except Exception as e:
+                return None, to_native(e)
+
+        workers = max(1, min(self.get_option('max_workers') or 1, len(instances)))
+        snapshots, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for instance, (snapshot, error) in zip(instances, executor.map(read, instances)):
+                if error is None:
+                    snapshots[snapshot['url']] = snapshot
+                else:
+                    errors[instance.get('url') or instance.get('name')] = error
+        return snapshots, errors
+
+    def _hosts(self, snapshots):
+        hosts = _Hosts()
+        for url, snapshot in sorted(snapshots.items()):
+            for lease in snapshot.get('leases', []):
+                hosts.observe(url, 'leases', lease.get('hwaddr'), [lease.get('ip')], lease.get('name'),
+                              lease_expires=lease.get('expires'), clientid=_name(lease.get('clientid')))
+            for device in snapshot.get('devices', []):
+                ips = device.get('ips') or []
+                hosts.observe(url, 'devices', device.get('hwaddr'), [ip.get('ip') for ip in ips],
+                              next((_name(ip.get('name')) for ip in ips if _name(ip.get('name'))), None),
+                              vendor=device.get('macVendor'), interface=device.get('interface'),
+                              last_query=device.get('lastQuery') or None)
+            for client in snapshot.get('clients', []):
+                value = (client.get('client') or '').strip()
+                # Subnet, interface and hostname clients describe many or unknown devices
+                if _mac(value) or _address(value):
+                    hosts.observe(url, 'clients', value if _mac(value) else None,
+                                  [value] if _address(value) else [], client.get('name'),
+                                  comment=client.get('comment'))
+        return hosts.hosts
+
+    def _subnet(self, address, subnets):
+        if subnets:
+            return next((network for network in subnets
+                         if address.version == network.version and address in network), None)
+        prefix = self.get_option('ipv4_prefix') if address.version == 4 else self.get_option('ipv6_prefix')
+        return ipaddress.ip_network(f'{address}/{prefix}', strict=False)
+
+    def _populate(self, snapshots):
+        prefix = self.get_option('group_prefix')
+        strict = self.get_option('strict')
+        try:
+            subnets = [ipaddress.ip_network(subnet, strict=False) for subnet in self.get_option('subnets')]
+        except ValueError as e:
+            raise AnsibleParserError(f'Invalid subnet: {to_native(e)}')
+        matchers = dict((url, _client_groups(snapshot)) for url, snapshot in snapshots.items()
+                        if 'clients' in snapshot)
+
+        seen = set()
+        for host in self._hosts(snapshots):
+            hostname = host.hostname()
+            if hostname in seen:
+                # Two devices claiming one name; the later one goes by its address
+                hostname = str(host.addresses[0]) if host.addresses else host.hwaddr
+            seen.add(hostname)
+            self.inventory.add_host(hostname)
+
+            groups = set()
+            for url in host.instances:
+                if url in matchers:
+                    groups.update(_groups_of(host, matchers[url]))
+            hostvars = host.host_vars()
+            if matchers:
+                hostvars['pihole_groups'] = sorted(groups)
+            for variable, value in hostvars.items():
+                self.inventory.set_variable(hostname, variable, value)
+
+            names = [f'{prefix}group_{group}' for group in sorted(groups)]
+            for address in host.addresses:
+                network = self._subnet(address, subnets)
+                if network is not None:
+                    names.append(f'{prefix}subnet_{network}')
+            for name in names:
+                group = self.inventory.add_group(to_safe_group_name(name, force=True, silent=True))
+                self.inventory.add_child(group, hostname)
+
+            self._set_composite_vars(self.get_option('compose'), hostvars, hostname, strict=strict)
+            self._add_host_to_composed_groups(self.get_option('groups'), hostvars, hostname, strict=strict)
+            self._add_host_to_keyed_groups(self.get_option('keyed_groups'), hostvars, hostname, strict=strict)
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path, cache)
+        self._read_config_data(path)
+
+        if not HAS_PIHOLE6API:
+            raise AnsibleParserError('The pihole6api module is required')
+
+        cache_key = self.get_cache_key(path)
+        use_cache = self.get_option('cache') and cache
+        update_cache = self.get_option('cache') and not cache
+
+        snapshots = None
+        if use_cache:
+            try:
+                snapshots = self._cache[cache_key]
+            except KeyError:
+                update_cache = True
+
+        if snapshots is None:
+            snapshots, errors = self._read()
+            if errors and not snapshots:
+                raise AnsibleParserError('Failed to read every Pi-hole instance: ' + '; '.join(
+                    f'{url}: {error}' for url, error in sorted(errors.items())))
+            for url, error in sorted(errors.items()):
+                display.warning(f'Skipping Pi-hole instance {url}: {error}')
+            # A partial read is not cached, so the next run tries the failed instances again
+            update_cache = update_cache and not errors
+
+        if update_cache:
+            self._cache[cache_key] = snapshots
+
+        self._populate(snapshots)
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import time
+
+from ansible.module_utils.basic import env_fallback
+
+from ansible_collections.sbarbett.pihole.plugins.module_utils.cache import FileCache, cache_path
+from ansible_collections.sbarbett.pihole.plugins.module_utils.retry import module_retry_budget, request_retry
+from ansible_collections.sbarbett.pihole.plugins.module_utils.stats import count_bytes_hook, module_api_stats
+from ansible_collections.sbarbett.pihole.plugins.module_utils.transport import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_LONG_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_READ_TIMEOUT,
+    shared_adapter,
+)
+
+try:
+    from pihole6api import (
+        PiHole6Client,
+        PiHole6Connection,
+        PiHole6Metrics,
+        PiHole6DnsControl,
+        PiHole6GroupManagement,
+        PiHole6DomainManagement,
+        PiHole6ClientManagement,
+        PiHole6ListManagement,
+        PiHole6FtlInfo,
+        PiHole6Configuration,
+        PiHole6NetworkInfo,
+        PiHole6Actions,
+        PiHole6Dhcp,
+    )
+    HAS_PIHOLE6API = True
+except ImportError:
+    PiHole6Client = PiHole6Connection = object
+    HAS_PIHOLE6API = False
+
+SESSION_CACHE_FILE = 'sessions.json'
+
+# Sessions closer than this to their expiry are not handed out again
+SESSION_EXPIRY_MARGIN = 30
+
+
+class PiholeModuleError(Exception):
+    """
+    Raised by module workers for errors that should fail the task.
+
+    Workers run inside run_on_instances() and must not call fail_json()
+    themselves, since one instance failing must not stop the others.
+    """
+
+
+def is_not_found(response):
+    """Whether an API response reports that the requested item does not exist."""
+    error = response.get('error') if isinstance(response, dict) else None
+    if isinstance(error, dict):
+        return error.get('key') == 'not_found'
+    return isinstance(error, str) and error.startswith('HTTP 404')
+
+def api_argument_spec():
+    """
+    Options shared by every module that talks to the Pi-hole API.
+
+    Documented in the sbarbett.pihole.api doc fragment.
+    """
+    return dict(
+        session_cache=dict(type='bool', required=False, default=True,
+                           fallback=(env_fallback, ['PIHOLE_SESSION_CACHE'])),
+        session_cache_path=dict(type='path', required=False, default=None,
+                                fallback=(env_fallback, ['PIHOLE_SESSION_CACHE_PATH'])),
+        max_sessions=dict(type='int', required=False, default=2,
+                          fallback=(env_fallback, ['PIHOLE_MAX_SESSIONS'])),
+        api_stats=dict(type='bool', required=False, default=False,
+                       fallback=(env_fallback, ['PIHOLE_API_STATS'])),
+        retries=dict(type='int', required=False, default=3,
+                     fallback=(env_fallback, ['PIHOLE_RETRIES'])),
+        retry_backoff=dict(type='float', required=False, default=0.5,
+                           fallback=(env_fallback, ['PIHOLE_RETRY_BACKOFF'])),
+        retry_budget=dict(type='int', required=False, default=30,
+                          fallback=(env_fallback, ['PIHOLE_RETRY_BUDGET'])),
+        connect_timeout=dict(type='float', required=False, default=DEFAULT_CONNECT_TIMEOUT,
+                             fallback=(env_fallback, ['PIHOLE_CONNECT_TIMEOUT'])),
+        read_timeout=dict(type='float', required=False, default=DEFAULT_READ_TIMEOUT,
+                          fallback=(env_fallback, ['PIHOLE_READ_TIMEOUT'])),
+        long_timeout=dict(type='float', required=False, default=DEFAULT_LONG_TIMEOUT,
+                          fallback=(env_fallback, ['PIHOLE_LONG_TIMEOUT'])),
+    )
+
+
+class CachedConnection(PiHole6Connection):
+    """
+    PiHole6Connection that borrows its session from a shared on-disk cache.
+
+    Sessions are keyed by API URL and a fingerprint of the password so a
+    cached SID is only reused by callers that could have created it. A cached
+    session is trusted until its recorded expiry; the server answering 401 is
+    what invalidates it. Logins happen while the cache lock is held, so
+    parallel tasks against the same instance wait for one login instead of
+    each opening a seat.
+
+    Requests go through the keep-alive pool shared by all connections of the
+    process to the same instance (see shared_adapter()) and use separate
+    connect, read and long-operation timeouts.
+    With an ApiStats in stats, every request is also recorded with its
+    latency and wire sizes, along with every login. With a retry policy,
+    every request, the login included, is retried according to it instead
+    of the fixed retries pihole6api configures.
+    """
+
+    def __init__(self, base_url, password, cache=None, max_sessions=2, stats=None, retry=None,
+                 timeouts=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_LONG_TIMEOUT),
+                 pool_size=DEFAULT_POOL_SIZE, **kwargs):
+        self.cache = cache
+        self.stats = stats
+        self.retry = retry
+        self.timeouts = tuple(timeouts)
+        self.pool_size = pool_size
+        self.connect_timeout = self.timeouts[0]
+        self.session_configured = False
+        self.max_sessions = max(1, max_sessions or 1)
+        self.cache_key = hashlib.sha256(
+            ('%s\n%s' % (base_url.rstrip('/') + '/api/', password)).encode('utf-8')
+        ).hexdigest()
+        self.logins = 0
+        self.calls = 0
+        self.last_used = None
+        if retry is not None:
+            # The retry policy covers the login as well; no second retry loop around it
+            kwargs.setdefault('max_retries', 1)
+        super(CachedConnection, self).__init__(base_url, password, **kwargs)
+
+    def _configure_session(self):
+        """Mount the shared transport and install the statistics hook on the HTTP session."""
+        # requests matches the longest mounted prefix, so the instance's API goes through the shared pool
+        self.session.mount(self.base_url, shared_adapter(self.base_url, self.timeouts, self.pool_size, self.retry))
+        # pihole6api passes this to every request; the adapter swaps in the long-operation read timeout
+        self.connection_timeout = self.timeouts[:2]
+        if self.stats is not None:
+            self.session.hooks['response'].append(count_bytes_hook(self.stats))
+        self.session_configured = True
+
+    def _login(self):
+        super(CachedConnection, self)._authenticate()
+        self.logins += 1
+        if self.stats is not None:
+            self.stats.record_login()
+        self.last_used = time.time()
+
+    def _logout_sid(self, sid):
+        """Best-effort logout of a session we are evicting from the cache."""
+        try:
+            self.session.delete(self.base_url + 'auth', headers={'X-FTL-SID': sid},
+                                verify=False, timeout=self.connection_timeout)
+        except Exception:
+            pass
+
+    def _authenticate(self):
+        if not self.session_configured:
+            # The parent constructor creates the session right before it first authenticates
+            self._configure_session()
+        if self.cache is None:
+            return self._login()
+
+        # A session_id at this point means the server just rejected it
+        rejected = self.session_id
+        now = time.time()
+
+        with self.cache.locked() as data:
+            sessions = data.setdefault('sessions', {})
+
+            for key, entry in list(sessions.items()):
+                if entry.get('expires', 0) <= now + SESSION_EXPIRY_MARGIN:
+                    del sessions[key]
+
+            entry = sessions.get(self.cache_key)
+            if entry is not None and entry.get('sid') != rejected:
+                self.session_id = entry['sid']
+                self.csrf_token = entry['csrf']
+                self.validity = entry['validity']
+                self.last_used = now
+                return
+            sessions.pop(self.cache_key, None)
+
+            # Keep the number of seats this cache holds on the instance capped
+            seats = sorted(
+                (entry.get('last_used', 0), key)
+                for key, entry in sessions.items()
+                if entry.get('url') == self.base_url
+            )
+            while len(seats) >= self.max_sessions:
+                evicted = sessions.pop(seats.pop(0)[1])
+                self._logout_sid(evicted['sid'])
+
+            self._login()
+            sessions[self.cache_key] = {
+                'url': self.base_url,
+                'sid': self.session_id,
+                'csrf': self.csrf_token,
+                'validity': self.validity,
+                'last_used': self.last_used,
+                'expires': self.last_used + self.validity,
+            }
+
+    def _do_call(self, method, endpoint, **kwargs):
+        self.calls += 1
+        started = time.time()
+        try:
+            return super(CachedConnection, self)._do_call(method, endpoint, **kwargs)
+        finally:
+            # Pi-hole slides the session validity forward on every authenticated request
+            self.last_used = time.time()
+            self.record_request(method, endpoint, self.last_used - started)
+
+    def record_request(self, method, endpoint, seconds):
+        """Record a request made outside _do_call(), such as the streamed gravity run."""
+        if self.stats is not None:
+            self.stats.record_request(method, endpoint, seconds)
+
+    def release(self):
+        """
+        Return the session to the cache instead of logging out.
+
+        Records the sliding expiry and closes the session's own HTTP connections.
+        """
+        try:
+            if self.session_id and self.last_used:
+                with self.cache.locked() as data:
+                    entry = data.get('sessions', {}).get(self.cache_key)
+                    if entry is not None and entry.get('sid') == self.session_id:
+                        entry['last_used'] = self.last_used
+                        entry['expires'] = self.last_used + self.validity
+        finally:
+            self._close_session()
+        return {}
+
+    def exit(self):
+        """Log out like pihole6api, without closing the transport shared with the other connections."""
+        try:
+            response = self.delete('auth')
+        except Exception as e:
+            response = {'error': str(e)}
+        finally:
+            self.session_id = None
+            self.csrf_token = None
+            self.validity = None
+            self._close_session()
+        return response
+
+    def _close_session(self):
+        # HTTPAdapter.close() clears its pool, so the shared adapter is unmounted before the session closes the rest
+        self.session.adapters.pop(self.base_url, None)
+        self.session.close()
+
+
+class PiholeClient(PiHole6Client):
+    """
+    PiHole6Client built on a CachedConnection.
+
+    close_session() hands the session back to the cache when caching is
+    enabled and only logs out when it is not.
+    """
+
+    def __init__(self, url, password, **kwargs):
+        self.connection = CachedConnection(url, password, **kwargs)
+
+        self.metrics = PiHole6Metrics(self.connection)
+        self.dns_control = PiHole6DnsControl(self.connection)
+        self.group_management = PiHole6GroupManagement(self.connection)
+        self.domain_management = PiHole6DomainManagement(self.connection)
+        self.client_management = PiHole6ClientManagement(self.connection)
+        self.list_management = PiHole6ListManagement(self.connection)
+        self.ftl_info = PiHole6FtlInfo(self.connection)
+        self.config = PiHole6Configuration(self.connection)
+        self.network_info = PiHole6NetworkInfo(self.connection)
+        self.actions = PiHole6Actions(self.connection)
+        self.dhcp = PiHole6Dhcp(self.connection)
+
+    def close_session(self):
+        if self.connection.cache is not None:
+            return self.connection.release()
+        return super(PiholeClient, self).close_session()
+
+
+def get_client(module, url=None, password=None):
+    """
+    Build a PiholeClient from the module's connection options.
+
+    Args:
+        module: AnsibleModule whose argument spec includes api_argument_spec()
+        url: Optional URL overriding module.params['url']
+        password: Optional password overriding module.params['password']
+
+    Returns:
+        PiholeClient: Authenticated client
+    """
+    params = module.params
+    cache = None
+    if params.get('session_cache', True):
+        cache = FileCache(params.get('session_cache_path') or cache_path(SESSION_CACHE_FILE))
+    return PiholeClient(
+        url or params['url'],
+        password or params['password'],
+        cache=cache,
+        max_sessions=params.get('max_sessions', 2),
+        stats=module_api_stats(module) if params.get('api_stats') else None,
+        retry=request_retry(params.get('retries', 3), params.get('retry_backoff', 0.5), module_retry_budget(module)),
+        timeouts=(
+            params.get('connect_timeout') or DEFAULT_CONNECT_TIMEOUT,
+            params.get('read_timeout') or DEFAULT_READ_TIMEOUT,
+            params.get('long_timeout') or DEFAULT_LONG_TIMEOUT,
+        ),
+        pool_size=max(DEFAULT_POOL_SIZE, params.get('max_workers') or 0),
+    )
+
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import errno
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+DEFAULT_CACHE_DIR = '~/.ansible/pihole'
+
+
+def cache_path(name, directory=None):
+    """
+    Build the path of a cache file inside the collection's cache directory.
+
+    Args:
+        name: File name of the cache (e.g. 'sessions.json')
+        directory: Optional directory overriding DEFAULT_CACHE_DIR
+
+    Returns:
+        str: Absolute path of the cache file
+    """
+    return os.path.join(os.path.expanduser(directory or DEFAULT_CACHE_DIR), name)
+
+
+class FileCache:
+    """
+    A small JSON document on disk shared between module invocations.
+
+    Every access happens under an exclusive flock() on a sidecar lock file so
+    concurrent tasks (forks, async jobs, threads in one module) see a
+    consistent view. The directory is created with mode 0700 and the
+    document with mode 0600 because it may hold session credentials.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.lock_path = self.path + '.lock'
+
+    def _ensure_dir(self):
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, mode=0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _store(self, data):
+        directory = os.path.dirname(self.path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.cache-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.chmod(tmp_path, 0o600)
+            os.rename(tmp_path, self.path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold the cache lock and yield the current document as a dict.
+
+        Changes made to the yielded dict are written back when the block
+        exits without an exception.
+        """
+        self._ensure_dir()
+        lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            data = self._load()
+            before = json.dumps(data, sort_keys=True)
+            yield data
+            if json.dumps(data, sort_keys=True) != before:
+                self._store(data)
+        finally:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            os.close(lock_fd)
+
+    def read(self):
+        """Return a copy of the current document."""
+        with self.locked() as data:
+            return dict(data)
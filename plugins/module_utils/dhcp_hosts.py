@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import ipaddress
+import re
+
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError
+
+# Hardware addresses as dnsmasq accepts them: hex pairs separated by colons or dashes, * as wildcard
+_MAC = re.compile(r'^([0-9a-f*]{1,2})([:-][0-9a-f*]{1,2}){5}$', re.IGNORECASE)
+_LEASE_TIME = re.compile(r'^(infinite|\d+[smhdw]?)$', re.IGNORECASE)
+
+# dhcp-host fields that are neither addresses, names nor lease times and are kept as they are
+_TAG_PREFIXES = ('id:', 'set:', 'tag:')
+
+
+def normalize_mac(mac):
+    """
+    Return a hardware address lowercase with colon separators and two digits per byte, or None if it is not one.
+    """
+    mac = mac.strip()
+    if not _MAC.match(mac):
+        return None
+    return ':'.join(part.rjust(2, '0') for part in re.split('[:-]', mac.lower()))
+
+
+def _address(token):
+    try:
+        return str(ipaddress.ip_address(token[1:-1] if token.startswith('[') and token.endswith(']') else token))
+    except ValueError:
+        return None
+
+
+def parse_host(entry):
+    """
+    Parse a dhcp.hosts entry in dnsmasq dhcp-host syntax, e.g. "aa:bb:cc:dd:ee:ff,192.168.1.10,nas,24h".
+
+    Returns:
+        dict: 'macs', 'ip', 'hostname', 'lease_time', 'tags' (id:, set: and tag: fields) and 'ignore',
+              or None for entries that are not understood and must be written back verbatim
+    """
+    parsed = dict(macs=[], ip=None, hostname=None, lease_time=None, tags=[], ignore=False)
+    for token in (token.strip() for token in entry.split(',')):
+        mac = normalize_mac(token)
+        if mac is not None:
+            parsed['macs'].append(mac)
+        elif token.startswith(_TAG_PREFIXES):
+            parsed['tags'].append(token)
+        elif token == 'ignore':
+            parsed['ignore'] = True
+        elif parsed['ip'] is None and _address(token):
+            parsed['ip'] = _address(token)
+        elif parsed['lease_time'] is None and _LEASE_TIME.match(token) and (parsed['ip'] or parsed['hostname']):
+            parsed['lease_time'] = token
+        elif parsed['hostname'] is None and token and parsed['lease_time'] is None:
+            parsed['hostname'] = token
+        else:
+            return None
+    return parsed if parsed['macs'] else None
+
+
+def format_host(host):
+    """Return the dhcp.hosts entry for a parsed host."""
+    ip = host['ip']
+    if ip and ipaddress.ip_address(ip).version == 6:
+        ip = f'[{ip}]'
+    fields = list(host['macs']) + list(host['tags']) + [ip, host['hostname'], host['lease_time']]
+    if host['ignore']:
+        fields.append('ignore')
+    return ','.join(field for field in fields if field)
+
+
+def index_hosts(entries):
+    """
+    Index dhcp.hosts entries by hardware address.
+
+    When several entries list the same hardware address the first one is
+    indexed; find_conflicts() reports the others.
+
+    Returns:
+        dict: Mapping of MAC to (position, parsed entry)
+    """
+    index = {}
+    for position, entry in enumerate(entries):
+        parsed = parse_host(entry)
+        if parsed is None:
+            continue
+        for mac in parsed['macs']:
+            index.setdefault(mac, (position, parsed))
+    return index
+
+
+def normalize_reservations(reservations, default_state):
+    """
+    Validate reservation definitions and fill in their state.
+
+    Raises:
+        PiholeModuleError: For invalid hardware or IP addresses, present reservations without an address or
+                           hostname, and hardware addresses listed more than once
+    """
+    normalized = []
+    seen = set()
+    for reservation in reservations:
+        mac = normalize_mac(reservation['mac'])
+        if mac is None:
+            raise PiholeModuleError(f"'{reservation['mac']}' is not a valid hardware address")
+        if mac in seen:
+            raise PiholeModuleError(f'Hardware address {mac} is listed more than once')
+        seen.add(mac)
+        ip = reservation.get('ip')
+        if ip is not None and _address(ip) is None:
+            raise PiholeModuleError(f"'{ip}' is not a valid IP address for reservation {mac}")
+        reservation = dict(reservation, mac=mac, ip=_address(ip) if ip else None,
+                           state=reservation.get('state') or default_state)
+        if reservation['state'] == 'present' and not (reservation['ip'] or reservation.get('hostname')):
+            raise PiholeModuleError(f'Reservation {mac} needs an ip or a hostname to be present')
+        normalized.append(reservation)
+    return normalized
+
+
+def plan_reservations(entries, reservations, purge=False):
+    """
+    Compute the new dhcp.hosts list for the requested reservations.
+
+    Entries are matched by hardware address. Fields a reservation leaves
+    unset keep their current value, and the tags of an entry are kept. Entries
+    that are not understood, and with purge=False every entry not requested,
+    are written back verbatim and in place.
+
+    Args:
+        entries: The current dhcp.hosts list
+        reservations: Reservations returned by normalize_reservations()
+        purge: Remove every entry with a hardware address that is not requested
+
+    Returns:
+        tuple: The new list, a dict of MAC to one of created, updated, deleted, unchanged or absent_already
+               for the requested and purged hardware addresses, and the conflicts found by find_conflicts()
+    """
+    index = index_hosts(entries)
+    new_entries = list(entries)
+    removed = set()
+    appended = []
+    states = {}
+
+    for reservation in reservations:
+        mac = reservation['mac']
+        position, current = index.get(mac, (None, None))
+        if reservation['state'] == 'absent':
+            if current is None:
+                states[mac] = 'absent_already'
+                continue
+            states[mac] = 'deleted'
+            if len(current['macs']) > 1:
+                # Other hardware addresses of a shared entry keep their reservation
+                current = dict(current, macs=[other for other in current['macs'] if other != mac])
+                index.update((other, (position, current)) for other in current['macs'])
+                new_entries[position] = format_host(current)
+            else:
+                removed.add(position)
+            continue
+
+        desired = dict(current or dict(macs=[mac], ip=None, hostname=None, lease_time=None, tags=[], ignore=False))
+        for key in ('ip', 'hostname', 'lease_time'):
+            if reservation.get(key) is not None:
+                desired[key] = reservation[key]
+        if current is None:
+            states[mac] = 'created'
+            appended.append(format_host(desired))
+        elif desired == current:
+            states[mac] = 'unchanged'
+        else:
+            states[mac] = 'updated'
+            index.update((other, (position, desired)) for other in desired['macs'])
+            new_entries[position] = format_host(desired)
+
+    if purge:
+        requested = set(states)
+        for position, entry in enumerate(new_entries):
+            parsed = parse_host(entry)
+            if parsed is not None and not requested.intersection(parsed['macs']):
+                removed.add(position)
+                states.update((mac, 'deleted') for mac in parsed['macs'])
+
+    new_entries = [entry for position, entry in enumerate(new_entries) if position not in removed] + appended
+    return new_entries, states, find_conflicts(new_entries)
+
+
+def find_conflicts(entries):
+    """
+    Return the hardware and IP addresses reserved by more than one dhcp.hosts entry.
+
+    Returns:
+        list: One dict per address with 'kind' (duplicate_mac or duplicate_ip), 'value' and the 'entries' involved
+    """
+    by_mac = {}
+    by_ip = {}
+    for entry in entries:
+        parsed = parse_host(entry)
+        if parsed is None:
+            continue
+        for mac in parsed['macs']:
+            by_mac.setdefault(mac, []).append(entry)
+        if parsed['ip']:
+            by_ip.setdefault(parsed['ip'], []).append(entry)
+    conflicts = [dict(kind='duplicate_mac', value=mac, entries=found)
+                 for mac, found in sorted(by_mac.items()) if len(found) > 1]
+    conflicts.extend(dict(kind='duplicate_ip', value=ip, entries=found)
+                     for ip, found in sorted(by_ip.items()) if len(found) > 1)
+    return conflicts
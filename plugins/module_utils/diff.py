@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+class ItemDiff:
+    """
+    Per-item before/after states in the format of Ansible's diff output.
+
+    Only items that change are recorded, and each one is a separate diff
+    entry holding just the fields the module manages, so the output of a
+    drift scan stays small no matter how much the instance holds. A side
+    that does not exist is None.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.entries = []
+
+    def add(self, name, before, after):
+        if before == after:
+            return
+        header = f'{self.kind} {name}'
+        self.entries.append(dict(before_header=header, after_header=header, before=before, after=after))
+
+    def __bool__(self):
+        return bool(self.entries)
+
+
+def diff_result(module, *diffs):
+    """
+    The diff part of a module result.
+
+    Returns:
+        dict: {'diff': [...]} when the module runs in diff mode, else {}
+    """
+    if not module._diff:
+        return {}
+    return dict(diff=[entry for diff in diffs for entry in diff.entries])
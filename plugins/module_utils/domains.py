@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from urllib.parse import quote
+
+from ansible.module_utils.common.text.converters import to_native
+
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import snapshot_section
+
+DOMAIN_TYPES = ['allow', 'deny']
+DOMAIN_KINDS = ['exact', 'regex']
+
+# Domains sent in one POST or batch delete request
+DEFAULT_BATCH_SIZE = 1000
+
+
+def normalize_domain(domain, kind):
+    """
+    Return a domain the way Pi-hole stores it.
+
+    Exact domains are stored lowercase and internationalized names in
+    their ASCII (punycode) form; regular expressions are stored verbatim.
+    """
+    domain = domain.strip()
+    if kind != 'exact':
+        return domain
+    domain = domain.lower()
+    try:
+        return domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        return domain
+
+
+def domain_key(domain, domain_type, kind):
+    """Key identifying a domain entry; the same domain may exist once per type and kind."""
+    return (domain, domain_type, kind)
+
+
+def fetch_domains(module, client):
+    """
+    Fetch every exact and regex entry of an instance in one request.
+
+    Uses the current_state snapshot instead when one is given for the instance.
+
+    Returns:
+        dict: Mapping of domain_key() to the entry
+    """
+    entries = snapshot_section(module, client, 'domains')
+    if entries is None:
+        response = client.connection.get('domains')
+        if not isinstance(response, dict) or 'error' in response:
+            error = response.get('error') if isinstance(response, dict) else response
+            raise PiholeModuleError(f'Failed to fetch domains: {error}')
+        entries = response.get('domains', [])
+    return {domain_key(entry['domain'], entry['type'], entry['kind']): entry for entry in entries}
+
+
+def chunks(items, size):
+    size = max(1, size or DEFAULT_BATCH_SIZE)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _processed_errors(response):
+    processed = response.get('processed') if isinstance(response, dict) else None
+    if not isinstance(processed, dict):
+        return []
+    return [f"{error.get('item')}: {error.get('error')}" for error in processed.get('errors') or []]
+
+
+def add_domains(client, domains, domain_type, kind, comment=None, groups=None, enabled=True,
+                batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Add domains sharing type, kind, comment, groups and enabled state with one POST per chunk.
+
+    Raises:
+        PiholeModuleError: When a request fails or Pi-hole rejects an entry
+    """
+    for chunk in chunks(domains, batch_size):
+        payload = {'domain': chunk, 'comment': comment, 'groups': groups or [0], 'enabled': enabled}
+        response = client.connection.post(f'domains/{domain_type}/{kind}', data=payload)
+        if isinstance(response, dict) and 'error' in response:
+            raise PiholeModuleError(f"Failed to add {domain_type} {kind} domains: {response['error']}")
+        errors = _processed_errors(response)
+        if errors:
+            raise PiholeModuleError(f"Pi-hole rejected {domain_type} {kind} domains: {'; '.join(errors)}")
+
+
+def update_domain(client, domain, domain_type, kind, comment=None, groups=None, enabled=True):
+    """Update the comment, groups and enabled state of one entry."""
+    payload = {'type': domain_type, 'kind': kind, 'comment': comment, 'groups': groups or [0], 'enabled': enabled}
+    response = client.connection.put(f"domains/{domain_type}/{kind}/{quote(domain, safe='')}", data=payload)
+    if isinstance(response, dict) and 'error' in response:
+        raise PiholeModuleError(f"Failed to update {domain_type} {kind} domain {domain}: {response['error']}")
+
+
+def delete_domains(client, keys, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Delete entries given as domain_key() tuples with one domains:batchDelete request per chunk.
+
+    Falls back to deleting the entries one by one when the batch delete
+    endpoint is not available on the server.
+    """
+    for chunk in chunks(keys, batch_size):
+        items = [{'item': domain, 'type': domain_type, 'kind': kind} for domain, domain_type, kind in chunk]
+        try:
+            response = client.domain_management.batch_delete_domains(items)
+        except Exception as e:
+            response = {'error': to_native(e)}
+        if not (isinstance(response, dict) and 'error' in response):
+            continue
+        for domain, domain_type, kind in chunk:
+            response = client.connection.delete(f"domains/{domain_type}/{kind}/{quote(domain, safe='')}")
+            if isinstance(response, dict) and 'error' in response:
+                raise PiholeModuleError(f"Failed to delete {domain_type} {kind} domain {domain}: {response['error']}")
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.module_utils.common.text.converters import to_native
+
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import get_client
+from ansible_collections.sbarbett.pihole.plugins.module_utils.stats import api_stats_result
+
+DEFAULT_MAX_WORKERS = 8
+
+
+def instances_argument_spec():
+    """
+    Options for applying a module to several Pi-hole instances at once.
+
+    Modules using these make url and password optional and pass
+    INSTANCES_MODULE_KWARGS to AnsibleModule. Documented in the
+    sbarbett.pihole.instances doc fragment.
+    """
+    return dict(
+        instances=dict(
+            type='list',
+            elements='dict',
+            required=False,
+            options=dict(
+                url=dict(type='str', required=True, aliases=['name']),
+                password=dict(type='str', required=True, no_log=True),
+            ),
+        ),
+        max_workers=dict(type='int', required=False, default=DEFAULT_MAX_WORKERS),
+    )
+
+
+INSTANCES_MODULE_KWARGS = dict(
+    required_one_of=[['url', 'instances']],
+    mutually_exclusive=[['url', 'instances']],
+    required_by={'url': ['password']},
+)
+
+
+def _run_instance(module, worker, url, password):
+    started = time.time()
+    outcome = dict(url=url, changed=False, failed=False)
+    client = None
+    try:
+        client = get_client(module, url=url, password=password)
+        outcome.update(worker(client))
+    except Exception as e:
+        outcome['failed'] = True
+        outcome['msg'] = to_native(e)
+    finally:
+        if client is not None:
+            try:
+                client.close_session()
+            except Exception:
+                pass
+            if client.connection.stats is not None:
+                outcome['api_stats'] = client.connection.stats.as_dict()
+        outcome['elapsed'] = round(time.time() - started, 3)
+    return outcome
+
+
+def run_on_instances(module, worker, error_prefix, result=None):
+    """
+    Run worker against the module's instance(s) and exit the module.
+
+    With a single url the worker's result is returned as the module result,
+    exactly as if the module had called it directly. With instances the
+    worker runs concurrently on a bounded thread pool, each instance with its
+    own client, and the module returns one entry per instance with its own
+    result and timing. Instances that fail do not stop the others; the module
+    fails after all of them finished.
+
+    Args:
+        module: AnsibleModule using instances_argument_spec()
+        worker: Callable taking a client and returning a result dict with a
+                'changed' key. It must raise instead of calling fail_json.
+        error_prefix: Prefix for failure messages, e.g. 'Error managing groups'
+        result: Keys added to the module result once rather than per instance,
+                like an analysis of the input every instance shares
+
+    Diff entries returned by the workers are also collected into a top-level
+    diff with the instance URL in their headers, and with the api_stats
+    option the requests of all instances are added up in api_stats.
+    """
+    instances = module.params.get('instances')
+
+    if not instances:
+        outcome = _run_instance(module, worker, module.params['url'], module.params['password'])
+        msg = outcome.pop('msg', None)
+        failed = outcome.pop('failed')
+        outcome.pop('url')
+        outcome.pop('elapsed')
+        outcome.update(result or {})
+        outcome.update(api_stats_result(module))
+        if failed:
+            module.fail_json(msg=f'{error_prefix}: {msg}', **outcome)
+        module.exit_json(**outcome)
+
+    workers = max(1, min(module.params.get('max_workers') or DEFAULT_MAX_WORKERS, len(instances)))
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_run_instance, module, worker, instance['url'], instance['password'])
+            for instance in instances
+        ]
+        outcomes = [future.result() for future in futures]
+
+    result = dict(
+        result or {},
+        changed=any(outcome['changed'] for outcome in outcomes),
+        instances=outcomes,
+        elapsed=round(time.time() - started, 3),
+        **api_stats_result(module)
+    )
+    if module._diff:
+        # Lift the per-instance diffs to the top level, where callbacks show them
+        result['diff'] = [
+            dict(entry, before_header=f"{outcome['url']}: {entry['before_header']}",
+                 after_header=f"{outcome['url']}: {entry['after_header']}")
+            for outcome in outcomes for entry in outcome.get('diff', [])
+        ]
+    failures = [outcome for outcome in outcomes if outcome['failed']]
+    if failures:
+        details = '; '.join(f"{outcome['url']}: {outcome['msg']}" for outcome in failures)
+        module.fail_json(msg=f'{error_prefix} on {len(failures)} of {len(outcomes)} instances: {details}', **result)
+    module.exit_json(**result)
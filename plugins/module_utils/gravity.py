@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import os
+import re
+import secrets
+import time
+
+from ansible.module_utils.common.text.converters import to_native
+
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError
+from ansible_collections.sbarbett.pihole.plugins.module_utils.cache import FileCache, cache_path
+
+GRAVITY_JOB_DIR = 'gravity'
+
+# Seconds to wait for the next chunk of gravity output before giving up
+DEFAULT_GRAVITY_TIMEOUT = 600
+
+# Minimum seconds between two progress writes to a job file
+JOB_WRITE_INTERVAL = 1
+
+_ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+_TARGET = re.compile(r'\[i\]\s+Target:\s*(\S+)')
+_STATUS_FAILED = re.compile(r'\[✗\]\s+Status:')
+_DOMAINS = re.compile(r'Number of gravity domains:\s*([\d,]+)(?:\s*\(([\d,]+) unique domains\))?')
+
+
+def parse_gravity_output(lines):
+    """
+    Extract the summary of a gravity run from its output.
+
+    Args:
+        lines: Output lines of the run with ANSI escapes removed
+
+    Returns:
+        dict: lists_processed, lists_failed, domains and unique_domains.
+              Counts missing from the output are None.
+    """
+    summary = dict(lists_processed=0, lists_failed=0, domains=None, unique_domains=None)
+    for line in lines:
+        if _TARGET.search(line):
+            summary['lists_processed'] += 1
+        elif _STATUS_FAILED.search(line):
+            summary['lists_failed'] += 1
+        else:
+            match = _DOMAINS.search(line)
+            if match:
+                summary['domains'] = int(match.group(1).replace(',', ''))
+                if match.group(2):
+                    summary['unique_domains'] = int(match.group(2).replace(',', ''))
+    return summary
+
+
+def stream_gravity(client, timeout=DEFAULT_GRAVITY_TIMEOUT, on_line=None):
+    """
+    Run gravity on the instance and read its output as it is produced.
+
+    Pi-hole streams the gravity log while the run is in progress, so the
+    request is made with a streamed response and a read timeout that applies
+    between chunks instead of to the whole run.
+
+    Args:
+        client: PiHole6Client instance
+        timeout: Seconds to wait for the next chunk of output
+        on_line: Optional callable receiving every output line
+
+    Returns:
+        list: Output lines with ANSI escapes removed
+    """
+    connection = client.connection
+    url = connection.base_url + 'action/gravity'
+
+    def post():
+        return connection.session.post(
+            url,
+            headers=connection._get_headers(),
+            stream=True,
+            verify=False,
+            timeout=(getattr(connection, 'connect_timeout', connection.connection_timeout), timeout),
+        )
+
+    if hasattr(connection, 'calls'):
+        connection.calls += 1
+    started = time.time()
+    response = post()
+    if response.status_code == 401:
+        response.close()
+        connection._authenticate()
+        response = post()
+
+    try:
+        if response.status_code >= 400:
+            raise PiholeModuleError(f'Gravity run failed: HTTP {response.status_code}: {response.text}')
+
+        response.encoding = 'utf-8'
+        lines = []
+        for raw in response.iter_lines(decode_unicode=True):
+            line = _ANSI_ESCAPE.sub('', raw or '').rstrip()
+            if not line.strip():
+                continue
+            lines.append(line)
+            if on_line is not None:
+                on_line(line)
+    finally:
+        response.close()
+        connection.last_used = time.time()
+        if hasattr(connection, 'record_request'):
+            connection.record_request('POST', 'action/gravity', connection.last_used - started)
+
+    return lines
+
+
+def run_gravity(client, timeout=DEFAULT_GRAVITY_TIMEOUT, on_line=None):
+    """
+    Run gravity and wait for it to finish.
+
+    Returns:
+        dict: The parse_gravity_output() summary plus duration and output
+    """
+    started = time.time()
+    lines = stream_gravity(client, timeout=timeout, on_line=on_line)
+    result = dict(parse_gravity_output(lines))
+    result['duration'] = round(time.time() - started, 3)
+    result['output'] = lines
+    return result
+
+
+def job_cache(job_id, directory=None):
+    """Return the FileCache holding the state of a gravity job."""
+    if not re.match(r'^[0-9a-f]+$', job_id or ''):
+        raise PiholeModuleError(f'Invalid gravity job id: {job_id}')
+    return FileCache(cache_path(f'{job_id}.json', directory or cache_path(GRAVITY_JOB_DIR)))
+
+
+def job_process_alive(data):
+    """
+    Whether the background process of a job still exists.
+
+    A job that has not recorded its pid yet counts as alive. Signal 0 only
+    checks the process exists; one owned by another user is alive as well.
+    """
+    pid = data.get('pid')
+    if not pid:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def start_gravity_job(client_factory, url, timeout=DEFAULT_GRAVITY_TIMEOUT, directory=None):
+    """
+    Start a gravity run in a detached background process.
+
+    The run outlives the module: the process is double-forked into its own
+    session with its standard streams closed, and records its progress in a
+    job file that the gravity_status module reads.
+
+    Args:
+        client_factory: Callable returning an authenticated client. It is
+                        called in the background process.
+        url: URL of the instance, recorded in the job file
+        timeout: Seconds to wait for the next chunk of gravity output
+        directory: Optional directory for the job files
+
+    Returns:
+        str: The job id
+    """
+    job_id = secrets.token_hex(8)
+    job = job_cache(job_id, directory)
+    with job.locked() as data:
+        data.update(job_id=job_id, url=url, status='running', started=time.time(),
+                    finished=None, output=[], msg=None)
+
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return job_id
+
+    # First child: leave the module's session and let the grandchild be reparented
+    try:
+        os.setsid()
+        if os.fork():
+            os._exit(0)
+    except Exception:
+        os._exit(1)
+
+    # Grandchild: Ansible waits for the module's stdout to close, so detach from it
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+
+    try:
+        _run_job(job, client_factory, timeout)
+    finally:
+        os._exit(0)
+
+
+def _run_job(job, client_factory, timeout):
+    buffered = []
+    last_write = [time.time()]
+
+    def flush():
+        with job.locked() as data:
+            data['output'].extend(buffered)
+        del buffered[:]
+        last_write[0] = time.time()
+
+    def on_line(line):
+        buffered.append(line)
+        if time.time() - last_write[0] >= JOB_WRITE_INTERVAL:
+            flush()
+
+    with job.locked() as data:
+        data['pid'] = os.getpid()
+
+    client = None
+    status = dict(status='finished', msg=None)
+    try:
+        client = client_factory()
+        lines = stream_gravity(client, timeout=timeout, on_line=on_line)
+        status.update(parse_gravity_output(lines))
+    except Exception as e:
+        status.update(status='failed', msg=to_native(e))
+    finally:
+        if client is not None:
+            try:
+                client.close_session()
+            except Exception:
+                pass
+
+    with job.locked() as data:
+        data['output'].extend(buffered)
+        data.update(status)
+        data['finished'] = time.time()
+        data['duration'] = round(data['finished'] - data['started'], 3)
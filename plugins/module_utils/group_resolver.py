@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import os
+import time
+
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError, SESSION_CACHE_FILE
+from ansible_collections.sbarbett.pihole.plugins.module_utils.cache import FileCache, cache_path
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import snapshot_section
+
+GROUP_CACHE_FILE = 'groups.json'
+
+# Seconds a cached group list is trusted before it is fetched again
+GROUP_CACHE_TTL = 300
+
+
+def group_cache(module):
+    """
+    Return the FileCache holding group lists, or None when caching is off.
+
+    The group cache lives next to the session cache and follows the
+    session_cache option, so disabling one disables both.
+    """
+    params = module.params
+    if not params.get('session_cache', True):
+        return None
+    session_path = os.path.expanduser(params.get('session_cache_path') or cache_path(SESSION_CACHE_FILE))
+    return FileCache(os.path.join(os.path.dirname(session_path), GROUP_CACHE_FILE))
+
+
+def _cache_key(client):
+    # Same key as the session cache: only callers holding the password see the entry
+    return getattr(client.connection, 'cache_key', None)
+
+
+def fetch_groups(module, client):
+    """
+    Fetch the groups of an instance and store them in the group cache.
+
+    Returns:
+        list: Group dicts as returned by the API
+    """
+    response = client.group_management.get_groups()
+    if not isinstance(response, dict) or 'error' in response:
+        raise PiholeModuleError(f"Failed to fetch groups: {response.get('error') if isinstance(response, dict) else response}")
+    groups = response.get('groups', [])
+
+    cache = group_cache(module)
+    key = _cache_key(client)
+    if cache is not None and key is not None:
+        now = time.time()
+        with cache.locked() as data:
+            entries = data.setdefault('groups', {})
+            for stale in [k for k, entry in entries.items() if entry.get('fetched', 0) + GROUP_CACHE_TTL <= now]:
+                del entries[stale]
+            entries[key] = {'fetched': now, 'groups': groups}
+    return groups
+
+
+def invalidate_groups(module, client):
+    """Drop the cached groups of an instance after they were changed."""
+    cache = group_cache(module)
+    key = _cache_key(client)
+    if cache is None or key is None:
+        return
+    with cache.locked() as data:
+        data.get('groups', {}).pop(key, None)
+
+
+class GroupResolver:
+    """
+    Resolves group names to ids and ids to names for one instance.
+
+    Both directions are dict lookups built once from the group list. Names
+    are matched case-insensitively like Pi-hole's web interface does. The
+    group list comes from the module's current_state snapshot or from the
+    group cache when a recent copy exists; a name that cannot be resolved
+    from such a copy triggers one refetch in case the group was created
+    since. Nothing is fetched until a name has to be
+    resolved.
+    """
+
+    def __init__(self, module, client):
+        self.module = module
+        self.client = client
+        self.from_cache = False
+        self.groups = None
+
+    def _load(self):
+        if self.groups is not None:
+            return
+        groups = snapshot_section(self.module, self.client, 'groups')
+        if groups is not None:
+            self._index(groups)
+            self.from_cache = True
+            return
+        cache = group_cache(self.module)
+        key = _cache_key(self.client)
+        if cache is not None and key is not None:
+            entry = cache.read().get('groups', {}).get(key)
+            if entry is not None and entry.get('fetched', 0) + GROUP_CACHE_TTL > time.time():
+                self._index(entry['groups'])
+                self.from_cache = True
+                return
+        self.refresh()
+
+    def _index(self, groups):
+        self.groups = {group['name']: group for group in groups}
+        self.ids_by_name = {group['name'].lower(): group['id'] for group in groups}
+        self.names_by_id = {group['id']: group['name'] for group in groups}
+
+    def refresh(self):
+        """Fetch the groups from the instance and rebuild the indexes."""
+        self._index(fetch_groups(self.module, self.client))
+        self.from_cache = False
+
+    def to_ids(self, items):
+        """
+        Map group names or ids to group ids.
+
+        Integers are taken as ids. Names that do not exist are ignored with
+        a warning.
+
+        Returns:
+            list: Group ids in the order given
+        """
+        group_ids = []
+        missing = []
+        for item in items:
+            if isinstance(item, int):
+                group_ids.append(item)
+                continue
+            self._load()
+            group_id = self.ids_by_name.get(str(item).lower())
+            if group_id is None and self.from_cache:
+                self.refresh()
+                group_id = self.ids_by_name.get(str(item).lower())
+            if group_id is None:
+                missing.append(str(item))
+            else:
+                group_ids.append(group_id)
+
+        if missing:
+            self.module.warn(f"The following groups were not found and will be ignored: {', '.join(missing)}")
+
+        return group_ids
+
+    def to_names(self, group_ids):
+        """Map group ids to names, skipping ids that do not exist."""
+        self._load()
+        return [self.names_by_id[group_id] for group_id in group_ids if group_id in self.names_by_id]
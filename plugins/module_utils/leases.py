@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import ipaddress
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.module_utils.common.text.converters import to_native
+
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError
+
+# Lease filter keys; a filter set matches the leases matching every key it sets
+FILTER_KEYS = ['ip', 'name', 'clientid', 'hwaddr', 'cidr', 'oui', 'expired', 'older_than']
+
+# Lease time dnsmasq hands out for IPv4 when dhcp.leaseTime is empty
+DEFAULT_LEASE_SECONDS = 3600
+
+DEFAULT_REMOVE_WORKERS = 4
+
+_DURATION = re.compile(r'^(\d+)([smhdw]?)$')
+_DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+_HEX = re.compile(r'^[0-9a-f]{2}$')
+
+
+def parse_duration(value):
+    """
+    Return the seconds of a duration like '90', '45m', '12h', '7d' or '2w', or None for 'infinite'.
+
+    Raises:
+        PiholeModuleError: When the value is not a duration
+    """
+    text = str(value).strip().lower()
+    if text == 'infinite':
+        return None
+    match = _DURATION.match(text)
+    if not match:
+        raise PiholeModuleError(f"'{value}' is not a duration like 45m, 12h, 7d or 2w")
+    return int(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def _hwaddr_prefix(value):
+    parts = re.split('[:-]', value.strip().lower())
+    if not 1 <= len(parts) <= 6 or not all(_HEX.match(part) for part in parts):
+        raise PiholeModuleError(f"'{value}' is not a hardware address or prefix")
+    return ':'.join(parts)
+
+
+def normalize_filter(lease_filter):
+    """
+    Validate one filter set and convert its values for matching.
+
+    Returns:
+        dict: The keys the filter set uses, with 'cidr' as an ip_network, 'hwaddr' and 'oui'
+              lowercase with colon separators and 'older_than' in seconds
+
+    Raises:
+        PiholeModuleError: For empty filter sets and invalid values
+    """
+    normalized = dict((key, lease_filter[key]) for key in FILTER_KEYS if lease_filter.get(key) is not None)
+    if not normalized:
+        raise PiholeModuleError(f"A lease filter needs at least one of {', '.join(FILTER_KEYS)}")
+    try:
+        if 'cidr' in normalized:
+            normalized['cidr'] = ipaddress.ip_network(normalized['cidr'], strict=False)
+    except ValueError as e:
+        raise PiholeModuleError(f'Invalid cidr: {to_native(e)}')
+    if 'hwaddr' in normalized:
+        normalized['hwaddr'] = _hwaddr_prefix(normalized['hwaddr'])
+        if normalized['hwaddr'].count(':') != 5:
+            raise PiholeModuleError(f"'{lease_filter['hwaddr']}' is not a hardware address; use oui for prefixes")
+    if 'oui' in normalized:
+        normalized['oui'] = _hwaddr_prefix(normalized['oui'])
+    if 'older_than' in normalized:
+        normalized['older_than'] = parse_duration(normalized['older_than'])
+        if normalized['older_than'] is None:
+            raise PiholeModuleError("older_than cannot be 'infinite'")
+    return normalized
+
+
+def _address(value):
+    try:
+        return ipaddress.ip_address(value)
+    except ValueError:
+        return None
+
+
+class LeaseIndex(object):
+    """
+    DHCP leases of one fetch indexed by IP address, hardware address, OUI, client ID and hostname.
+
+    Filter sets with an exact key are answered from the index; the other
+    keys of the set are checked on the few candidates it returns. Sets with
+    only cidr, oui shorter than three bytes, expired or older_than scan the
+    leases once.
+    """
+
+    def __init__(self, leases):
+        self.leases = leases
+        self.by_ip = {}
+        self.by_hwaddr = {}
+        self.by_oui = {}
+        self.by_clientid = {}
+        self.by_name = {}
+        self.addresses = {}
+        for lease in leases:
+            hwaddr = (lease.get('hwaddr') or '').lower()
+            self.by_ip.setdefault(lease.get('ip'), []).append(lease)
+            self.by_hwaddr.setdefault(hwaddr, []).append(lease)
+            self.by_oui.setdefault(hwaddr[:8], []).append(lease)
+            self.by_clientid.setdefault(lease.get('clientid'), []).append(lease)
+            self.by_name.setdefault(lease.get('name'), []).append(lease)
+            self.addresses[id(lease)] = _address(lease.get('ip') or '')
+
+    def _candidates(self, lease_filter):
+        if 'ip' in lease_filter:
+            return self.by_ip.get(lease_filter['ip'], [])
+        if 'hwaddr' in lease_filter:
+            return self.by_hwaddr.get(lease_filter['hwaddr'], [])
+        if 'clientid' in lease_filter:
+            return self.by_clientid.get(lease_filter['clientid'], [])
+        if 'name' in lease_filter:
+            return self.by_name.get(lease_filter['name'], [])
+        if len(lease_filter.get('oui', '')) >= 8:
+            return self.by_oui.get(lease_filter['oui'][:8], [])
+        return self.leases
+
+    def _matches(self, lease, lease_filter, now, lease_seconds):
+        if 'ip' in lease_filter and lease.get('ip') != lease_filter['ip']:
+            return False
+        if 'name' in lease_filter and lease.get('name') != lease_filter['name']:
+            return False
+        if 'clientid' in lease_filter and lease.get('clientid') != lease_filter['clientid']:
+            return False
+        hwaddr = (lease.get('hwaddr') or '').lower()
+        if 'hwaddr' in lease_filter and hwaddr != lease_filter['hwaddr']:
+            return False
+        if 'oui' in lease_filter and not hwaddr.startswith(lease_filter['oui']):
+            return False
+        if 'cidr' in lease_filter:
+            address = self.addresses[id(lease)]
+            if address is None or address.version != lease_filter['cidr'].version \
+                    or address not in lease_filter['cidr']:
+                return False
+        # Leases expiring at 0 are infinite: never expired and never old
+        expires = lease.get('expires') or 0
+        if 'expired' in lease_filter and bool(expires and expires <= now) != lease_filter['expired']:
+            return False
+        if 'older_than' in lease_filter:
+            # Pi-hole only reports when a lease expires; it was handed out one lease time before that
+            if not expires or now - (expires - lease_seconds) <= lease_filter['older_than']:
+                return False
+        return True
+
+    def match(self, filters, now, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Return the leases matching any of the filter sets, once each and in lease order.
+
+        Args:
+            filters: Filter sets returned by normalize_filter()
+            now: Current time as a Unix timestamp
+            lease_seconds: Lease time used to tell when a lease was handed out, for older_than
+        """
+        matched = set()
+        for lease_filter in filters:
+            matched.update(id(lease) for lease in self._candidates(lease_filter)
+                           if self._matches(lease, lease_filter, now, lease_seconds))
+        return [lease for lease in self.leases if id(lease) in matched]
+
+
+def remove_leases(client, addresses, max_workers=DEFAULT_REMOVE_WORKERS):
+    """
+    Remove leases by IP address on a bounded pool of concurrent requests.
+
+    Every removal is attempted; failures are collected and raised together.
+
+    Returns:
+        dict: Mapping of IP address to the API response
+
+    Raises:
+        PiholeModuleError: When any removal failed, listing every failed address
+    """
+    def remove(address):
+        try:
+            return client.dhcp.remove_lease(address)
+        except Exception as e:
+            return {'error': to_native(e)}
+
+    workers = max(1, min(max_workers or DEFAULT_REMOVE_WORKERS, len(addresses)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        responses = dict(zip(addresses, executor.map(remove, addresses)))
+    failures = [f"{address}: {response['error']}" for address, response in responses.items()
+                if isinstance(response, dict) and 'error' in response]
+    if failures:
+        raise PiholeModuleError(f"Failed to remove {len(failures)} of {len(addresses)} leases: {'; '.join(failures)}")
+    return responses
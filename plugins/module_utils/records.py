@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import ipaddress
+
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError
+
+FAMILIES = {'A': 4, 'AAAA': 6}
+
+# TTL requested for CNAME records when none is given
+DEFAULT_CNAME_TTL = 300
+
+
+def address_family(address):
+    """
+    Return 4 or 6 for an IP address string, None if it is not an IP address.
+    """
+    try:
+        return ipaddress.ip_address(address).version
+    except ValueError:
+        return None
+
+
+def parse_hosts(entries):
+    """
+    Parse dns.hosts entries of the form "ip host [host ...]".
+
+    Returns:
+        list: One (ip, family, [names]) tuple per entry, or None for entries
+              that are not understood and must be written back verbatim.
+    """
+    parsed = []
+    for entry in entries:
+        parts = entry.split()
+        family = address_family(parts[0]) if len(parts) >= 2 else None
+        parsed.append((parts[0], family, parts[1:]) if family else None)
+    return parsed
+
+
+def parse_cname(entry):
+    """
+    Parse a dns.cnameRecords entry of the form "alias,target[,ttl]".
+
+    Returns:
+        tuple: (alias, target, ttl) with ttl as int or None, or None for
+               entries that are not understood.
+    """
+    parts = entry.split(',')
+    if len(parts) == 2:
+        return parts[0], parts[1], None
+    if len(parts) == 3:
+        try:
+            return parts[0], parts[1], int(parts[2])
+        except ValueError:
+            return None
+    return None
+
+
+class HostIndex(object):
+    """
+    dns.hosts entries parsed once and indexed by name.
+
+    Address families are classified with ipaddress. Addresses are kept as
+    the strings the server returned and every entry keeps its original
+    text, so entries that are not changed are written back exactly as they
+    were read.
+    """
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.parsed = parse_hosts(self.entries)
+        # name -> family -> addresses, in entry order
+        self.hosts = {}
+        for item in self.parsed:
+            if item is None:
+                continue
+            ip, family, names = item
+            for name in names:
+                self.hosts.setdefault(name, {}).setdefault(family, []).append(ip)
+
+    def addresses(self, name, family=None):
+        """Return the addresses of a name, of one family or of both."""
+        families = self.hosts.get(name, {})
+        if family is not None:
+            return list(families.get(family, []))
+        return families.get(4, []) + families.get(6, [])
+
+    def render(self, removals=(), additions=(), replacements=None):
+        """
+        Return the entries with (ip, name) pairs removed, replaced and added.
+
+        Entries losing some of their names keep the others; entries losing
+        none are returned unchanged. A replaced pair becomes "new_ip name" at
+        the position of its first line, so swapping an address never moves
+        or drops the record. Additions are appended as "ip name".
+
+        Args:
+            removals: (ip, name) pairs to remove
+            additions: (ip, name) pairs to append
+            replacements: Mapping of (old ip, name) to the new address
+        """
+        replacements = dict(replacements or {})
+        removals = set(removals) | set(replacements)
+        new_entries = []
+        for entry, item in zip(self.entries, self.parsed):
+            if item is None or not removals:
+                new_entries.append(entry)
+                continue
+            ip, family, names = item
+            kept = [name for name in names if (ip, name) not in removals]
+            if len(kept) == len(names):
+                new_entries.append(entry)
+                continue
+            if kept:
+                new_entries.append(' '.join([ip] + kept))
+            new_entries.extend(f"{replacements.pop((ip, name))} {name}"
+                               for name in names if (ip, name) in replacements)
+        new_entries.extend(f"{ip} {name}" for ip, name in additions)
+        return new_entries
+
+    def replace(self, name, old, new):
+        """
+        Return the entries with the address of a name swapped in place.
+
+        On a line listing other names too, those keep the old address and
+        the new line follows it.
+        """
+        return self.render(replacements={(old, name): new})
+
+
+class CnameIndex(object):
+    """
+    dns.cnameRecords entries parsed once and indexed by alias.
+
+    When an alias is listed more than once the first entry is indexed, as
+    it is the one Pi-hole answers with.
+    """
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        # alias -> (target, ttl)
+        self.aliases = {}
+        self.positions = {}
+        for position, entry in enumerate(self.entries):
+            item = parse_cname(entry)
+            if item is not None and item[0] not in self.aliases:
+                self.aliases[item[0]] = item[1:]
+                self.positions[item[0]] = position
+
+    def get(self, alias):
+        """Return (target, ttl) for an alias, or None."""
+        return self.aliases.get(alias)
+
+    def replace(self, alias, target, ttl=None):
+        """Return the entries with the entry of an alias swapped in place for a new target and TTL."""
+        new_entries = list(self.entries)
+        new_entries[self.positions[alias]] = format_cname(alias, target, ttl)
+        return new_entries
+
+
+def cname_matches(current, target, ttl):
+    """
+    Whether an existing (target, ttl) CNAME already is the requested one.
+
+    Entries written without a TTL match the default TTL, so CNAMEs created
+    as "alias,target" are not rewritten just to spell out the default.
+    """
+    current_target, current_ttl = current
+    return current_target == target and (current_ttl == ttl or (current_ttl is None and ttl == DEFAULT_CNAME_TTL))
+
+
+def format_cname(alias, target, ttl=None):
+    """Return the dns.cnameRecords entry for a CNAME record."""
+    return f"{alias},{target},{ttl}" if ttl is not None else f"{alias},{target}"
+
+
+def update_dns(client, section, entries):
+    """
+    Write a whole dns.hosts or dns.cnameRecords list with one configuration PATCH.
+
+    Raises:
+        PiholeModuleError: When Pi-hole rejects the change
+    """
+    response = client.config.update_config({"dns": {section: entries}})
+    if isinstance(response, dict) and 'error' in response:
+        raise PiholeModuleError(f"Failed to update dns.{section}: {response['error']}")
+    return response
+
+
+def in_domain(name, suffix):
+    """
+    Return whether a name is the domain suffix or a name under it, ignoring case and trailing dots.
+    """
+    name = name.lower().rstrip('.')
+    suffix = suffix.lower().strip('.')
+    return name == suffix or name.endswith('.' + suffix)
+
+
+def plan_hosts(entries, records, purge=False, suffix=None):
+    """
+    Compute the new dns.hosts list for the A and AAAA records.
+
+    Args:
+        entries: The current dns.hosts list, or a HostIndex of it
+        records: Records returned by normalize_records()
+        purge: Also remove the addresses of every name and family without a present record
+        suffix: Limit purge to names in this domain
+
+    Returns:
+        tuple: (new entries, per-record states); purged addresses are added as deleted
+    """
+    index = entries if isinstance(entries, HostIndex) else HostIndex(entries)
+
+    # (name, family) -> addresses that should exist
+    desired = {}
+    for record in records:
+        if record['state'] == 'present':
+            addresses = desired.setdefault((record['name'], FAMILIES[record['type']]), [])
+            if record['data'] not in addresses:
+                addresses.append(record['data'])
+
+    removals = set()
+    additions = []
+    replacements = {}
+    states = {}
+    for (name, family), addresses in desired.items():
+        current = index.addresses(name, family)
+        stale = [ip for ip in current if ip not in addresses]
+        # New addresses take the place of stale ones, so a renumbered record is swapped in place
+        swaps = list(stale)
+        for ip in addresses:
+            if ip in current:
+                states[(name, family, ip)] = 'unchanged'
+            elif swaps:
+                replacements[(swaps.pop(0), name)] = ip
+                states[(name, family, ip)] = 'updated'
+            else:
+                additions.append((ip, name))
+                states[(name, family, ip)] = 'updated' if stale else 'created'
+        removals.update((ip, name) for ip in swaps)
+
+    for record in records:
+        if record['state'] != 'absent':
+            continue
+        name, family, data = record['name'], FAMILIES[record['type']], record['data']
+        current = index.addresses(name, family)
+        targets = [ip for ip in current if data is None or ip == data]
+        removals.update((ip, name) for ip in targets)
+        states[(name, family, data)] = 'deleted' if targets else 'absent_already'
+
+    if purge:
+        for name, families in index.hosts.items():
+            if suffix and not in_domain(name, suffix):
+                continue
+            for family, current in families.items():
+                if (name, family) not in desired:
+                    removals.update((ip, name) for ip in current)
+                    states.update(((name, family, ip), 'deleted') for ip in current)
+
+    # A pair both replaced and removed by an absent record is removed
+    for pair in removals & set(replacements):
+        additions.append((replacements.pop(pair), pair[1]))
+    return index.render(removals, additions, replacements), states
+
+
+def plan_cnames(entries, records):
+    """
+    Compute the new dns.cnameRecords list for the CNAME records.
+
+    Returns:
+        tuple: (new entries, per-record states)
+    """
+    index = entries if isinstance(entries, CnameIndex) else CnameIndex(entries)
+    existing = dict(index.positions)
+    current = dict(index.aliases)
+
+    new_entries = list(index.entries)
+    dropped = set()
+    states = {}
+    for record in records:
+        name = record['name']
+        position = existing.get(name)
+        if record['state'] == 'present':
+            wanted = format_cname(name, record['data'], record['ttl'])
+            if position is None:
+                new_entries.append(wanted)
+                existing[name] = len(new_entries) - 1
+                states[(name, record['data'])] = 'created'
+            elif cname_matches(current[name], record['data'], record['ttl']):
+                states[(name, record['data'])] = 'unchanged'
+            else:
+                # Replace the entry in place so its position in the list is kept
+                new_entries[position] = wanted
+                states[(name, record['data'])] = 'updated'
+            current[name] = (record['data'], record['ttl'])
+        else:
+            if position is None or position in dropped:
+                states[(name, record['data'])] = 'absent_already'
+            else:
+                dropped.add(position)
+                states[(name, record['data'])] = 'deleted'
+
+    return [entry for position, entry in enumerate(new_entries) if position not in dropped], states
+
+
+def diff_hosts(diff, before, after):
+    """
+    Record the per-name differences between two dns.hosts lists in an ItemDiff.
+    """
+    def addresses(entries):
+        index = entries if isinstance(entries, HostIndex) else HostIndex(entries)
+        return {name: dict(addresses=sorted(index.addresses(name))) for name in index.hosts}
+
+    before, after = addresses(before), addresses(after)
+    for name in sorted(set(before) | set(after)):
+        diff.add(name, before.get(name), after.get(name))
+
+
+def diff_cnames(diff, before, after):
+    """
+    Record the per-alias differences between two dns.cnameRecords lists in an ItemDiff.
+    """
+    def targets(entries):
+        index = entries if isinstance(entries, CnameIndex) else CnameIndex(entries)
+        return {name: dict(target=target, ttl=ttl) for name, (target, ttl) in index.aliases.items()}
+
+    before, after = targets(before), targets(after)
+    for name in sorted(set(before) | set(after)):
+        diff.add(name, before.get(name), after.get(name))
+
+
+def normalize_records(records, default_state):
+    """
+    Validate local record definitions and fill in their state.
+
+    Args:
+        records: Record dicts with name, type, data, ttl and state
+        default_state: State for records that do not set one
+
+    Returns:
+        list: The records with 'state' set
+
+    Raises:
+        PiholeModuleError: For records missing data, addresses of the wrong
+                           family and records listed as both present and absent
+    """
+    normalized = []
+    present = set()
+    for record in records:
+        record = dict(record, state=record.get('state') or default_state)
+        record.setdefault('data', None)
+        record.setdefault('ttl', DEFAULT_CNAME_TTL)
+        if record['state'] == 'present' and not record['data']:
+            raise PiholeModuleError(f"Record {record['type']} {record['name']} needs 'data' to be present")
+        if record['type'] in FAMILIES and record['data'] is not None \
+                and address_family(record['data']) != FAMILIES[record['type']]:
+            raise PiholeModuleError(f"'{record['data']}' is not a valid address for {record['type']} record {record['name']}")
+        if record['state'] == 'present':
+            present.add((record['type'], record['name'], record['data']))
+        normalized.append(record)
+
+    for record in normalized:
+        if record['state'] == 'absent' and (record['type'], record['name'], record['data']) in present:
+            raise PiholeModuleError(f"Record {record['type']} {record['name']} {record['data']} is listed as both present and absent")
+
+    return normalized
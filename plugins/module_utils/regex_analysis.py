@@ -0,0 +1,571 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import re
+import signal
+import threading
+import time
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+# Patterns whose search over the synthetic corpus takes longer are reported as slow
+DEFAULT_SLOW_MS = 10.0
+
+# A single pattern is given up on after this many seconds and reported as timed out
+PATTERN_TIMEOUT = 1.0
+
+# Sample domains generated per pattern to test whether another pattern matches all of them
+WITNESS_LIMIT = 128
+
+# Longest name a DNS query can carry
+MAX_DOMAIN_LENGTH = 253
+
+# Pattern searches spent at most on overlap hints and covered exact domains; the report is truncated beyond it
+MAX_SEARCHES = 200000
+
+# FTL regular expressions are POSIX extended expressions; character class names Python does not know
+POSIX_CLASSES = {
+    'alpha': 'a-zA-Z',
+    'digit': '0-9',
+    'alnum': 'a-zA-Z0-9',
+    'upper': 'A-Z',
+    'lower': 'a-z',
+    'xdigit': '0-9a-fA-F',
+    'space': r'\s',
+    'blank': r' \t',
+    'punct': r'!-/:-@\[-`{-~',
+    'word': r'\w',
+}
+
+# Options of a Pi-hole regex that still block every query the pattern matches
+NARROWING_OPTIONS = ('querytype=',)
+
+_LITERAL = sre_constants.LITERAL
+_NOT_LITERAL = sre_constants.NOT_LITERAL
+_ANY = sre_constants.ANY
+_IN = sre_constants.IN
+_AT = sre_constants.AT
+_SUBPATTERN = sre_constants.SUBPATTERN
+_BRANCH = sre_constants.BRANCH
+_MAX_REPEAT = sre_constants.MAX_REPEAT
+_MIN_REPEAT = sre_constants.MIN_REPEAT
+_MAXREPEAT = sre_constants.MAXREPEAT
+_GROUPREF = sre_constants.GROUPREF
+_NEGATE = sre_constants.NEGATE
+_RANGE = sre_constants.RANGE
+_CATEGORY = sre_constants.CATEGORY
+
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: lambda ch: ch.isdigit(),
+    sre_constants.CATEGORY_NOT_DIGIT: lambda ch: not ch.isdigit(),
+    sre_constants.CATEGORY_SPACE: lambda ch: ch.isspace(),
+    sre_constants.CATEGORY_NOT_SPACE: lambda ch: not ch.isspace(),
+    sre_constants.CATEGORY_WORD: lambda ch: ch.isalnum() or ch == '_',
+    sre_constants.CATEGORY_NOT_WORD: lambda ch: not (ch.isalnum() or ch == '_'),
+}
+
+# Characters tried for character classes, besides the ones the class names itself
+_CLASS_POOL = 'amz059-._'
+
+# Text put around sample domains so unanchored patterns are also tested inside longer names
+_PREFIXES = ('', 'zq', 'zq.')
+_SUFFIXES = ('', 'zq', '.zq')
+
+# Realistic names every pattern is timed against, besides the adversarial ones built per pattern
+BASE_CORPUS = [
+    'example.com',
+    'www.example.com',
+    'ads.example.net',
+    'pagead2.googlesyndication.com',
+    'r3---sn-4g5e6nsz.googlevideo.com',
+    'a1b2c3d4e5f6.cloudfront.net',
+    'api.eu-west-1.amazonaws.com',
+    'xn--bcher-kva.example',
+    'tracker-01.metrics.example.co.uk',
+    '.'.join(['sub'] * 60),
+    '.'.join(['a'] * 126),
+    'a' * 63 + '.' + 'b' * 63 + '.' + 'c' * 63 + '.' + 'd' * 61,
+    '-'.join(['x1'] * 84),
+]
+
+
+class _PatternTimeout(Exception):
+    pass
+
+
+def split_options(pattern):
+    """
+    Split a Pi-hole regex into the expression and its FTL options.
+
+    Returns:
+        tuple: The expression and a sorted tuple of options like 'querytype=A' or 'invert'
+    """
+    expression, _, options = pattern.partition(';')
+    options = tuple(sorted(option.strip() for option in options.split(';') if option.strip()))
+    return expression, options
+
+
+def to_python(expression):
+    """Translate the POSIX character classes of an FTL expression into ones Python understands."""
+    return re.sub(r'\[:(\w+):\]', lambda m: POSIX_CLASSES.get(m.group(1), m.group(0)), expression)
+
+
+def _contains(data, opcode):
+    for op, av in data:
+        if op == opcode:
+            return True
+        if op == _SUBPATTERN and _contains(av[-1], opcode):
+            return True
+        if op == _BRANCH and any(_contains(alt, opcode) for alt in av[1]):
+            return True
+        if op in (_MAX_REPEAT, _MIN_REPEAT) and _contains(av[2], opcode):
+            return True
+    return False
+
+
+def _nested_repeat(data, repeated=False):
+    """Whether an unbounded repeat sits inside another repeat, the shape of catastrophic backtracking."""
+    for op, av in data:
+        if op in (_MAX_REPEAT, _MIN_REPEAT):
+            if repeated and av[1] == _MAXREPEAT:
+                return True
+            if _nested_repeat(av[2], repeated or av[1] > 1):
+                return True
+        elif op == _SUBPATTERN and _nested_repeat(av[-1], repeated):
+            return True
+        elif op == _BRANCH and any(_nested_repeat(alt, repeated) for alt in av[1]):
+            return True
+    return False
+
+
+def _canonical(data):
+    """
+    Canonical form of a parsed expression.
+
+    Group numbers, the order of alternatives, greedy versus lazy repeats and
+    single character classes are normalized away, so two expressions with
+    the same canonical form match the same names.
+    """
+    items = []
+    for op, av in data:
+        if op == _SUBPATTERN:
+            items.extend(_canonical(av[-1]))
+        elif op == _BRANCH:
+            alternatives = sorted(set(_canonical(alt) for alt in av[1]), key=repr)
+            items.append(('branch', tuple(alternatives)) if len(alternatives) > 1 else ('seq', alternatives[0]))
+        elif op in (_MAX_REPEAT, _MIN_REPEAT):
+            low, high, body = av
+            if low == high == 1:
+                items.extend(_canonical(body))
+            else:
+                items.append(('repeat', low, high, _canonical(body)))
+        elif op == _IN and len(av) == 1 and av[0][0] == _LITERAL:
+            items.append(('literal', chr(av[0][1]).lower()))
+        elif op == _LITERAL:
+            items.append(('literal', chr(av).lower()))
+        elif op == _IN:
+            items.append(('in', tuple(sorted(repr(item) for item in av))))
+        else:
+            items.append((str(op), repr(av)))
+    return tuple(items)
+
+
+def _required_literal(data):
+    """Longest run of plain characters every match contains, lowercase, or None."""
+    runs = ['']
+    for op, av in data:
+        if op == _LITERAL:
+            runs[-1] += chr(av).lower()
+        elif op == _IN and len(av) == 1 and av[0][0] == _LITERAL:
+            runs[-1] += chr(av[0][1]).lower()
+        elif op != _AT:
+            runs.append('')
+    longest = max(runs, key=len)
+    return longest if len(longest) > 1 else None
+
+
+def _in_class(items, ch):
+    negate = False
+    for op, av in items:
+        if op == _NEGATE:
+            negate = True
+            continue
+        for variant in set((ch, ch.lower(), ch.upper())):
+            if op == _LITERAL and ord(variant) == av:
+                return not negate
+            if op == _RANGE and av[0] <= ord(variant) <= av[1]:
+                return not negate
+            if op == _CATEGORY:
+                test = _CATEGORIES.get(av)
+                if test is None:
+                    return None
+                if test(variant):
+                    return not negate
+    return negate
+
+
+def _class_samples(items):
+    candidates = []
+    for op, av in items:
+        if op == _LITERAL:
+            candidates.append(chr(av))
+        elif op == _RANGE:
+            candidates.extend([chr(av[0]), chr((av[0] + av[1]) // 2), chr(av[1])])
+    candidates.extend(_CLASS_POOL)
+    samples = []
+    for ch in candidates:
+        member = _in_class(items, ch)
+        if member is None:
+            return None
+        if member and ch not in samples:
+            samples.append(ch)
+    return samples[:5]
+
+
+def _thin(strings):
+    strings = list(dict.fromkeys(strings))
+    if len(strings) <= WITNESS_LIMIT:
+        return strings
+    step = len(strings) / WITNESS_LIMIT
+    return [strings[int(index * step)] for index in range(WITNESS_LIMIT)]
+
+
+def _sequence_samples(data):
+    results = ['']
+    for op, av in data:
+        options = _node_samples(op, av)
+        if not options:
+            return None
+        results = _thin([head + tail for head in results for tail in options])
+    return results
+
+
+def _node_samples(op, av):
+    if op == _LITERAL:
+        return [chr(av)]
+    if op == _NOT_LITERAL:
+        return [ch for ch in 'a0' if ord(ch) != av][:1] + ['.']
+    if op == _ANY:
+        return ['a', '5', '.']
+    if op == _IN:
+        return _class_samples(av)
+    if op == _AT:
+        return ['']
+    if op == _SUBPATTERN:
+        return _sequence_samples(av[-1])
+    if op == _BRANCH:
+        samples = []
+        for alternative in av[1]:
+            alternative_samples = _sequence_samples(alternative)
+            if alternative_samples is None:
+                return None
+            samples.extend(alternative_samples)
+        return _thin(samples)
+    if op in (_MAX_REPEAT, _MIN_REPEAT):
+        low, high, body = av
+        body_samples = _sequence_samples(body)
+        if body_samples is None:
+            return None
+        counts = [low]
+        for extra in (1, 3, 12):
+            if high == _MAXREPEAT or low + extra <= high:
+                counts.append(low + extra)
+        samples = [sample * count for sample in body_samples for count in counts]
+        # One mixed repetition, so patterns that only accept one of the alternatives over and over are told apart
+        count = counts[-1]
+        samples.append(''.join(body_samples[index % len(body_samples)] for index in range(count)))
+        return _thin([sample for sample in samples if len(sample) <= MAX_DOMAIN_LENGTH])
+    return None
+
+
+class _Regex(object):
+    """One regex entry prepared for the analysis."""
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.expression, self.options = split_options(entry['domain'])
+        self.error = None
+        self.compiled = None
+        self.canonical = None
+        self.witnesses = None
+        self.samples = []
+        self.literal = None
+        self.hints = []
+        self.milliseconds = None
+        self.timed_out = False
+        try:
+            parsed = sre_parse.parse(to_python(self.expression), re.IGNORECASE)
+            self.compiled = re.compile(to_python(self.expression), re.IGNORECASE)
+        except (re.error, OverflowError, RecursionError) as e:
+            self.error = str(e)
+            return
+        data = list(parsed)
+        self.canonical = _canonical(data)
+        if _contains(data, _GROUPREF):
+            self.hints.append('backreference')
+            return
+        if _nested_repeat(data):
+            self.hints.append('nested quantifier')
+        self.literal = _required_literal(data)
+        self.samples = _sequence_samples(data) or []
+
+    def find_witnesses(self):
+        """Keep the samples, alone or inside longer names, that the pattern itself matches."""
+        self.witnesses = _thin([
+            prefix + sample + suffix
+            for sample in self.samples for prefix in _PREFIXES for suffix in _SUFFIXES
+            if len(prefix + sample + suffix) <= MAX_DOMAIN_LENGTH
+            and self.compiled.search(prefix + sample + suffix)
+        ]) or None
+
+    @property
+    def usable(self):
+        """Whether the regex can stand in for others: compiled, reasonably fast and without backreferences."""
+        return self.compiled is not None and not self.timed_out and 'backreference' not in self.hints
+
+    def adversarial_corpus(self):
+        """Long names built from the pattern's own samples that almost, but not quite, match."""
+        corpus = []
+        for sample in self.samples[:4]:
+            core = sample.strip('.') or 'a'
+            corpus.append((core * (MAX_DOMAIN_LENGTH // len(core) + 1))[:MAX_DOMAIN_LENGTH - 1] + '!')
+            corpus.append(core[0] * (MAX_DOMAIN_LENGTH - 1) + '!')
+        return corpus
+
+
+def _with_timeout(seconds, function):
+    """
+    Run function, interrupting it after seconds when running in the main thread.
+
+    Python's regular expression engine checks for signals while it backtracks,
+    so an alarm stops a runaway pattern. Outside the main thread no alarm can
+    be set and the function runs to completion.
+    """
+    if threading.current_thread() is not threading.main_thread() or not hasattr(signal, 'setitimer'):
+        return function()
+
+    def expire(signum, frame):
+        raise _PatternTimeout()
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        return function()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _time_regex(regex):
+    corpus = BASE_CORPUS + regex.adversarial_corpus()
+
+    def run():
+        started = time.perf_counter()
+        for name in corpus:
+            regex.compiled.search(name)
+        return time.perf_counter() - started
+
+    try:
+        regex.milliseconds = round(_with_timeout(PATTERN_TIMEOUT, run) * 1000, 3)
+        # Matching the samples is cheap for any pattern that got through the corpus, but is guarded all the same
+        _with_timeout(PATTERN_TIMEOUT, regex.find_witnesses)
+    except _PatternTimeout:
+        regex.milliseconds = max(regex.milliseconds or 0, round(PATTERN_TIMEOUT * 1000, 3))
+        regex.timed_out = True
+
+
+def _groups(entry):
+    return frozenset(entry.get('groups') or ['Default'])
+
+
+def _can_replace(keeper, entry):
+    """Whether dropping entry in favour of keeper leaves every query of the same groups handled the same way."""
+    return keeper['type'] == entry['type'] and keeper['enabled'] and _groups(entry) <= _groups(keeper)
+
+
+def _duplicates(keeper, regex):
+    """
+    Whether the keeper regex provably matches every query the other one matches.
+
+    Both must parse to the same canonical expression. A regex with options
+    like ;invert or ;reply= is only a duplicate of one with the same options;
+    one limited to query types is also a duplicate of the same expression
+    without options.
+    """
+    if keeper is regex or keeper.compiled is None or not _can_replace(keeper.entry, regex.entry):
+        return False
+    if keeper.canonical != regex.canonical:
+        return False
+    narrowing = all(option.startswith(NARROWING_OPTIONS) for option in regex.options)
+    return keeper.options == regex.options or (narrowing and not keeper.options)
+
+
+def _overlaps(keeper, regex, budget):
+    """Whether the keeper regex matches every sample name of the other one; a hint, not a proof."""
+    if keeper is regex or not keeper.usable or not _can_replace(keeper.entry, regex.entry):
+        return False
+    narrowing = all(option.startswith(NARROWING_OPTIONS) for option in regex.options)
+    if not narrowing or not (keeper.options == regex.options or not keeper.options):
+        return False
+    return all(budget.spend() and keeper.compiled.search(witness) for witness in regex.witnesses)
+
+
+# Length of the literal slices regexes are bucketed by
+_GRAM = 4
+
+
+def _grams(text, sizes=(2, 3, _GRAM)):
+    return set(text[index:index + size] for size in sizes for index in range(len(text) - size + 1))
+
+
+class _LiteralIndex(object):
+    """
+    Regexes bucketed by a slice of their required literal.
+
+    A regex can only match a name containing its literal, so a name is only
+    tried against the buckets of the slices it contains and the regexes
+    without a literal, instead of against every regex. Each regex is filed
+    under the slice of its literal that is rarest among all literals, which
+    keeps buckets small even when many literals share a prefix.
+    """
+
+    def __init__(self, regexes):
+        self.positions = dict((id(regex), position) for position, regex in enumerate(regexes))
+        self.by_gram = {}
+        self.unindexed = []
+        counts = {}
+        for regex in regexes:
+            for gram in _grams(regex.literal or '', (_GRAM,)):
+                counts[gram] = counts.get(gram, 0) + 1
+        for regex in regexes:
+            if len(regex.literal or '') < 2:
+                self.unindexed.append(regex)
+                continue
+            grams = _grams(regex.literal, (_GRAM,))
+            key = min(sorted(grams), key=counts.get) if grams else regex.literal
+            self.by_gram.setdefault(key, []).append(regex)
+
+    def candidates(self, text):
+        """The regexes that may match text, in the order they were indexed."""
+        found = [regex for gram in _grams(text) for regex in self.by_gram.get(gram, ()) if regex.literal in text]
+        return sorted(found + self.unindexed, key=lambda regex: self.positions[id(regex)])
+
+
+class _Budget(object):
+    """Counts pattern searches against MAX_SEARCHES."""
+
+    def __init__(self, searches=MAX_SEARCHES):
+        self.left = searches
+        self.exhausted = False
+
+    def spend(self):
+        if self.left <= 0:
+            self.exhausted = True
+            return False
+        self.left -= 1
+        return True
+
+
+def _describe(entry):
+    return dict(domain=entry['domain'], type=entry['type'])
+
+
+def analyze_domains(entries, slow_ms=DEFAULT_SLOW_MS):
+    """
+    Find redundant and expensive entries among the exact and regex entries about to be pushed.
+
+    Only enabled entries with state present are considered. An entry counts
+    as redundant when another entry of the same type, enabled and applying to
+    at least the same groups, provably matches every name it matches:
+
+      - duplicate: a regex written differently that parses to the same expression
+      - covered: an exact domain one of the remaining regexes matches
+
+    Regexes matching every sample name generated from another regex are
+    reported as overlaps. Samples do not prove that one regex covers another,
+    so overlaps are hints only and never returned as redundant.
+
+    Duplicates are found by grouping regexes on their canonical form. Overlaps
+    and covered domains only try the regexes whose required literal occurs in
+    the name, and stop with 'truncated' set after MAX_SEARCHES searches.
+    Timings come from Python's backtracking engine, not FTL's, and rank
+    patterns by cost rather than predict resolver latency.
+
+    Args:
+        entries: Iterable of entries with 'domain', 'type', 'kind', 'groups', 'enabled' and 'state'
+        slow_ms: Milliseconds over the synthetic corpus above which a regex is reported as slow
+
+    Returns:
+        tuple: The analysis report and the list of redundant entries, dropped in that order
+    """
+    active = [entry for entry in entries if entry['state'] == 'present' and entry['enabled']]
+    regexes = [_Regex(entry) for entry in active if entry['kind'] == 'regex']
+    exact = [entry for entry in active if entry['kind'] == 'exact']
+
+    report = dict(regexes=len(regexes), exact=len(exact), invalid=[], slow=[], duplicates=[], overlaps=[],
+                  covered=[], truncated=False)
+
+    for regex in regexes:
+        if regex.error is not None:
+            report['invalid'].append(dict(_describe(regex.entry), error=regex.error))
+            continue
+        _time_regex(regex)
+        if regex.timed_out or regex.milliseconds > slow_ms:
+            report['slow'].append(dict(_describe(regex.entry), milliseconds=regex.milliseconds,
+                                       timed_out=regex.timed_out, hints=regex.hints))
+
+    # Within one canonical form, regexes without options and for more groups are kept first
+    buckets = {}
+    for regex in regexes:
+        if regex.error is None:
+            buckets.setdefault(regex.canonical, []).append(regex)
+    redundant = []
+    dropped = set()
+    for bucket in buckets.values():
+        kept = []
+        for regex in sorted(bucket, key=lambda regex: (bool(regex.options), -len(_groups(regex.entry)))):
+            keeper = next((keeper for keeper in kept if _duplicates(keeper, regex)), None)
+            if keeper is None:
+                kept.append(regex)
+                continue
+            report['duplicates'].append(dict(_describe(regex.entry), duplicate_of=keeper.entry['domain']))
+            redundant.append(regex.entry)
+            dropped.add(id(regex))
+    kept = [regex for regex in regexes if regex.error is None and id(regex) not in dropped]
+
+    budget = _Budget()
+    index = _LiteralIndex([regex for regex in kept if regex.usable])
+    hinted = set()
+    for regex in kept:
+        if not regex.witnesses or budget.exhausted:
+            continue
+        shortest = min(regex.witnesses, key=len).lower()
+        keeper = next((keeper for keeper in index.candidates(shortest)
+                       if (id(regex), id(keeper)) not in hinted and _overlaps(keeper, regex, budget)), None)
+        if keeper is not None:
+            hinted.add((id(keeper), id(regex)))
+            report['overlaps'].append(dict(_describe(regex.entry), likely_subsumed_by=keeper.entry['domain']))
+
+    keepers = [regex for regex in kept if regex.usable and not regex.options]
+    for domain_type in set(entry['type'] for entry in exact):
+        index = _LiteralIndex([regex for regex in keepers if regex.entry['type'] == domain_type])
+        for entry in exact:
+            if entry['type'] != domain_type or budget.exhausted:
+                continue
+            domain = entry['domain'].lower()
+            keeper = next((regex for regex in index.candidates(domain)
+                           if _can_replace(regex.entry, entry) and budget.spend() and regex.compiled.search(domain)),
+                          None)
+            if keeper is not None:
+                report['covered'].append(dict(_describe(entry), covered_by=keeper.entry['domain']))
+                redundant.append(entry)
+
+    report['truncated'] = budget.exhausted
+    return report, redundant
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import random
+import threading
+
+try:
+    from urllib3.exceptions import MaxRetryError, ResponseError
+    from urllib3.util.retry import Retry
+    HAS_URLLIB3 = True
+except ImportError:
+    Retry = object
+    HAS_URLLIB3 = False
+
+# Methods that may be sent again after the server saw them; connection
+# errors are retried for every method since the request never left
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+# Responses worth another attempt: rate limiting and FTL restarting or overloaded
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Upper bound for a single wait, whatever the backoff or a Retry-After header ask for
+MAX_RETRY_DELAY = 30
+
+_BUDGET_LOCK = threading.Lock()
+
+
+class RetryBudget(object):
+    """
+    Retries left for a whole module run, shared by all its connections and threads.
+
+    Once it is spent, failing requests fail at once instead of every
+    request of a large batch waiting through its own retries.
+    """
+
+    def __init__(self, total):
+        self.lock = threading.Lock()
+        self.left = max(0, total)
+        self.used = 0
+
+    def take(self):
+        with self.lock:
+            if self.left <= 0:
+                return False
+            self.left -= 1
+            self.used += 1
+            return True
+
+
+class RequestRetry(Retry):
+    """
+    urllib3 Retry with jittered exponential backoff, a capped Retry-After and a shared RetryBudget.
+
+    Only idempotent methods are retried after the server answered or the
+    connection broke mid-request; refused connections are retried for all
+    methods. Responses are returned once the retries are used up, so the
+    caller sees the server's error rather than a retry error.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.budget = kwargs.pop('budget', None)
+        super(RequestRetry, self).__init__(*args, **kwargs)
+
+    def new(self, **kw):
+        retry = super(RequestRetry, self).new(**kw)
+        retry.budget = self.budget
+        return retry
+
+    def get_backoff_time(self):
+        attempts = len([entry for entry in self.history if entry.redirect_location is None])
+        if attempts == 0 or not self.backoff_factor:
+            return 0
+        delay = min(MAX_RETRY_DELAY, self.backoff_factor * (2 ** (attempts - 1)))
+        # Equal jitter: at least half the delay, so instances failing together do not retry together
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def get_retry_after(self, response):
+        retry_after = super(RequestRetry, self).get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(MAX_RETRY_DELAY, retry_after)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super(RequestRetry, self).increment(method=method, url=url, response=response, error=error,
+                                                    _pool=_pool, _stacktrace=_stacktrace)
+        if self.budget is not None and not self.budget.take():
+            reason = error or ResponseError('retry budget exhausted')
+            raise MaxRetryError(_pool, url, reason)
+        return retry
+
+
+def request_retry(retries, backoff, budget):
+    """
+    Build the Retry policy for one connection.
+
+    Args:
+        retries: Attempts after the first one for a single request
+        backoff: Base delay in seconds, doubled on every attempt
+        budget: RetryBudget shared by the module run, or None for no limit
+
+    Returns:
+        RequestRetry: The policy, or None without urllib3
+    """
+    if not HAS_URLLIB3:
+        return None
+    return RequestRetry(
+        total=max(0, retries),
+        allowed_methods=IDEMPOTENT_METHODS,
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=backoff,
+        raise_on_status=False,
+        respect_retry_after_header=True,
+        budget=budget,
+    )
+
+
+def module_retry_budget(module):
+    """Return the RetryBudget shared by every connection of the module run."""
+    with _BUDGET_LOCK:
+        budget = getattr(module, '_pihole_retry_budget', None)
+        if budget is None:
+            budget = module._pihole_retry_budget = RetryBudget(module.params.get('retry_budget', 30))
+    return budget
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError
+
+
+def _items(response, key):
+    if not isinstance(response, dict) or 'error' in response:
+        error = response.get('error') if isinstance(response, dict) else response
+        raise PiholeModuleError(f"Failed to fetch {key}: {error}")
+    return response.get(key, [])
+
+
+def _config(client, element):
+    response = client.config.get_config_section(element)
+    if not isinstance(response, dict) or 'error' in response:
+        error = response.get('error') if isinstance(response, dict) else response
+        raise PiholeModuleError(f"Failed to fetch {element} configuration: {error}")
+    return response.get('config', {}).get(element, {})
+
+
+# Section name -> callable fetching it with one GET
+SECTION_FETCHERS = {
+    'groups': lambda client: _items(client.group_management.get_groups(), 'groups'),
+    'clients': lambda client: _items(client.client_management.get_clients(), 'clients'),
+    'lists': lambda client: _items(client.list_management.get_lists(), 'lists'),
+    # get_all_domains() makes two requests and skips regex entries; GET /api/domains returns everything
+    'domains': lambda client: _items(client.connection.get('domains'), 'domains'),
+    'dns': lambda client: _config(client, 'dns'),
+    'dhcp': lambda client: _config(client, 'dhcp'),
+    'leases': lambda client: _items(client.dhcp.get_leases(), 'leases'),
+    'devices': lambda client: _items(client.network_info.get_devices(), 'devices'),
+}
+
+SECTIONS = list(SECTION_FETCHERS)
+
+
+def take_snapshot(client, sections, max_workers=None):
+    """
+    Read the given sections of one instance concurrently.
+
+    Args:
+        client: PiHole6Client instance
+        sections: Names from SECTIONS
+        max_workers: Optional bound on concurrent requests
+
+    Returns:
+        dict: The snapshot, holding url, collected and one key per section
+    """
+    # base_url is the instance URL with '/api/' appended
+    snapshot = dict(url=client.connection.base_url[:-len('api/')].rstrip('/'), collected=time.time())
+    workers = max(1, min(max_workers or len(sections), len(sections)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {section: executor.submit(SECTION_FETCHERS[section], client) for section in sections}
+        for section, future in futures.items():
+            snapshot[section] = future.result()
+    return snapshot
+
+
+def collect_sections(module, client, sections):
+    """
+    Return the given sections, reading only those the current_state snapshot lacks.
+
+    Missing sections are read concurrently like take_snapshot() does.
+
+    Returns:
+        dict: Section name -> section
+    """
+    collected = {}
+    missing = []
+    for section in sections:
+        value = snapshot_section(module, client, section)
+        if value is None:
+            missing.append(section)
+        else:
+            collected[section] = value
+    if missing:
+        snapshot = take_snapshot(client, missing)
+        collected.update((section, snapshot[section]) for section in missing)
+    return collected
+
+
+def current_state_argument_spec():
+    """
+    The current_state option of modules that can start from a snapshot.
+
+    Documented in the sbarbett.pihole.current_state doc fragment.
+    """
+    return dict(
+        current_state=dict(type='raw', required=False, default=None),
+    )
+
+
+def _api_url(url):
+    return url.rstrip('/') + '/api/'
+
+
+def _snapshots(value):
+    """Yield the snapshots held by a current_state value."""
+    if isinstance(value, list):
+        for item in value:
+            for snapshot in _snapshots(item):
+                yield snapshot
+    elif isinstance(value, dict):
+        # A registered pihole_facts result, or one of its instances
+        if isinstance(value.get('instances'), list):
+            for snapshot in _snapshots(value['instances']):
+                yield snapshot
+        elif isinstance(value.get('state'), dict):
+            yield value['state']
+        elif 'url' in value:
+            yield value
+
+
+def snapshot_section(module, client, section):
+    """
+    Return a section of the current_state snapshot taken from the client's instance.
+
+    Snapshots are matched to the client by URL, so one current_state value
+    can hold the snapshots of every instance a module runs against.
+
+    Returns:
+        The section, or None when the module has to fetch it itself
+    """
+    value = module.params.get('current_state')
+    if not value:
+        return None
+    base_url = client.connection.base_url
+    for snapshot in _snapshots(value):
+        if isinstance(snapshot.get('url'), str) and _api_url(snapshot['url']) == base_url:
+            return snapshot.get(section)
+    return None
+
+
+def config_section(module, client, element):
+    """
+    get_config_section() that is answered from the current_state snapshot when possible.
+
+    Args:
+        module: AnsibleModule using current_state_argument_spec()
+        client: PiHole6Client instance
+        element: Configuration path such as 'dns/hosts'
+
+    Returns:
+        dict: The same {'config': {...}} shape the API returns
+    """
+    path = element.split('/')
+    value = snapshot_section(module, client, path[0])
+    if value is None or path[0] not in ('dns', 'dhcp'):
+        return client.config.get_config_section(element)
+    for key in path[1:]:
+        value = value.get(key) if isinstance(value, dict) else None
+    if value is None:
+        # A snapshot without this setting cannot answer for it
+        return client.config.get_config_section(element)
+    for key in reversed(path):
+        value = {key: value}
+    return {'config': value}
+
+
+def config_list(module, client, element):
+    """
+    Return the list at a configuration path such as 'dns/hosts', through config_section().
+
+    Pi-hole leaves out empty lists in some versions, so a missing or null
+    value is returned as an empty list.
+
+    Args:
+        module: AnsibleModule using current_state_argument_spec()
+        client: PiHole6Client instance
+        element: Configuration path of a list such as 'dns/cnameRecords'
+
+    Returns:
+        list: The entries of the list
+    """
+    value = config_section(module, client, element).get('config', {})
+    for key in element.split('/'):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value or []
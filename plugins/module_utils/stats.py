@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import math
+import threading
+
+_REGISTRY_LOCK = threading.Lock()
+
+# First path segment -> index of the segment holding an item name
+_ITEM_SEGMENT = {
+    'groups': 1,
+    'clients': 1,
+    'lists': 1,
+    'dhcp': 2,
+    'network': 2,
+    'history': 2,
+}
+
+
+def endpoint_template(method, endpoint):
+    """
+    Collapse item names out of an API path so requests for different items count together.
+
+    For example PUT groups/IOT becomes groups/{item}, DELETE
+    config/dns/hosts/<entry> becomes config/dns/hosts/{value} and
+    domains/allow/exact/<domain> becomes domains/allow/exact/{domain}.
+    Batch endpoints such as groups:batchDelete are kept as they are.
+    """
+    path = endpoint.split('?', 1)[0].strip('/')
+    parts = path.split('/')
+    head = parts[0]
+    if head == 'config' and method in ('PUT', 'DELETE') and len(parts) > 3:
+        return '/'.join(parts[:-1]) + '/{value}'
+    if head == 'domains' and len(parts) > 3:
+        return '/'.join(parts[:3]) + '/{domain}'
+    index = _ITEM_SEGMENT.get(head)
+    if index is not None and len(parts) > index:
+        return '/'.join(parts[:index]) + '/{item}'
+    return path
+
+
+def _percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers, 0 for an empty list."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[max(0, int(math.ceil(percent / 100.0 * len(ordered))) - 1)]
+
+
+class ApiStats(object):
+    """
+    Request counters of one connection, or of every connection a module used.
+
+    Connections record into their own instance from their worker thread;
+    merge() combines them for the module result.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.latencies = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.logins = 0
+
+    def record_request(self, method, endpoint, seconds):
+        key = f'{method} {endpoint_template(method, endpoint)}'
+        with self.lock:
+            entry = self.endpoints.setdefault(key, {'count': 0, 'seconds': 0.0})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            self.latencies.append(seconds)
+
+    def record_bytes(self, sent, received):
+        with self.lock:
+            self.bytes_out += sent
+            self.bytes_in += received
+
+    def record_login(self):
+        with self.lock:
+            self.logins += 1
+
+    @classmethod
+    def merge(cls, stats):
+        merged = cls()
+        for item in stats:
+            with item.lock:
+                for key, entry in item.endpoints.items():
+                    target = merged.endpoints.setdefault(key, {'count': 0, 'seconds': 0.0})
+                    target['count'] += entry['count']
+                    target['seconds'] += entry['seconds']
+                merged.latencies.extend(item.latencies)
+                merged.bytes_in += item.bytes_in
+                merged.bytes_out += item.bytes_out
+                merged.logins += item.logins
+        return merged
+
+    def as_dict(self):
+        """Return the counters in the shape of the api_stats return value."""
+        with self.lock:
+            return {
+                'requests': len(self.latencies),
+                'logins': self.logins,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'total_seconds': round(sum(self.latencies), 4),
+                'p95_seconds': round(_percentile(self.latencies, 95), 4),
+                'endpoints': dict(
+                    (key, {'count': entry['count'], 'seconds': round(entry['seconds'], 4)})
+                    for key, entry in sorted(self.endpoints.items())
+                ),
+            }
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    if isinstance(body, bytes):
+        return len(body)
+    return 0
+
+
+def count_bytes_hook(stats):
+    """
+    Build a requests response hook that adds request and response body sizes to stats.
+
+    Received bytes are counted as they came over the wire, so compressed
+    responses count with their compressed size. Streamed responses are
+    counted by their Content-Length, if any, so the hook never consumes a
+    body the caller reads incrementally.
+    """
+    def hook(response, *args, **kwargs):
+        sent = _body_size(response.request.body)
+        if kwargs.get('stream'):
+            received = int(response.headers.get('Content-Length') or 0)
+        else:
+            content = response.content or b''
+            try:
+                received = response.raw.tell() or len(content)
+            except Exception:
+                received = len(content)
+        stats.record_bytes(sent, received)
+        return response
+    return hook
+
+
+def module_api_stats(module):
+    """
+    Return a new ApiStats for one connection of the module.
+
+    The counters of every connection the module opens are kept on the
+    module, so api_stats_result() can add them up when the module exits.
+    """
+    stats = ApiStats()
+    with _REGISTRY_LOCK:
+        if getattr(module, '_pihole_api_stats', None) is None:
+            module._pihole_api_stats = []
+        module._pihole_api_stats.append(stats)
+    return stats
+
+
+def api_stats_result(module):
+    """
+    Return the api_stats key of the module result.
+
+    Adds up the counters of every connection the module opened. Empty when
+    the api_stats option is off, so it can be passed to exit_json() and
+    fail_json() unconditionally.
+    """
+    with _REGISTRY_LOCK:
+        registry = list(getattr(module, '_pihole_api_stats', None) or [])
+    if not registry:
+        return {}
+    return dict(api_stats=ApiStats.merge(registry).as_dict())
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import io
+import json
+import os
+import posixpath
+import re
+import sqlite3
+import tempfile
+import zipfile
+
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError
+
+# Import section -> the flags it sets in the "import" field of POST /api/teleporter
+IMPORT_SECTIONS = {
+    'config': {'config': True},
+    'dhcp_leases': {'dhcp_leases': True},
+    'groups': {'gravity': {'group': True}},
+    'lists': {'gravity': {'adlist': True, 'adlist_by_group': True}},
+    'domains': {'gravity': {'domainlist': True, 'domainlist_by_group': True}},
+    'clients': {'gravity': {'client': True, 'client_by_group': True}},
+}
+
+SECTIONS = list(IMPORT_SECTIONS)
+
+GRAVITY_SECTIONS = ('groups', 'lists', 'domains', 'clients')
+
+# Lines Pi-hole rewrites on every export although nothing changed
+_VOLATILE_LINE = re.compile(rb'^#\s*Last updated on .*$', re.MULTILINE)
+
+# adlist columns every gravity run on the instance rewrites
+_VOLATILE_COLUMNS = frozenset(['date_updated', 'number', 'invalid_domains', 'status', 'abp_entries'])
+
+_SQLITE_HEADER = b'SQLite format 3\x00'
+
+
+def import_options(sections):
+    """
+    Build the "import" field of POST /api/teleporter for the given sections.
+
+    Sections that are not selected are set to false explicitly, because
+    Pi-hole imports everything when a flag is missing.
+    """
+    options = {'config': False, 'dhcp_leases': False, 'gravity': {}}
+    for flags in IMPORT_SECTIONS.values():
+        for key, value in flags.items():
+            if isinstance(value, dict):
+                options['gravity'].update((flag, False) for flag in value)
+    for section in sections:
+        for key, value in IMPORT_SECTIONS[section].items():
+            if isinstance(value, dict):
+                options[key].update(value)
+            else:
+                options[key] = value
+    return options
+
+
+def _member_sections(name):
+    base = posixpath.basename(name)
+    if base == 'gravity.db':
+        return GRAVITY_SECTIONS
+    if base == 'dhcp.leases':
+        return ('dhcp_leases',)
+    # pihole.toml and the other configuration files
+    return ('config',)
+
+
+def _gravity_digest(content, sections):
+    """
+    Digest of the gravity database tables the given sections import.
+
+    Rows are hashed rather than the file, so the database of an instance an
+    archive was imported into matches the archive although SQLite lays it
+    out differently, and the columns gravity updates on every run are left
+    out.
+    """
+    digest = hashlib.sha256()
+    handle, path = tempfile.mkstemp(suffix='.db')
+    try:
+        with os.fdopen(handle, 'wb') as db_file:
+            db_file.write(content)
+        connection = sqlite3.connect(path)
+        try:
+            for section in GRAVITY_SECTIONS:
+                if section not in sections:
+                    continue
+                for table in sorted(IMPORT_SECTIONS[section]['gravity']):
+                    try:
+                        cursor = connection.execute(f'SELECT * FROM "{table}"')
+                    except sqlite3.Error:
+                        digest.update(f'{table}\0missing\0'.encode())
+                        continue
+                    columns = [column[0] for column in cursor.description]
+                    keep = [index for index, column in enumerate(columns) if column not in _VOLATILE_COLUMNS]
+                    rows = sorted(repr([row[index] for index in keep]) for row in cursor)
+                    digest.update(json.dumps([table, [columns[index] for index in keep], rows]).encode())
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        raise PiholeModuleError(f'Cannot read the gravity database of the teleporter archive: {e}')
+    finally:
+        os.unlink(path)
+    return digest.digest()
+
+
+def archive_checksum(data, sections):
+    """
+    Checksum of the parts of a teleporter archive an import of the given sections reads.
+
+    The checksum covers the names and contents of the relevant members and
+    not the ZIP metadata, and ignores the timestamp Pi-hole writes into its
+    configuration file, so two exports of an unchanged instance match. The
+    gravity database is compared by the rows of the selected tables, so the
+    export of an instance matches the archive that was imported into it.
+
+    Args:
+        data: The archive as bytes
+        sections: Names from SECTIONS
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(sorted(sections)).encode())
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipfile:
+        raise PiholeModuleError('The teleporter archive is not a ZIP file')
+    with archive:
+        for name in sorted(archive.namelist()):
+            if name.endswith('/') or not set(_member_sections(name)) & set(sections):
+                continue
+            content = archive.read(name)
+            digest.update(name.encode() + b'\0')
+            if posixpath.basename(name) == 'gravity.db' and content.startswith(_SQLITE_HEADER):
+                digest.update(_gravity_digest(content, sections))
+                continue
+            if not name.endswith('.db'):
+                content = _VOLATILE_LINE.sub(b'', content)
+            digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+def archive_members(data):
+    """Return the member names of a teleporter archive."""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return [name for name in archive.namelist() if not name.endswith('/')]
+
+
+def export_archive(client):
+    """
+    Download the teleporter archive of an instance.
+
+    Returns:
+        bytes: The archive
+    """
+    response = client.config.export_settings()
+    if isinstance(response, dict):
+        raise PiholeModuleError(f"Teleporter export failed: {response.get('error', response)}")
+    return response
+
+
+def import_archive(client, data, sections):
+    """
+    Upload a teleporter archive to an instance, importing only the given sections.
+
+    Returns:
+        dict: The API response
+    """
+    files = {'file': ('teleporter.zip', data, 'application/zip')}
+    form = {'import': json.dumps(import_options(sections))}
+    response = client.connection.post('teleporter', files=files, data=form)
+    if not isinstance(response, dict) or 'error' in response:
+        error = response.get('error') if isinstance(response, dict) else response
+        raise PiholeModuleError(f'Teleporter import failed: {error}')
+    return response
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import threading
+from urllib.parse import urlsplit
+
+try:
+    from requests.adapters import HTTPAdapter
+    HAS_REQUESTS = True
+except ImportError:
+    HTTPAdapter = object
+    HAS_REQUESTS = False
+
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_LONG_TIMEOUT = 300
+
+# Keep-alive connections each adapter keeps open to its instance
+DEFAULT_POOL_SIZE = 10
+
+# (method, path prefix) of requests that make Pi-hole restart its resolver
+# or move whole archives, and get the long-operation read timeout
+LONG_OPERATIONS = (
+    ('GET', 'teleporter'),
+    ('POST', 'teleporter'),
+    ('PATCH', 'config'),
+    ('PUT', 'config/'),
+    ('DELETE', 'config/'),
+    ('POST', 'action/'),
+)
+
+_ADAPTERS = {}
+_ADAPTERS_LOCK = threading.Lock()
+
+
+def is_long_operation(method, path):
+    """Whether a request to the API path (relative to /api/) gets the long-operation timeout."""
+    return any(method == long_method and path.startswith(prefix) for long_method, prefix in LONG_OPERATIONS)
+
+
+class TransportAdapter(HTTPAdapter):
+    """
+    HTTPAdapter for one Pi-hole instance with separate connect, read and long-operation timeouts.
+
+    Requests sent with the default (connect, read) timeout of the connection
+    get the long-operation read timeout when they are a long operation;
+    requests passing their own timeout, like the streamed gravity run, keep it.
+    """
+
+    def __init__(self, api_url, timeouts, pool_size=DEFAULT_POOL_SIZE, retry=None):
+        self.api_path = urlsplit(api_url).path
+        self.connect_timeout, self.read_timeout, self.long_timeout = timeouts
+        kwargs = dict(pool_connections=1, pool_maxsize=pool_size)
+        if retry is not None:
+            kwargs['max_retries'] = retry
+        super(TransportAdapter, self).__init__(**kwargs)
+
+    @property
+    def default_timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None or timeout == self.default_timeout:
+            path = urlsplit(request.url).path
+            if path.startswith(self.api_path):
+                path = path[len(self.api_path):]
+            read = self.long_timeout if is_long_operation(request.method, path) else self.read_timeout
+            timeout = (self.connect_timeout, read)
+        return super(TransportAdapter, self).send(request, timeout=timeout, **kwargs)
+
+
+def shared_adapter(api_url, timeouts, pool_size=DEFAULT_POOL_SIZE, retry=None):
+    """
+    Return the TransportAdapter for an instance, shared by every client of the process.
+
+    The adapter owns the keep-alive connection pool, so all clients a
+    module opens to the same instance (fan-out workers, parallel snapshot
+    fetches, a teleporter source that is also a target) reuse the same
+    connections. Each client keeps its own session, so session IDs and
+    per-client hooks stay separate.
+
+    Args:
+        api_url: The API base URL, e.g. https://pihole.example.com/api/
+        timeouts: Tuple of connect, read and long-operation timeouts in seconds
+        pool_size: Maximum number of pooled connections to the instance
+        retry: urllib3 Retry policy for requests through the adapter
+    """
+    key = (api_url, tuple(timeouts), pool_size)
+    with _ADAPTERS_LOCK:
+        adapter = _ADAPTERS.get(key)
+        if adapter is None:
+            adapter = _ADAPTERS[key] = TransportAdapter(api_url, timeouts, pool_size=pool_size, retry=retry)
+    return adapter
@@ -3,6 +3,16 @@
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.common.text.converters import to_native
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError, api_argument_spec, is_not_found
+from ansible_collections.sbarbett.pihole.plugins.module_utils.diff import ItemDiff, diff_result
+from ansible_collections.sbarbett.pihole.plugins.module_utils.fanout import (
+    INSTANCES_MODULE_KWARGS,
+    instances_argument_spec,
+    run_on_instances,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.gravity import run_gravity
+from ansible_collections.sbarbett.pihole.plugins.module_utils.group_resolver import GroupResolver
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import current_state_argument_spec, snapshot_section
 
 try:
     from pihole6api import PiHole6Client
@@ -92,20 +102,30 @@ options:
     password:
         description:
             - The API password for the Pi-hole instance.
-        required: true
+            - Required with O(url).
+        required: false
         type: str
         no_log: true
     url:
         description:
             - The URL of the Pi-hole instance.
-        required: true
+            - Required unless O(instances) is used.
+        required: false
         type: str
     update_gravity:
         description:
             - Whether to run gravity after making changes.
+            - Gravity only runs when a list was added or removed or its O(lists[].enabled) state changed.
+              Changes to the comment or groups of a list do not need a gravity run.
+            - The task waits for the run to finish. Use M(sbarbett.pihole.gravity) with O(sbarbett.pihole.gravity#module:wait=false)
+              to run gravity in the background instead.
         required: false
         type: bool
         default: false
+extends_documentation_fragment:
+    - sbarbett.pihole.api
+    - sbarbett.pihole.instances
+    - sbarbett.pihole.current_state
 author:
     - Shane Barbetta (@sbarbett)
 '''
@@ -158,6 +178,17 @@ EXAMPLES = r'''
     url: "https://your-pihole.example.com"
     password: "{{ pihole_password }}"
     update_gravity: true
+
+- name: Manage allow lists on several Pi-holes at once
+  sbarbett.pihole.allow_list:
+    lists:
+      - address: "https://example.com/whitelist.txt"
+        state: present
+    instances:
+      - url: "https://pihole1.example.com"
+        password: "{{ pihole_password }}"
+      - url: "https://pihole2.example.com"
+        password: "{{ pihole_password }}"
 '''
 
 RETURN = r'''
@@ -169,54 +200,252 @@ changed:
     description: Whether any change was made.
     type: bool
     returned: always
+gravity_needed:
+    description:
+        - Whether a list was added or removed or its enabled state changed, so gravity has to run for the change to take effect.
+        - Use it to run M(sbarbett.pihole.gravity) once per instance after all list changes, for example from a handler.
+    type: bool
+    returned: always
+diff:
+    description:
+        - One entry per added, changed or removed list with its C(comment), C(groups) and C(enabled) state before and after.
+        - Also returned in check mode, which reads the lists but makes no changes.
+    type: list
+    elements: dict
+    returned: when diff mode is on
+instances:
+    description:
+        - One entry per instance when O(instances) is used, holding C(url), C(changed), C(failed), C(msg),
+          C(elapsed), C(gravity_needed) and the RV(result) list for that instance.
+    type: list
+    elements: dict
+    returned: when instances is used
+api_stats:
+    description:
+        - The API requests the module made, as described for O(api_stats).
+        - With O(instances) the requests of all instances added up.
+    type: dict
+    returned: when O(api_stats) is enabled
+    sample:
+        requests: 4
+        logins: 1
+        bytes_in: 14872
+        bytes_out: 412
+        total_seconds: 0.0981
+        p95_seconds: 0.0274
+        endpoints:
+            GET groups: {count: 1, seconds: 0.0118}
+            GET lists: {count: 1, seconds: 0.0342}
+            POST lists: {count: 2, seconds: 0.0521}
 '''
 
-def get_existing_groups(client):
+def get_existing_lists(module, client, list_type):
     """
-    Get existing groups from PiHole.
-    
+    Get all existing allow lists from PiHole in a single request.
+
+    Uses the current_state snapshot instead when one is given for the instance.
+
     Args:
+        module: AnsibleModule instance
         client: PiHole6Client instance
-        
+        list_type: The list type to fetch
+
     Returns:
-        dict: Mapping of group names to group details
+        dict: Mapping of list addresses to list details
+    """
+    snapshot = snapshot_section(module, client, 'lists')
+    if snapshot is not None:
+        return {item['address']: item for item in snapshot if item.get('type') == list_type}
+
+    response = client.list_management.get_lists(list_type)
+    if isinstance(response, dict) and 'error' in response:
+        raise PiholeModuleError(f"Failed to fetch {list_type} lists: {response['error']}")
+    return {item['address']: item for item in response.get('lists', [])}
+
+def batch_delete_lists(client, addresses, list_type):
     """
+    Delete multiple allow lists from PiHole in a single request.
+
+    Falls back to deleting the lists one by one when the batch delete
+    endpoint is not available on the server or the batch failed. A list the
+    fallback does not find counts as deleted, since a batch that failed
+    halfway may already have removed it.
+
+    Args:
+        client: PiHole6Client instance
+        addresses: List of list addresses to delete
+        list_type: The list type of the addresses
+
+    Returns:
+        dict: Mapping of list addresses to the API response for their deletion
+    """
+    lists = client.list_management
     try:
-        response = client.group_management.get_groups()
-        groups = response.get('groups', [])
-        return {group['name']: group for group in groups}
+        response = lists.batch_delete_lists([{'item': address, 'type': list_type} for address in addresses])
     except Exception as e:
-        return {}
+        response = {'error': to_native(e)}
+
+    if not (isinstance(response, dict) and 'error' in response):
+        return {address: response for address in addresses}
+
+    responses = {}
+    for address in addresses:
+        response = lists.delete_list(address, list_type=list_type)
+        responses[address] = {} if is_not_found(response) else response
+    return responses
 
-def map_groups_to_ids(module, group_items, existing_groups):
+def manage_lists(module, client, lists_param, update_gravity):
     """
-    Map group names to their corresponding IDs.
-    If a group name doesn't exist, it will be ignored with a warning.
+    Apply the desired allow lists to one Pi-hole instance.
+
+    Args:
+        module: AnsibleModule instance
+        client: PiHole6Client instance
+        lists_param: List of desired allow list definitions
+        update_gravity: Whether to run gravity after gravity-relevant changes
+
+    Returns:
+        dict: Result with 'changed', 'gravity_needed' and 'result'
     """
-    group_ids = []
-    missing_groups = []
+    result = dict(
+        changed=False,
+        gravity_needed=False,
+        result={}
+    )
+
+    lists = client.list_management
     
-    for item in group_items:
-        # If it's already an ID (integer), add it directly
-        if isinstance(item, int):
-            group_ids.append(item)
-            continue
-            
-        # Otherwise, look up the ID by name
-        found = False
-        for group_name, details in existing_groups.items():
-            if group_name.lower() == item.lower():
-                group_ids.append(details['id'])
-                found = True
-                break
-                
-        if not found:
-            missing_groups.append(item)
+    # Always use 'allow' as the list_type for this module
+    list_type = "allow"
     
-    if missing_groups:
-        module.warn(f"The following groups were not found and will be ignored: {', '.join(missing_groups)}")
+    # Resolves group names through the shared per-instance group cache
+    resolver = GroupResolver(module, client)
+
+    # Fetch every list of this type once and index it by address
+    existing_lists = get_existing_lists(module, client, list_type)
+
+    diff = ItemDiff(f'{list_type} list')
+
+    def describe(data):
+        return dict(comment=data.get('comment'), groups=sorted(resolver.to_names(data.get('groups', []))),
+                    enabled=data.get('enabled'))
+    
+    # Lists to delete (state: absent)
+    lists_to_delete = []
+    
+    # Process each list item
+    processed_results = []
+    
+    for list_item in lists_param:
+        address = list_item['address']
+        state = list_item['state']
+        comment = list_item.get('comment')
+        group_items = list_item.get('groups', [])
+        enabled = list_item.get('enabled', True)
+        
+        # Map group names/IDs to group IDs
+        groups = resolver.to_ids(group_items)
+        
+        # Check if the allow list exists
+        existing_list_data = existing_lists.get(address)
+
+        if state == 'present':
+            if existing_list_data is None:
+                # No list exists; add the new one
+                item = {'address': address, 'action': 'added'}
+                if not module.check_mode:
+                    item['response'] = lists.add_list(
+                        address, 
+                        list_type=list_type,
+                        comment=comment,
+                        groups=groups,
+                        enabled=enabled
+                    )
+                processed_results.append(item)
+                diff.add(address, None, describe(dict(comment=comment, groups=groups, enabled=enabled)))
+                result['changed'] = True
+                result['gravity_needed'] = True
+            else:
+                # List exists, check if we need to update it
+                needs_update = False
+                
+                # Check if any parameters need to be updated
+                if (comment is not None and existing_list_data.get('comment') != comment) or \
+                   (groups and set(existing_list_data.get('groups', [])) != set(groups)) or \
+                   (existing_list_data.get('enabled') != enabled):
+                    needs_update = True
+                
+                if needs_update:
+                    item = {'address': address, 'action': 'updated'}
+                    if not module.check_mode:
+                        item['response'] = lists.update_list(
+                            address,
+                            list_type=list_type,
+                            comment=comment,
+                            groups=groups,
+                            enabled=enabled
+                        )
+                    processed_results.append(item)
+                    diff.add(address, describe(existing_list_data), describe(dict(
+                        comment=comment, groups=groups or existing_list_data.get('groups', []), enabled=enabled)))
+                    result['changed'] = True
+                    # Comment and group changes take effect without rebuilding gravity
+                    if existing_list_data.get('enabled') != enabled:
+                        result['gravity_needed'] = True
+                else:
+                    processed_results.append({
+                        'address': address,
+                        'action': 'unchanged',
+                        'current': {'lists': [existing_list_data]}
+                    })
+
+        elif state == 'absent':
+            if existing_list_data is not None:
+                lists_to_delete.append(address)
+                diff.add(address, describe(existing_list_data), None)
+                processed_results.append({
+                    'address': address,
+                    'action': 'marked_for_deletion'
+                })
+                result['changed'] = True
+                result['gravity_needed'] = True
+            else:
+                processed_results.append({
+                    'address': address,
+                    'action': 'absent_already'
+                })
     
-    return group_ids
+    # Process deletions
+    if lists_to_delete:
+        if not module.check_mode:
+            marked = {}
+            for item in processed_results:
+                if item['action'] == 'marked_for_deletion':
+                    marked.setdefault(item['address'], []).append(item)
+
+            responses = batch_delete_lists(client, list(marked), list_type)
+            for address, delete_response in responses.items():
+                for item in marked[address]:
+                    item['action'] = 'deleted'
+                    item['response'] = delete_response
+
+    if update_gravity and result['gravity_needed'] and not module.check_mode:
+        gravity = run_gravity(client)
+        output = gravity.pop('output')
+        if any("List has been updated" in line for line in output):
+            result['changed'] = True
+        processed_results.append(
+            dict(
+                action='run_gravity',
+                response='\n'.join(output),
+                **gravity
+            )
+        )
+
+    result['result'] = processed_results
+    result.update(diff_result(module, diff))
+
+    return result
 
 def run_module():
     module_args = dict(
@@ -238,25 +467,22 @@ def run_module():
         comment=dict(type='str', required=False, default=None),
         groups=dict(type='list', elements='raw', required=False, default=[]),
         enabled=dict(type='bool', required=False, default=True),
-        password=dict(type='str', required=True, no_log=True),
-        url=dict(type='str', required=True),
+        password=dict(type='str', required=False, no_log=True),
+        url=dict(type='str', required=False),
         update_gravity=dict(type='bool', required=False, default=False)
     )
-
-    result = dict(
-        changed=False,
-        result={}
-    )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
+    module_args.update(instances_argument_spec())
 
     module = AnsibleModule(
         argument_spec=module_args,
         supports_check_mode=True,
-        required_one_of=[['lists', 'address']],
-        required_by={'address': ['state']}
+        required_one_of=[['lists', 'address'], ['url', 'instances']],
+        mutually_exclusive=INSTANCES_MODULE_KWARGS['mutually_exclusive'],
+        required_by={'address': ['state'], 'url': ['password']}
     )
 
-    password = module.params['password']
-    url = module.params['url']
     update_gravity = module.params.get('update_gravity', False)
     
     # Check if we're using the new lists parameter or legacy parameters
@@ -278,142 +504,14 @@ def run_module():
             'enabled': enabled
         }]
 
-    if module.check_mode:
-        module.exit_json(**result)
-
     if not HAS_PIHOLE6API:
         module.fail_json(msg='The pihole6api module is required')
 
-    client = None
-    try:
-        client = PiHole6Client(url, password)
-        lists = client.list_management
-        
-        # Always use 'allow' as the list_type for this module
-        list_type = "allow"
-        
-        # Get existing groups for mapping
-        existing_groups = get_existing_groups(client)
-        
-        # Lists to delete (state: absent)
-        lists_to_delete = []
-        
-        # Process each list item
-        processed_results = []
-        
-        for list_item in lists_param:
-            address = list_item['address']
-            state = list_item['state']
-            comment = list_item.get('comment')
-            group_items = list_item.get('groups', [])
-            enabled = list_item.get('enabled', True)
-            
-            # Map group names/IDs to group IDs
-            groups = map_groups_to_ids(module, group_items, existing_groups)
-            
-            # Check if the allow list exists
-            existing_list = lists.get_list(address, list_type)
-            existing_list_data = None
-            
-            if 'lists' in existing_list and existing_list['lists']:
-                existing_list_data = existing_list['lists'][0]
-
-            if state == 'present':
-                if existing_list_data is None:
-                    # No list exists; add the new one
-                    if not module.check_mode:
-                        add_response = lists.add_list(
-                            address, 
-                            list_type=list_type,
-                            comment=comment,
-                            groups=groups,
-                            enabled=enabled
-                        )
-                        processed_results.append({
-                            'address': address,
-                            'action': 'added',
-                            'response': add_response
-                        })
-                    result['changed'] = True
-                else:
-                    # List exists, check if we need to update it
-                    needs_update = False
-                    
-                    # Check if any parameters need to be updated
-                    if (comment is not None and existing_list_data.get('comment') != comment) or \
-                       (groups and set(existing_list_data.get('groups', [])) != set(groups)) or \
-                       (existing_list_data.get('enabled') != enabled):
-                        needs_update = True
-                    
-                    if needs_update:
-                        if not module.check_mode:
-                            update_response = lists.update_list(
-                                address,
-                                list_type=list_type,
-                                comment=comment,
-                                groups=groups,
-                                enabled=enabled
-                            )
-                            processed_results.append({
-                                'address': address,
-                                'action': 'updated',
-                                'response': update_response
-                            })
-                        result['changed'] = True
-                    else:
-                        processed_results.append({
-                            'address': address,
-                            'action': 'unchanged',
-                            'current': existing_list
-                        })
-
-            elif state == 'absent':
-                if existing_list_data is not None:
-                    lists_to_delete.append(address)
-                    processed_results.append({
-                        'address': address,
-                        'action': 'marked_for_deletion'
-                    })
-                    result['changed'] = True
-                else:
-                    processed_results.append({
-                        'address': address,
-                        'action': 'absent_already'
-                    })
-        
-        # Process deletions
-        if lists_to_delete:
-            if not module.check_mode:
-                # TODO: If batch_delete_lists is available in the API, use it here
-                # For now, delete one by one
-                for address in lists_to_delete:
-                    delete_response = lists.delete_list(address, list_type=list_type)
-                    # Update the corresponding result in processed_results
-                    for item in processed_results:
-                        if item['address'] == address and item['action'] == 'marked_for_deletion':
-                            item['action'] = 'deleted'
-                            item['response'] = delete_response
-
-        if update_gravity:
-            client.connection.connection_timeout = 60  # Set a timeout for the gravity run
-            res = client.actions.run_gravity()
-            if "List has been updated" in res:
-                result['changed'] = True
-            processed_results.append(
-                {
-                    'action': 'run_gravity',
-                    'response': res,
-                }
-            )
-
-        result['result'] = processed_results
-        module.exit_json(**result)
-
-    except Exception as e:
-        module.fail_json(msg=f"Error managing allow lists: {to_native(e)}", **result)
-    finally:
-        if client is not None:
-            client.close_session()
+    run_on_instances(
+        module,
+        lambda client: manage_lists(module, client, lists_param, update_gravity),
+        "Error managing allow lists",
+    )
 
 def main():
     run_module()
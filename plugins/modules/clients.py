@@ -14,6 +14,10 @@ short_description: Manage PiHole clients
 description:
   - Create, update, or delete PiHole clients.
 version_added: "1.0.0"
+extends_documentation_fragment:
+  - sbarbett.pihole.api
+  - sbarbett.pihole.instances
+  - sbarbett.pihole.current_state
 author:
   - Simon Barbett (@sbarbett)
 options:
@@ -51,13 +55,15 @@ options:
   url:
     description:
       - URL of the PiHole server.
+      - Required unless O(instances) is used.
     type: str
-    required: true
+    required: false
   password:
     description:
       - Password for the PiHole server.
+      - Required with O(url).
     type: str
-    required: true
+    required: false
 requirements:
   - pihole6api
 '''
@@ -80,6 +86,19 @@ EXAMPLES = r'''
         state: absent
     url: "https://pihole.example.com"
     password: "admin_password"
+
+- name: Manage clients on several PiHoles at once
+  sbarbett.pihole.clients:
+    clients:
+      - name: 192.168.30.0/24
+        groups:
+          - Default
+        state: present
+    instances:
+      - url: "https://pihole1.example.com"
+        password: "admin_password"
+      - url: "https://pihole2.example.com"
+        password: "admin_password"
 '''
 
 RETURN = r'''
@@ -110,10 +129,49 @@ clients:
       returned: always
       type: str
       sample: present
+diff:
+  description:
+    - One entry per created, changed or deleted client with its C(comment) and C(groups) before and after.
+  returned: when diff mode is on
+  type: list
+  elements: dict
+instances:
+  description:
+    - One entry per instance when O(instances) is used, holding C(url), C(changed), C(failed), C(msg),
+      C(elapsed) and the RV(clients) list for that instance.
+  returned: when instances is used
+  type: list
+  elements: dict
+api_stats:
+  description:
+    - The API requests the module made, as described for O(api_stats).
+    - With O(instances) the requests of all instances added up.
+  type: dict
+  returned: when O(api_stats) is enabled
+  sample:
+    requests: 3
+    logins: 1
+    bytes_in: 1630
+    bytes_out: 214
+    total_seconds: 0.0389
+    p95_seconds: 0.0197
+    endpoints:
+      GET clients: {count: 1, seconds: 0.0104}
+      POST clients: {count: 1, seconds: 0.0197}
+      PUT clients/{item}: {count: 1, seconds: 0.0088}
 '''
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.common.text.converters import to_native
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError, api_argument_spec
+from ansible_collections.sbarbett.pihole.plugins.module_utils.diff import ItemDiff, diff_result
+from ansible_collections.sbarbett.pihole.plugins.module_utils.fanout import (
+    INSTANCES_MODULE_KWARGS,
+    instances_argument_spec,
+    run_on_instances,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.group_resolver import GroupResolver
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import current_state_argument_spec, snapshot_section
 
 try:
     from pihole6api import PiHole6Client
@@ -122,34 +180,20 @@ except ImportError:
     HAS_PIHOLE6API = False
 
 
-def get_existing_groups(client):
+def get_existing_clients(module, client):
     """
-    Get existing groups from PiHole.
-    
-    Args:
-        client: PiHole6Client instance
-        
-    Returns:
-        dict: Mapping of group names to group details
-    """
-    try:
-        response = client.group_management.get_groups()
-        groups = response.get('groups', [])
-        return {group['name']: group for group in groups}
-    except Exception as e:
-        return {}
-
-
-def get_existing_clients(client):
-    """
-    Get existing clients from PiHole.
+    Get existing clients from PiHole, or from the current_state snapshot.
     
     Args:
+        module: AnsibleModule instance
         client: PiHole6Client instance
         
     Returns:
         dict: Mapping of client addresses to client details
     """
+    clients = snapshot_section(module, client, 'clients')
+    if clients is not None:
+        return {client_data['client']: client_data for client_data in clients}
     try:
         response = client.client_management.get_clients()
         clients = response.get('clients', [])
@@ -232,35 +276,121 @@ def batch_delete_clients(client, names):
         return {'error': to_native(e)}
 
 
-def map_groups_to_ids(module, group_names, existing_groups):
+def manage_clients(module, client, clients):
     """
-    Map group names to their corresponding IDs.
-    If a group name doesn't exist, it will be ignored with a warning.
+    Apply the desired clients to one PiHole instance.
+
+    Args:
+        module: AnsibleModule instance
+        client: PiHole6Client instance
+        clients: List of desired client definitions
+
+    Returns:
+        dict: Result with 'changed' and 'clients'
     """
-    group_ids = []
-    missing_groups = []
+    result = dict(
+        changed=False,
+        clients=[],
+    )
+
+    # Get existing clients; group names resolve through the shared per-instance group cache
+    resolver = GroupResolver(module, client)
+    existing_clients = get_existing_clients(module, client)
+    diff = ItemDiff('client')
+
+    def describe(data):
+        return dict(comment=data.get('comment'), groups=sorted(resolver.to_names(data.get('groups', []))))
     
-    for name in group_names:
-        # If it's already an ID (integer), add it directly
-        if isinstance(name, int):
-            group_ids.append(name)
-            continue
-            
-        # Otherwise, look up the ID by name
-        found = False
-        for group_name, details in existing_groups.items():
-            if group_name.lower() == name.lower():
-                group_ids.append(details['id'])
-                found = True
-                break
-                
-        if not found:
-            missing_groups.append(name)
+    # Clients to delete (state: absent)
+    clients_to_delete = [client_data['name'] for client_data in clients 
+                        if client_data['state'] == 'absent' and client_data['name'] in existing_clients]
     
-    if missing_groups:
-        module.warn(f"The following groups were not found and will be ignored: {', '.join(missing_groups)}")
+    # Process clients
+    for client_data in clients:
+        name = client_data['name']
+        state = client_data['state']
+        comment = client_data.get('comment')
+        group_names = client_data.get('groups', [])
+        
+        # Map group names to IDs
+        group_ids = resolver.to_ids(group_names)
+        
+        if state == 'present':
+            if name not in existing_clients:
+                # Create new client
+                if not module.check_mode:
+                    response = create_client(client, name, comment, group_ids)
+                    if 'error' in response:
+                        raise PiholeModuleError(f'Failed to create client {name}: {response["error"]}')
+                result['changed'] = True
+                diff.add(name, None, describe(dict(comment=comment, groups=group_ids)))
+                result['clients'].append({
+                    'name': name,
+                    'comment': comment,
+                    'groups': group_names,
+                    'state': 'created'
+                })
+            else:
+                # Check if update is needed
+                existing = existing_clients[name]
+                update_needed = False
+                
+                if comment is not None and existing.get('comment') != comment:
+                    update_needed = True
+                
+                # Compare group IDs
+                existing_group_ids = set(existing.get('groups', []))
+                desired_group_ids = set(group_ids)
+                if existing_group_ids != desired_group_ids:
+                    update_needed = True
+                
+                if update_needed:
+                    if not module.check_mode:
+                        response = update_client(client, name, comment, group_ids)
+                        if 'error' in response:
+                            raise PiholeModuleError(f'Failed to update client {name}: {response["error"]}')
+                    result['changed'] = True
+                    diff.add(name, describe(existing), describe(dict(comment=comment, groups=group_ids)))
+                    result['clients'].append({
+                        'name': name,
+                        'comment': comment,
+                        'groups': group_names,
+                        'state': 'updated'
+                    })
+                else:
+                    # No change needed
+                    # Map existing group IDs back to names for the result
+                    existing_group_names = resolver.to_names(existing.get('groups', []))
+
+                    result['clients'].append({
+                        'name': name,
+                        'comment': existing.get('comment'),
+                        'groups': existing_group_names,
+                        'state': 'unchanged'
+                    })
     
-    return group_ids
+    # Delete clients
+    if clients_to_delete:
+        result['changed'] = True
+        for name in clients_to_delete:
+            diff.add(name, describe(existing_clients[name]), None)
+            result['clients'].append({
+                'name': name,
+                'state': 'deleted'
+            })
+        
+        if not module.check_mode:
+            if len(clients_to_delete) == 1:
+                response = delete_client(client, clients_to_delete[0])
+                if 'error' in response:
+                    raise PiholeModuleError(f'Failed to delete client {clients_to_delete[0]}: {response["error"]}')
+            else:
+                response = batch_delete_clients(client, clients_to_delete)
+                if 'error' in response:
+                    raise PiholeModuleError(f'Failed to delete clients {", ".join(clients_to_delete)}: {response["error"]}')
+
+    result.update(diff_result(module, diff))
+    return result
 
 
 def main():
@@ -276,135 +406,30 @@ def main():
                 state=dict(type='str', required=True, choices=['present', 'absent']),
             ),
         ),
-        url=dict(type='str', required=True),
-        password=dict(type='str', required=True, no_log=True),
-    )
-
-    result = dict(
-        changed=False,
-        clients=[],
+        url=dict(type='str', required=False),
+        password=dict(type='str', required=False, no_log=True),
     )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
+    module_args.update(instances_argument_spec())
 
     module = AnsibleModule(
         argument_spec=module_args,
-        supports_check_mode=True
+        supports_check_mode=True,
+        **INSTANCES_MODULE_KWARGS
     )
 
     if not HAS_PIHOLE6API:
         module.fail_json(msg='The pihole6api module is required')
 
-    url = module.params['url']
-    password = module.params['password']
     clients = module.params['clients']
 
-    client = None
-    try:
-        client = PiHole6Client(url, password)
-        
-        # Get existing groups and clients
-        existing_groups = get_existing_groups(client)
-        existing_clients = get_existing_clients(client)
-        
-        # Map group names to IDs
-        group_name_to_id = {name: details['id'] for name, details in existing_groups.items()}
-        
-        # Clients to delete (state: absent)
-        clients_to_delete = [client_data['name'] for client_data in clients 
-                            if client_data['state'] == 'absent' and client_data['name'] in existing_clients]
-        
-        # Process clients
-        for client_data in clients:
-            name = client_data['name']
-            state = client_data['state']
-            comment = client_data.get('comment')
-            group_names = client_data.get('groups', [])
-            
-            # Map group names to IDs
-            group_ids = map_groups_to_ids(module, group_names, existing_groups)
-            
-            if state == 'present':
-                if name not in existing_clients:
-                    # Create new client
-                    if not module.check_mode:
-                        response = create_client(client, name, comment, group_ids)
-                        if 'error' in response:
-                            module.fail_json(msg=f'Failed to create client {name}: {response["error"]}')
-                    result['changed'] = True
-                    result['clients'].append({
-                        'name': name,
-                        'comment': comment,
-                        'groups': group_names,
-                        'state': 'created'
-                    })
-                else:
-                    # Check if update is needed
-                    existing = existing_clients[name]
-                    update_needed = False
-                    
-                    if comment is not None and existing.get('comment') != comment:
-                        update_needed = True
-                    
-                    # Compare group IDs
-                    existing_group_ids = set(existing.get('groups', []))
-                    desired_group_ids = set(group_ids)
-                    if existing_group_ids != desired_group_ids:
-                        update_needed = True
-                    
-                    if update_needed:
-                        if not module.check_mode:
-                            response = update_client(client, name, comment, group_ids)
-                            if 'error' in response:
-                                module.fail_json(msg=f'Failed to update client {name}: {response["error"]}')
-                        result['changed'] = True
-                        result['clients'].append({
-                            'name': name,
-                            'comment': comment,
-                            'groups': group_names,
-                            'state': 'updated'
-                        })
-                    else:
-                        # No change needed
-                        # Map existing group IDs back to names for the result
-                        existing_group_names = []
-                        for group_id in existing.get('groups', []):
-                            for group_name, details in existing_groups.items():
-                                if details['id'] == group_id:
-                                    existing_group_names.append(group_name)
-                                    break
-                        
-                        result['clients'].append({
-                            'name': name,
-                            'comment': existing.get('comment'),
-                            'groups': existing_group_names,
-                            'state': 'unchanged'
-                        })
-        
-        # Delete clients
-        if clients_to_delete:
-            result['changed'] = True
-            for name in clients_to_delete:
-                result['clients'].append({
-                    'name': name,
-                    'state': 'deleted'
-                })
-            
-            if not module.check_mode:
-                if len(clients_to_delete) == 1:
-                    response = delete_client(client, clients_to_delete[0])
-                    if 'error' in response:
-                        module.fail_json(msg=f'Failed to delete client {clients_to_delete[0]}: {response["error"]}')
-                else:
-                    response = batch_delete_clients(client, clients_to_delete)
-                    if 'error' in response:
-                        module.fail_json(msg=f'Failed to delete clients {", ".join(clients_to_delete)}: {response["error"]}')
-        
-        module.exit_json(**result)
-    except Exception as e:
-        module.fail_json(msg=f'Error managing clients: {to_native(e)}', **result)
-    finally:
-        if client is not None:
-            client.close_session()
+    run_on_instances(
+        module,
+        lambda client: manage_clients(module, client, clients),
+        'Error managing clients',
+    )
 
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
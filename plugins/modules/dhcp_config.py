@@ -8,7 +8,7 @@ version_added: "1.0.2"
 short_description: Manage Pi-hole DHCP server settings via Pi-hole v6 API
 description:
   - This module enables/disables the Pi-hole DHCP server and configures IPv4/IPv6 DHCP options (range, router, lease time, etc.).
-  - It does NOT manage static DHCP reservations (dhcp.hosts).
+  - It does NOT manage static DHCP reservations (dhcp.hosts). Use M(sbarbett.pihole.dhcp_static_hosts) for those.
   - Uses the pihole6api Python client under the hood.
 options:
   url:
@@ -79,6 +79,9 @@ options:
       - All other clients are ignored (but can still self-assign).
     type: bool
     default: false
+extends_documentation_fragment:
+  - sbarbett.pihole.api
+  - sbarbett.pihole.current_state
 author:
   - Shane Barbetta (@sbarbett)
 '''
@@ -110,9 +113,35 @@ result:
   description: The API response or an explanation if no change occurred.
   type: dict
   returned: always
+diff:
+  description:
+    - The changed DHCP settings with their values before and after.
+    - Also returned in check mode, which reads the DHCP configuration but makes no changes.
+  type: list
+  elements: dict
+  returned: when diff mode is on
+api_stats:
+  description:
+    - The API requests the module made, as described for O(api_stats).
+  type: dict
+  returned: when O(api_stats) is enabled
+  sample:
+    requests: 2
+    logins: 1
+    bytes_in: 1412
+    bytes_out: 389
+    total_seconds: 0.7
+    p95_seconds: 0.6874
+    endpoints:
+      GET config/dhcp: {count: 1, seconds: 0.0126}
+      PATCH config: {count: 1, seconds: 0.6874}
 '''
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import api_argument_spec, get_client
+from ansible_collections.sbarbett.pihole.plugins.module_utils.diff import ItemDiff, diff_result
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import config_section, current_state_argument_spec
+from ansible_collections.sbarbett.pihole.plugins.module_utils.stats import api_stats_result
 
 try:
     from pihole6api import PiHole6Client
@@ -134,6 +163,8 @@ def run_module():
         multi_dns=dict(type='bool', required=False, default=False),
         ignore_unknown_clients=dict(type='bool', required=False, default=False),
     )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
 
     result = dict(changed=False, result={})
 
@@ -142,8 +173,6 @@ def run_module():
         supports_check_mode=True
     )
 
-    url = module.params['url']
-    password = module.params['password']
     state = module.params['state']
 
     start = module.params['start']
@@ -169,77 +198,78 @@ def run_module():
         if missing:
             module.fail_json(msg=f"Missing required arguments for DHCP 'present': {missing}", **result)
 
-    if module.check_mode:
-        # We won't actually apply changes in check mode, but let's guess if anything would change
-        # For a thorough check, we'd need to fetch current config & compare, but let's keep it simple here:
-        result['changed'] = True
-        module.exit_json(**result)
-
-    # Connect to Pi-hole
+    client = None
     try:
-        client = PiHole6Client(url, password)
-    except Exception as e:
-        module.fail_json(msg=f"Failed to connect to Pi-hole: {e}", **result)
+        # Connect to Pi-hole
+        try:
+            client = get_client(module)
+        except Exception as e:
+            module.fail_json(msg=f"Failed to connect to Pi-hole: {e}", **result, **api_stats_result(module))
 
-    # Retrieve current DHCP config to compare
-    try:
-        current_config_resp = client.config.get_config_section("dhcp")
-    except Exception as e:
-        module.fail_json(msg=f"Failed to retrieve DHCP config: {e}", **result)
-
-    current_dhcp = current_config_resp.get("config", {}).get("dhcp", {})
-
-    # Build the updated settings
-    if state == 'absent':
-        # Just disable DHCP
-        new_dhcp = dict(current_dhcp)
-        new_dhcp['active'] = False
-        # all other values remain as is (ignored on the Pi-hole side if active=False anyway)
-    else:
-        # state = 'present'
-        # We want to enable DHCP and set the relevant fields
-        new_dhcp = {
-            'active': True,
-            'start': start,
-            'end': end,
-            'router': router,
-            'netmask': netmask,
-            'leaseTime': lease_time,
-            'ipv6': ipv6,
-            'rapidCommit': rapid_commit,
-            'multiDNS': multi_dns,
-            'ignoreUnknownClients': ignore_unknown_clients,
-            'hosts': current_dhcp.get('hosts', []),  # preserve existing "hosts" if any
-        }
-        # If you want to preserve any other fields Pi-hole might have, merge them in:
-        for k in current_dhcp:
-            if k not in new_dhcp:
-                new_dhcp[k] = current_dhcp[k]
-
-    # Compare old vs new
-    changed = False
-    for key, new_value in new_dhcp.items():
-        old_value = current_dhcp.get(key)
-        if old_value != new_value:
-            changed = True
-            break
-
-    if not changed:
-        result['changed'] = False
-        result['result'] = {"msg": "No changes to DHCP configuration."}
-        module.exit_json(**result)
-
-    # If changed, send PATCH
-    try:
-        payload = {"dhcp": new_dhcp}
-        update_resp = client.config.update_config(payload)
-        result['changed'] = True
-        result['result'] = update_resp
-        module.exit_json(**result)
-    except Exception as e:
-        module.fail_json(msg=f"Failed to update DHCP config: {e}", **result)
+        # Retrieve current DHCP config to compare
+        try:
+            current_config_resp = config_section(module, client, "dhcp")
+        except Exception as e:
+            module.fail_json(msg=f"Failed to retrieve DHCP config: {e}", **result, **api_stats_result(module))
+
+        current_dhcp = current_config_resp.get("config", {}).get("dhcp", {})
+
+        # Build the updated settings
+        if state == 'absent':
+            # Just disable DHCP
+            new_dhcp = dict(current_dhcp)
+            new_dhcp['active'] = False
+            # all other values remain as is (ignored on the Pi-hole side if active=False anyway)
+        else:
+            # state = 'present'
+            # We want to enable DHCP and set the relevant fields
+            new_dhcp = {
+                'active': True,
+                'start': start,
+                'end': end,
+                'router': router,
+                'netmask': netmask,
+                'leaseTime': lease_time,
+                'ipv6': ipv6,
+                'rapidCommit': rapid_commit,
+                'multiDNS': multi_dns,
+                'ignoreUnknownClients': ignore_unknown_clients,
+                'hosts': current_dhcp.get('hosts', []),  # preserve existing "hosts" if any
+            }
+            # If you want to preserve any other fields Pi-hole might have, merge them in:
+            for k in current_dhcp:
+                if k not in new_dhcp:
+                    new_dhcp[k] = current_dhcp[k]
+
+        # Compare old vs new
+        changed_keys = [key for key, new_value in new_dhcp.items() if current_dhcp.get(key) != new_value]
+        changed = bool(changed_keys)
+
+        diff = ItemDiff('section')
+        diff.add('dhcp', {key: current_dhcp.get(key) for key in changed_keys}, {key: new_dhcp[key] for key in changed_keys})
+        result.update(diff_result(module, diff))
+
+        if not changed:
+            result['changed'] = False
+            result['result'] = {"msg": "No changes to DHCP configuration."}
+            module.exit_json(**result, **api_stats_result(module))
+
+        if module.check_mode:
+            result['changed'] = True
+            module.exit_json(**result, **api_stats_result(module))
+
+        # If changed, send PATCH
+        try:
+            payload = {"dhcp": new_dhcp}
+            update_resp = client.config.update_config(payload)
+            result['changed'] = True
+            result['result'] = update_resp
+            module.exit_json(**result, **api_stats_result(module))
+        except Exception as e:
+            module.fail_json(msg=f"Failed to update DHCP config: {e}", **result, **api_stats_result(module))
     finally:
-        client.close_session()
+        if client is not None:
+            client.close_session()
 
 def main():
     run_module()
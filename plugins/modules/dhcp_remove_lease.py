@@ -1,7 +1,26 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import time
+
 from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError, api_argument_spec, get_client
+from ansible_collections.sbarbett.pihole.plugins.module_utils.diff import ItemDiff, diff_result
+from ansible_collections.sbarbett.pihole.plugins.module_utils.leases import (
+    DEFAULT_LEASE_SECONDS,
+    DEFAULT_REMOVE_WORKERS,
+    FILTER_KEYS,
+    LeaseIndex,
+    normalize_filter,
+    parse_duration,
+    remove_leases,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import (
+    config_section,
+    current_state_argument_spec,
+    snapshot_section,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.stats import api_stats_result
 try:
     from pihole6api import PiHole6Client
 except ImportError:
@@ -15,6 +34,13 @@ description:
     - This module removes DHCP leases from a Pi-hole v6 instance using the pihole6api Python client.
     - Leases can be removed by filtering on `ip`, `name`, `clientid`, or `hwaddr`.
     - If multiple filters are specified, only leases that match all criteria will be removed.
+    - Leases can also be selected by subnet with O(cidr), by vendor with O(oui), and by age with O(expired) and
+      O(older_than).
+    - Several filter sets can be given in O(filters); a lease matching any of them is removed. The top-level filter
+      options form one more set.
+    - The leases are read once and indexed by IP address, hardware address, client ID and hostname, so every filter
+      set is matched without another read. Matching leases are removed concurrently on up to O(max_workers)
+      requests.
 options:
     ip:
         description:
@@ -36,6 +62,67 @@ options:
             - The hardware (MAC) address of the lease to remove.
         required: false
         type: str
+    cidr:
+        description:
+            - Remove leases whose IP address lies in this network, e.g. C(10.0.7.0/24).
+        required: false
+        type: str
+    oui:
+        description:
+            - Remove leases whose hardware address starts with this prefix, usually the three bytes of a vendor OUI
+              like C(b8:27:eb).
+        required: false
+        type: str
+    expired:
+        description:
+            - V(true) matches leases that have expired, V(false) leases that have not. Infinite leases never expire.
+        required: false
+        type: bool
+    older_than:
+        description:
+            - Remove leases handed out longer ago than this duration, like C(12h), C(7d) or C(2w).
+            - Pi-hole reports when a lease expires, not when it was handed out, so the age is computed from the
+              expiry and the C(dhcp.leaseTime) setting, one hour when it is empty. Reservations with their own lease
+              time and infinite leases are judged by that setting, or never match, respectively.
+        required: false
+        type: str
+    filters:
+        description:
+            - List of filter sets. A lease matching every key of at least one set is removed.
+        required: false
+        type: list
+        elements: dict
+        suboptions:
+            ip:
+                description: The IP address of the lease.
+                type: str
+            name:
+                description: The hostname of the lease.
+                type: str
+            clientid:
+                description: The client ID of the lease.
+                type: str
+            hwaddr:
+                description: The hardware address of the lease.
+                type: str
+            cidr:
+                description: A network the IP address of the lease lies in.
+                type: str
+            oui:
+                description: A prefix of the hardware address of the lease.
+                type: str
+            expired:
+                description: Whether the lease has expired.
+                type: bool
+            older_than:
+                description: A duration the lease was handed out longer ago than.
+                type: str
+    max_workers:
+        description:
+            - Maximum number of leases removed concurrently.
+        required: false
+        type: int
+        default: 4
     password:
         description:
             - The API password for the Pi-hole instance.
@@ -47,6 +134,9 @@ options:
             - The URL of the Pi-hole instance.
         required: true
         type: str
+extends_documentation_fragment:
+    - sbarbett.pihole.api
+    - sbarbett.pihole.current_state
 author:
     - Shane Barbetta (@sbarbett)
 '''
@@ -76,32 +166,120 @@ EXAMPLES = r'''
     password: "{{ pihole_password }}"
     name: "test-host2"
     clientid: "01:aa:bb:cc:dd:ee:f2"
+
+- name: Clear a decommissioned subnet, every Raspberry Pi and leases older than a week
+  sbarbett.pihole.dhcp_remove_lease:
+    url: "https://your-pihole.example.com"
+    password: "{{ pihole_password }}"
+    filters:
+      - cidr: "10.0.8.0/24"
+      - oui: "b8:27:eb"
+      - older_than: 7d
+    max_workers: 8
 '''
 
 RETURN = r'''
 result:
-    description: The API response from the Pi-hole server.
-    type: dict
+    description:
+        - One entry per removed lease with its C(ip) and, unless in check mode, the C(response) of the API.
+        - A dict with C(msg) when no lease matched.
+    type: raw
+    returned: always
+matched:
+    description: Number of leases matching the filters.
+    type: int
     returned: always
+    sample: 212
 changed:
     description: Whether any change was made.
     type: bool
     returned: always
+diff:
+    description:
+        - One entry per removed lease with its C(name), C(hwaddr) and C(clientid).
+        - Also returned in check mode, which reads the leases but removes none.
+    type: list
+    elements: dict
+    returned: when diff mode is on
+api_stats:
+    description:
+        - The API requests the module made, as described for O(api_stats).
+    type: dict
+    returned: when O(api_stats) is enabled
+    sample:
+        requests: 3
+        logins: 1
+        bytes_in: 3264
+        bytes_out: 0
+        total_seconds: 0.0379
+        p95_seconds: 0.0143
+        endpoints:
+            GET dhcp/leases: {count: 1, seconds: 0.0143}
+            DELETE dhcp/leases/{item}: {count: 2, seconds: 0.0236}
 '''
 
+def lease_filters(params):
+    """
+    Collect the filter sets of the module, the top-level options forming one of them.
+
+    Returns:
+        list: Filter sets returned by normalize_filter()
+    """
+    filters = [normalize_filter(lease_filter) for lease_filter in params['filters'] or []]
+    top_level = dict((key, params[key]) for key in FILTER_KEYS if params[key] is not None)
+    if top_level:
+        filters.append(normalize_filter(top_level))
+    return filters
+
+
+def lease_seconds(module, client):
+    """Return the lease time of the DHCP server in seconds, for telling the age of leases."""
+    current = config_section(module, client, "dhcp/leaseTime")
+    value = current.get("config", {}).get("dhcp", {}).get("leaseTime")
+    if not value:
+        return DEFAULT_LEASE_SECONDS
+    try:
+        return parse_duration(value) or 0
+    except PiholeModuleError:
+        return DEFAULT_LEASE_SECONDS
+
+
 def run_module():
     module_args = dict(
         ip=dict(type='str', required=False),
         name=dict(type='str', required=False),
         clientid=dict(type='str', required=False),
         hwaddr=dict(type='str', required=False),
+        cidr=dict(type='str', required=False),
+        oui=dict(type='str', required=False),
+        expired=dict(type='bool', required=False),
+        older_than=dict(type='str', required=False),
+        filters=dict(
+            type='list',
+            elements='dict',
+            required=False,
+            options=dict(
+                ip=dict(type='str', required=False),
+                name=dict(type='str', required=False),
+                clientid=dict(type='str', required=False),
+                hwaddr=dict(type='str', required=False),
+                cidr=dict(type='str', required=False),
+                oui=dict(type='str', required=False),
+                expired=dict(type='bool', required=False),
+                older_than=dict(type='str', required=False),
+            ),
+        ),
+        max_workers=dict(type='int', required=False, default=DEFAULT_REMOVE_WORKERS),
         password=dict(type='str', required=True, no_log=True),
         url=dict(type='str', required=True)
     )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
 
     result = dict(
         changed=False,
-        result={}
+        result={},
+        matched=0,
     )
 
     module = AnsibleModule(
@@ -109,51 +287,54 @@ def run_module():
         supports_check_mode=True
     )
 
-    ip = module.params['ip']
-    name = module.params['name']
-    clientid = module.params['clientid']
-    hwaddr = module.params['hwaddr']
-    password = module.params['password']
-    url = module.params['url']
-
-    filters = {k: v for k, v in {'ip': ip, 'name': name, 'clientid': clientid, 'hwaddr': hwaddr}.items() if v}
+    try:
+        filters = lease_filters(module.params)
+    except PiholeModuleError as e:
+        module.fail_json(msg=str(e))
 
     if not filters:
-        module.fail_json(msg="At least one of 'ip', 'name', 'clientid', or 'hwaddr' must be specified.")
-
-    if module.check_mode:
-        module.exit_json(**result)
+        module.fail_json(msg=f"At least one of {', '.join(repr(key) for key in FILTER_KEYS)} or 'filters' must be specified.")
 
+    client = None
     try:
-        client = PiHole6Client(url, password)
+        client = get_client(module)
 
         # Retrieve existing DHCP leases
-        leases = client.dhcp.get_leases().get("leases", [])
+        leases = snapshot_section(module, client, 'leases')
+        if leases is None:
+            leases = client.dhcp.get_leases().get("leases", [])
 
-        # Find leases that match ALL specified filters
-        matching_leases = [
-            lease for lease in leases
-            if all(lease.get(key) == value for key, value in filters.items())
-        ]
+        seconds = DEFAULT_LEASE_SECONDS
+        if any('older_than' in lease_filter for lease_filter in filters):
+            seconds = lease_seconds(module, client)
+
+        # Find leases that match ALL keys of ANY filter set
+        matching_leases = LeaseIndex(leases).match(filters, time.time(), seconds)
+        result['matched'] = len(matching_leases)
 
         if not matching_leases:
             result['changed'] = False
             result['result'] = {"msg": "No matching leases found"}
-            module.exit_json(**result)
+            module.exit_json(**result, **api_stats_result(module))
 
-        # Remove each matching lease
-        responses = []
+        diff = ItemDiff('lease')
         for lease in matching_leases:
-            response = client.dhcp.remove_lease(lease["ip"])
-            responses.append({"ip": lease["ip"], "response": response})
+            diff.add(lease["ip"], {key: lease.get(key) for key in ('name', 'hwaddr', 'clientid')}, None)
+
+        addresses = [lease["ip"] for lease in matching_leases]
+        responses = {}
+        if not module.check_mode:
+            responses = remove_leases(client, addresses, max_workers=module.params['max_workers'])
 
         result['changed'] = True
-        result['result'] = responses
+        result['result'] = [dict(ip=address, response=responses[address]) if address in responses else dict(ip=address)
+                            for address in addresses]
+        result.update(diff_result(module, diff))
 
-        module.exit_json(**result)
+        module.exit_json(**result, **api_stats_result(module))
 
     except Exception as e:
-        module.fail_json(msg=f"Error removing DHCP lease: {e}", **result)
+        module.fail_json(msg=f"Error removing DHCP lease: {e}", **result, **api_stats_result(module))
     finally:
         if client is not None:
             client.close_session()
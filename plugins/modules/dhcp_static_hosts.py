@@ -0,0 +1,324 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: dhcp_static_hosts
+short_description: Manage Pi-hole static DHCP reservations in bulk
+description:
+  - Adds, updates or removes static DHCP reservations in the C(dhcp.hosts) setting of a Pi-hole instance.
+  - Reads C(dhcp.hosts) once, indexes its entries by hardware address, computes the difference against the requested
+    reservations and writes the whole section back in a single configuration PATCH, so Pi-hole reloads its DHCP
+    server once per run instead of once per reservation.
+  - Entries are written in the dnsmasq C(dhcp-host) syntax Pi-hole uses, C(mac,ip,hostname[,lease_time]). Tags and
+    client identifiers of existing entries are kept, and entries the module does not understand are written back
+    unchanged.
+  - Hardware addresses and IP addresses reserved by more than one entry of the resulting list are reported in
+    RV(conflicts). Conflicts involving a requested reservation fail the module before anything is written; conflicts
+    between entries the task does not touch are only reported.
+  - M(sbarbett.pihole.dhcp_config) manages the other DHCP settings and leaves C(dhcp.hosts) alone.
+version_added: "1.2.0"
+options:
+  hosts:
+    description:
+      - List of reservations to manage, one per hardware address.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      mac:
+        description:
+          - Hardware address of the client, with colon or dash separators in any case.
+        type: str
+        required: true
+      ip:
+        description:
+          - IPv4 or IPv6 address reserved for the client.
+          - When unset the address of an existing reservation is left alone.
+        type: str
+        required: false
+      hostname:
+        description:
+          - Hostname handed to the client.
+          - When unset the hostname of an existing reservation is left alone.
+        type: str
+        required: false
+      lease_time:
+        description:
+          - Lease time of the reservation, like V(24h), V(7d) or V(infinite).
+          - When unset the lease time of an existing reservation is left alone, and new reservations use the
+            lease time of the DHCP range.
+        type: str
+        required: false
+      state:
+        description:
+          - Whether the reservation should exist or not. Defaults to the top-level O(state).
+          - A present reservation needs O(hosts[].ip) or O(hosts[].hostname).
+        type: str
+        required: false
+        choices: [ present, absent ]
+  state:
+    description:
+      - Default state for reservations that do not set their own.
+    type: str
+    required: false
+    default: present
+    choices: [ present, absent ]
+  purge:
+    description:
+      - Remove every reservation whose hardware addresses are not listed in O(hosts), making O(hosts) the complete
+        list of reservations. Entries the module does not understand are kept.
+    type: bool
+    required: false
+    default: false
+  url:
+    description:
+      - URL of the Pi-hole server.
+      - Required unless O(instances) is used.
+    type: str
+    required: false
+  password:
+    description:
+      - Password for the Pi-hole server.
+      - Required with O(url).
+    type: str
+    required: false
+extends_documentation_fragment:
+  - sbarbett.pihole.api
+  - sbarbett.pihole.instances
+  - sbarbett.pihole.current_state
+requirements:
+  - pihole6api
+author:
+  - Shane Barbetta (@sbarbett)
+'''
+
+EXAMPLES = r'''
+- name: Reserve addresses for a few clients
+  sbarbett.pihole.dhcp_static_hosts:
+    hosts:
+      - mac: "aa:bb:cc:dd:ee:01"
+        ip: 192.168.1.10
+        hostname: nas
+      - mac: "AA-BB-CC-DD-EE-02"
+        ip: 192.168.1.11
+        hostname: printer
+        lease_time: infinite
+      - mac: "aa:bb:cc:dd:ee:03"
+        state: absent
+    url: "https://pihole.example.com"
+    password: "{{ pihole_password }}"
+
+- name: Make the inventory the complete list of reservations on every Pi-hole
+  sbarbett.pihole.dhcp_static_hosts:
+    hosts: "{{ dhcp_reservations }}"
+    purge: true
+    instances: "{{ pihole_hosts }}"
+'''
+
+RETURN = r'''
+hosts:
+  description: The requested reservations and what happened to each of them.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    mac:
+      description: The hardware address, lowercase with colon separators.
+      returned: always
+      type: str
+      sample: "aa:bb:cc:dd:ee:01"
+    ip:
+      description: The requested IP address.
+      returned: always
+      type: str
+      sample: 192.168.1.10
+    hostname:
+      description: The requested hostname.
+      returned: always
+      type: str
+      sample: nas
+    state:
+      description: One of C(created), C(updated), C(deleted), C(unchanged) or C(absent_already).
+      returned: always
+      type: str
+      sample: created
+summary:
+  description: Number of reservations added, updated, removed and left unchanged.
+  returned: always
+  type: dict
+  sample: {added: 12, updated: 3, removed: 1, unchanged: 1484}
+conflicts:
+  description:
+    - Hardware and IP addresses reserved by more than one entry of the resulting C(dhcp.hosts) list.
+    - C(kind) is C(duplicate_mac) or C(duplicate_ip), C(value) the address and C(entries) the entries reserving it.
+  returned: always
+  type: list
+  elements: dict
+  sample:
+    - kind: duplicate_ip
+      value: 192.168.1.10
+      entries: ["aa:bb:cc:dd:ee:01,192.168.1.10,nas", "aa:bb:cc:dd:ee:09,192.168.1.10,old-nas"]
+diff:
+  description:
+    - One entry per added, changed or removed reservation with its C(dhcp.hosts) entry before and after.
+  returned: when diff mode is on
+  type: list
+  elements: dict
+instances:
+  description:
+    - One entry per instance when O(instances) is used, holding C(url), C(changed), C(failed), C(msg),
+      C(elapsed), RV(hosts), RV(summary) and RV(conflicts) for that instance.
+  returned: when instances is used
+  type: list
+  elements: dict
+api_stats:
+  description:
+    - The API requests the module made, as described for O(api_stats).
+    - With O(instances) the requests of all instances added up.
+  type: dict
+  returned: when O(api_stats) is enabled
+  sample:
+    requests: 2
+    logins: 1
+    bytes_in: 61840
+    bytes_out: 62310
+    total_seconds: 0.6412
+    p95_seconds: 0.6231
+    endpoints:
+      GET config/dhcp/hosts: {count: 1, seconds: 0.0181}
+      PATCH config: {count: 1, seconds: 0.6231}
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError, api_argument_spec
+from ansible_collections.sbarbett.pihole.plugins.module_utils.dhcp_hosts import (
+    index_hosts,
+    normalize_reservations,
+    plan_reservations,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.diff import ItemDiff, diff_result
+from ansible_collections.sbarbett.pihole.plugins.module_utils.fanout import (
+    INSTANCES_MODULE_KWARGS,
+    instances_argument_spec,
+    run_on_instances,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import config_list, current_state_argument_spec
+
+try:
+    from pihole6api import PiHole6Client
+    HAS_PIHOLE6API = True
+except ImportError:
+    HAS_PIHOLE6API = False
+
+# Reservation state -> summary counter
+SUMMARY_KEYS = dict(created='added', updated='updated', deleted='removed', unchanged='unchanged')
+
+
+def sync_reservations(module, client, reservations):
+    """
+    Apply the desired reservations to one Pi-hole instance.
+
+    Args:
+        module: AnsibleModule instance
+        client: PiHole6Client instance
+        reservations: Reservations returned by normalize_reservations()
+
+    Returns:
+        dict: Result with 'changed', 'hosts', 'summary' and 'conflicts'
+
+    Raises:
+        PiholeModuleError: When the new list would reserve a requested hardware or IP address twice
+    """
+    entries = config_list(module, client, "dhcp/hosts")
+    new_entries, states, conflicts = plan_reservations(entries, reservations, purge=module.params['purge'])
+
+    requested = set()
+    for reservation in reservations:
+        if reservation['state'] == 'present':
+            requested.update(value for value in (reservation['mac'], reservation['ip']) if value)
+    blocking = [conflict for conflict in conflicts if conflict['value'] in requested]
+    if blocking:
+        details = '; '.join(f"{conflict['value']} ({' | '.join(conflict['entries'])})" for conflict in blocking)
+        raise PiholeModuleError(f'Conflicting DHCP reservations: {details}')
+
+    summary = dict(added=0, updated=0, removed=0, unchanged=0)
+    for state in states.values():
+        if state in SUMMARY_KEYS:
+            summary[SUMMARY_KEYS[state]] += 1
+
+    diff = ItemDiff('reservation')
+    if module._diff:
+        before = index_hosts(entries)
+        after = index_hosts(new_entries)
+        for mac, state in sorted(states.items()):
+            if state in ('created', 'updated', 'deleted'):
+                diff.add(mac, entries[before[mac][0]] if mac in before else None,
+                         new_entries[after[mac][0]] if mac in after else None)
+
+    result = dict(
+        changed=new_entries != entries,
+        hosts=[dict(mac=reservation['mac'], ip=reservation['ip'], hostname=reservation.get('hostname'),
+                    state=states[reservation['mac']]) for reservation in reservations],
+        summary=summary,
+        conflicts=conflicts,
+    )
+
+    if result['changed'] and not module.check_mode:
+        response = client.config.update_config({"dhcp": {"hosts": new_entries}})
+        if isinstance(response, dict) and 'error' in response:
+            raise PiholeModuleError(f"Failed to update DHCP reservations: {response['error']}")
+
+    result.update(diff_result(module, diff))
+    return result
+
+
+def main():
+    module_args = dict(
+        hosts=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                mac=dict(type='str', required=True),
+                ip=dict(type='str', required=False),
+                hostname=dict(type='str', required=False),
+                lease_time=dict(type='str', required=False),
+                state=dict(type='str', required=False, choices=['present', 'absent']),
+            ),
+        ),
+        state=dict(type='str', required=False, default='present', choices=['present', 'absent']),
+        purge=dict(type='bool', required=False, default=False),
+        url=dict(type='str', required=False),
+        password=dict(type='str', required=False, no_log=True),
+    )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
+    module_args.update(instances_argument_spec())
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+        **INSTANCES_MODULE_KWARGS
+    )
+
+    if not HAS_PIHOLE6API:
+        module.fail_json(msg='The pihole6api module is required')
+
+    try:
+        reservations = normalize_reservations(module.params['hosts'], module.params['state'])
+    except PiholeModuleError as e:
+        module.fail_json(msg=str(e))
+
+    run_on_instances(
+        module,
+        lambda client: sync_reservations(module, client, reservations),
+        'Error managing DHCP reservations',
+    )
+
+
+if __name__ == '__main__':
+    main()
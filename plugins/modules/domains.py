@@ -0,0 +1,552 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: domains
+short_description: Manage Pi-hole exact and regex allow and deny domains in bulk
+description:
+  - Adds, updates or removes exact and regex domain entries on a Pi-hole instance through the C(/api/domains) endpoints.
+  - Reads every entry of the instance in one request and compares it with the requested domains, so only the
+    difference is sent.
+  - New domains sharing type, kind, comment, groups and enabled state are added with one request per O(batch_size)
+    domains, and removed domains are deleted with one C(domains:batchDelete) request per O(batch_size) domains.
+    Entries whose comment, groups or enabled state differ are updated one by one.
+  - Domains can be given inline with O(domains), read from a file with O(path), or both.
+  - Exact domains are compared the way Pi-hole stores them, lowercase and in their ASCII form.
+  - With O(analyze) the requested entries are checked before anything is sent for regular expressions that
+    duplicate or likely subsume others, exact domains a regular expression already matches, and regular expressions
+    that are slow to evaluate. O(drop_redundant) leaves the redundant entries out of the sync.
+version_added: "1.2.0"
+options:
+  domains:
+    description:
+      - List of domain entries to manage.
+    type: list
+    elements: dict
+    required: false
+    suboptions:
+      domain:
+        description:
+          - The domain, or the regular expression for O(domains[].kind=regex).
+        type: str
+        required: true
+      type:
+        description:
+          - Whether the entry allows or denies the domain.
+          - Defaults to the top-level O(type).
+        type: str
+        required: false
+        choices: [ allow, deny ]
+      kind:
+        description:
+          - Whether the entry matches the domain exactly or as a regular expression.
+          - Defaults to the top-level O(kind).
+        type: str
+        required: false
+        choices: [ exact, regex ]
+      comment:
+        description:
+          - Comment of the entry. Defaults to the top-level O(comment).
+          - When neither is set the comment of an existing entry is left alone.
+        type: str
+        required: false
+      groups:
+        description:
+          - Names of the groups the entry applies to. Defaults to the top-level O(groups).
+          - When neither is set new entries are assigned to the Default group and the groups of existing entries
+            are left alone.
+        type: list
+        elements: str
+        required: false
+      enabled:
+        description:
+          - Whether the entry is enabled. Defaults to the top-level O(enabled).
+        type: bool
+        required: false
+      state:
+        description:
+          - Whether the entry should exist or not. Defaults to the top-level O(state).
+        type: str
+        required: false
+        choices: [ present, absent ]
+  path:
+    description:
+      - File with one domain or regular expression per line, read on the host running the module.
+      - Blank lines and lines starting with C(#) are ignored.
+      - Every domain of the file takes the top-level O(type), O(kind), O(comment), O(groups), O(enabled) and O(state).
+        Entries of O(domains) for the same domain, type and kind take precedence.
+    type: path
+    required: false
+  type:
+    description:
+      - Default type of the entries.
+    type: str
+    required: false
+    default: deny
+    choices: [ allow, deny ]
+  kind:
+    description:
+      - Default kind of the entries.
+    type: str
+    required: false
+    default: exact
+    choices: [ exact, regex ]
+  comment:
+    description:
+      - Default comment of the entries.
+    type: str
+    required: false
+  groups:
+    description:
+      - Default group names of the entries.
+    type: list
+    elements: str
+    required: false
+  enabled:
+    description:
+      - Default enabled state of the entries.
+    type: bool
+    required: false
+    default: true
+  state:
+    description:
+      - Default state of the entries.
+    type: str
+    required: false
+    default: present
+    choices: [ present, absent ]
+  purge:
+    description:
+      - Remove every existing entry that is not requested, for each type and kind combination that at least one
+        requested entry uses. Combinations none of the requested entries use are left alone.
+      - Makes O(domains) and O(path) the complete list of those combinations, for example every exact deny domain.
+    type: bool
+    required: false
+    default: false
+  batch_size:
+    description:
+      - Number of domains sent in one add or batch delete request.
+    type: int
+    required: false
+    default: 1000
+  analyze:
+    description:
+      - Analyze the requested entries before they are sent and return the findings in RV(analysis).
+      - Only enabled entries with state V(present) are analyzed. An entry is redundant when another requested entry
+        of the same type that is enabled and applies to at least the same groups already matches every name it
+        matches.
+      - Regular expressions are parsed into a canonical form to find duplicates written differently, such as
+        V((^|\\.\)example\\.com$) and V((\\.|^\)example\\.com$). A regular expression is likely subsumed by
+        another one that matches every sample name generated from it. Samples are not a proof, so these overlaps
+        are reported as hints and never treated as redundant.
+      - Overlaps and covered exact domains only try the regular expressions whose required literal occurs in the
+        name, and the analysis stops after a fixed number of pattern searches on very large lists, with
+        RV(analysis.truncated) set and a warning.
+      - Every regular expression is timed against a synthetic corpus of realistic and adversarial names, which
+        finds patterns prone to catastrophic backtracking. Timings come from the Python engine, not the one in
+        FTL, so they rank patterns by cost rather than predict resolver latency.
+      - Run with C(check_mode) to only analyze.
+    type: bool
+    required: false
+    default: false
+  drop_redundant:
+    description:
+      - Leave the duplicate regular expressions and the covered exact domains found by the analysis out of the
+        sync. Implies O(analyze).
+      - Regular expressions only reported as overlaps are always kept.
+      - Redundant entries that already exist are left alone, or removed with O(purge).
+    type: bool
+    required: false
+    default: false
+  slow_regex_threshold:
+    description:
+      - Milliseconds a regular expression may take over the synthetic corpus before it is reported as slow.
+      - A regular expression still running after one second is stopped and reported as timed out.
+    type: float
+    required: false
+    default: 10
+  url:
+    description:
+      - URL of the Pi-hole server.
+      - Required unless O(instances) is used.
+    type: str
+    required: false
+  password:
+    description:
+      - Password for the Pi-hole server.
+      - Required with O(url).
+    type: str
+    required: false
+extends_documentation_fragment:
+  - sbarbett.pihole.api
+  - sbarbett.pihole.instances
+  - sbarbett.pihole.current_state
+notes:
+  - For tens of thousands of domains prefer O(path). Ansible validates every entry of O(domains) and echoes the
+    whole list back in the task result, which takes several seconds for 50,000 entries before and after the
+    module does its own work; a file of the same size is synced in about a second.
+requirements:
+  - pihole6api
+author:
+  - Shane Barbetta (@sbarbett)
+'''
+
+EXAMPLES = r'''
+- name: Deny a few domains and allow one
+  sbarbett.pihole.domains:
+    domains:
+      - domain: ads.example.com
+      - domain: tracker.example.net
+        comment: Tracking
+      - domain: cdn.example.com
+        type: allow
+        groups: [Default, iot]
+      - domain: '(^|\.)doubleclick\.net$'
+        kind: regex
+      - domain: old.example.org
+        state: absent
+    url: "https://pihole.example.com"
+    password: "{{ pihole_password }}"
+
+- name: Make a file the complete list of exact deny domains on every Pi-hole
+  sbarbett.pihole.domains:
+    path: /srv/pihole/deny-exact.txt
+    type: deny
+    kind: exact
+    comment: Managed by Ansible
+    purge: true
+    instances: "{{ pihole_hosts }}"
+
+- name: Check a regex list for redundant and slow patterns without changing anything
+  sbarbett.pihole.domains:
+    path: /srv/pihole/deny-regex.txt
+    kind: regex
+    analyze: true
+    url: "https://pihole.example.com"
+    password: "{{ pihole_password }}"
+  check_mode: true
+  register: regex_check
+
+- name: Push the regex list without its redundant entries
+  sbarbett.pihole.domains:
+    path: /srv/pihole/deny-regex.txt
+    kind: regex
+    drop_redundant: true
+    purge: true
+    instances: "{{ pihole_hosts }}"
+'''
+
+RETURN = r'''
+summary:
+  description: Number of entries added, updated, removed and left unchanged.
+  returned: always
+  type: dict
+  sample: {added: 49800, updated: 12, removed: 150, unchanged: 200}
+requested:
+  description: Number of distinct entries requested through O(domains) and O(path).
+  returned: always
+  type: int
+  sample: 50000
+analysis:
+  description:
+    - Findings of the analysis of the requested entries, the same for every instance.
+    - C(regexes) and C(exact) count the analyzed entries.
+    - C(invalid) lists regular expressions that do not compile, with the C(error).
+    - C(slow) lists regular expressions slower than O(slow_regex_threshold) with their C(milliseconds), whether
+      they C(timed_out) and C(hints) like C(nested quantifier) or C(backreference) on why.
+    - C(duplicates) and C(covered) list the redundant entries with the entry that makes them redundant in
+      C(duplicate_of) and C(covered_by).
+    - C(overlaps) lists regular expressions another one likely subsumes, in C(likely_subsumed_by). They are hints
+      and never dropped.
+    - C(truncated) is true when the analysis stopped early on a very large list, so C(overlaps) and C(covered)
+      may be incomplete.
+    - C(dropped) is the number of entries left out of the sync by O(drop_redundant).
+  returned: when O(analyze) or O(drop_redundant) is enabled
+  type: dict
+  sample:
+    regexes: 120
+    exact: 4800
+    invalid: []
+    slow:
+      - {domain: '^(a+)+\.example$', type: deny, milliseconds: 1000.0, timed_out: true, hints: [nested quantifier]}
+    duplicates:
+      - {domain: '(\.|^)doubleclick\.net$', type: deny, duplicate_of: '(^|\.)doubleclick\.net$'}
+    overlaps:
+      - {domain: '^ad\.doubleclick\.net$', type: deny, likely_subsumed_by: '(^|\.)doubleclick\.net$'}
+    covered:
+      - {domain: stats.doubleclick.net, type: deny, covered_by: '(^|\.)doubleclick\.net$'}
+    truncated: false
+    dropped: 3
+diff:
+  description:
+    - One entry per added, changed or removed domain with its comment, groups and enabled state before and after.
+  returned: when diff mode is on
+  type: list
+  elements: dict
+instances:
+  description:
+    - One entry per instance when O(instances) is used, holding C(url), C(changed), C(failed), C(msg),
+      C(elapsed) and RV(summary) for that instance.
+  returned: when instances is used
+  type: list
+  elements: dict
+api_stats:
+  description:
+    - The API requests the module made, as described for O(api_stats).
+    - With O(instances) the requests of all instances added up.
+  type: dict
+  returned: when O(api_stats) is enabled
+  sample:
+    requests: 52
+    logins: 0
+    bytes_in: 1843000
+    bytes_out: 1250000
+    total_seconds: 1.84
+    p95_seconds: 0.91
+    endpoints:
+      GET domains: {count: 1, seconds: 0.91}
+      POST domains/deny/exact: {count: 50, seconds: 0.88}
+      POST domains:batchDelete: {count: 1, seconds: 0.05}
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_native
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError, api_argument_spec
+from ansible_collections.sbarbett.pihole.plugins.module_utils.diff import ItemDiff, diff_result
+from ansible_collections.sbarbett.pihole.plugins.module_utils.domains import (
+    DOMAIN_KINDS,
+    DOMAIN_TYPES,
+    add_domains,
+    delete_domains,
+    domain_key,
+    fetch_domains,
+    normalize_domain,
+    update_domain,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.fanout import (
+    INSTANCES_MODULE_KWARGS,
+    instances_argument_spec,
+    run_on_instances,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.group_resolver import GroupResolver
+from ansible_collections.sbarbett.pihole.plugins.module_utils.regex_analysis import analyze_domains
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import current_state_argument_spec
+
+try:
+    from pihole6api import PiHole6Client
+    HAS_PIHOLE6API = True
+except ImportError:
+    HAS_PIHOLE6API = False
+
+
+def read_domain_file(path):
+    """Return the domains listed in a file, one per line, skipping blank lines and comments."""
+    try:
+        with open(path, 'r') as f:
+            lines = [line.strip() for line in f]
+    except (IOError, OSError) as e:
+        raise PiholeModuleError(f'Cannot read {path}: {to_native(e)}')
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def normalize_entries(params):
+    """
+    Merge the file and inline entries into one desired entry per domain, type and kind.
+
+    Inline entries are applied after the file so they take precedence.
+
+    Returns:
+        dict: Mapping of domain_key() to the entry with every option filled in
+    """
+    defaults = dict((key, params[key]) for key in ('type', 'kind', 'comment', 'groups', 'enabled', 'state'))
+    items = [dict(domain=domain) for domain in read_domain_file(params['path'])] if params['path'] else []
+    items.extend(params['domains'] or [])
+
+    desired = {}
+    for item in items:
+        entry = dict(defaults)
+        entry.update((key, value) for key, value in item.items() if value is not None)
+        entry['domain'] = normalize_domain(entry['domain'], entry['kind'])
+        if not entry['domain']:
+            raise PiholeModuleError('Domains must not be empty')
+        desired[domain_key(entry['domain'], entry['type'], entry['kind'])] = entry
+    return desired
+
+
+def sync_domains(module, client, desired):
+    """
+    Apply the desired domain entries to one Pi-hole instance.
+
+    Args:
+        module: AnsibleModule instance
+        client: PiHole6Client instance
+        desired: Mapping returned by normalize_entries()
+
+    Returns:
+        dict: Result with 'changed', 'summary' and 'requested'
+    """
+    batch_size = module.params['batch_size']
+    resolver = GroupResolver(module, client)
+    existing = fetch_domains(module, client)
+    diff = ItemDiff('domain')
+
+    def note(entry, before, after):
+        # Describing entries resolves group names, which is only worth it when the diff is shown
+        if not module._diff:
+            return
+        diff.add(f"{entry['type']} {entry['kind']} {entry['domain']}", describe(before), describe(after))
+
+    def describe(entry):
+        if entry is None:
+            return None
+        return dict(comment=entry.get('comment'), groups=sorted(resolver.to_names(entry.get('groups') or [])),
+                    enabled=entry.get('enabled'))
+
+    # Group ids are resolved once per distinct group list, not once per domain
+    group_ids = {}
+
+    def ids(names):
+        key = tuple(names or ())
+        if key not in group_ids:
+            group_ids[key] = resolver.to_ids(list(key))
+        return group_ids[key]
+
+    additions = {}
+    updates = []
+    deletions = []
+    unchanged = 0
+
+    for key, entry in desired.items():
+        current = existing.get(key)
+        if entry['state'] == 'absent':
+            if current is not None:
+                deletions.append(key)
+                note(entry, current, None)
+            continue
+
+        groups = ids(entry['groups']) if entry['groups'] else None
+        if current is None:
+            settings = (entry['type'], entry['kind'], entry['comment'], tuple(groups or [0]), entry['enabled'])
+            additions.setdefault(settings, []).append(entry['domain'])
+            note(entry, None, dict(comment=entry['comment'], groups=groups or [0], enabled=entry['enabled']))
+            continue
+
+        after = dict(
+            comment=current.get('comment') if entry['comment'] is None else entry['comment'],
+            groups=current.get('groups', []) if groups is None else groups,
+            enabled=entry['enabled'],
+        )
+        if (after['comment'] != current.get('comment') or set(after['groups']) != set(current.get('groups', []))
+                or bool(after['enabled']) != bool(current.get('enabled'))):
+            updates.append((entry, after))
+            note(entry, current, after)
+        else:
+            unchanged += 1
+
+    if module.params['purge']:
+        scopes = set((entry['type'], entry['kind']) for entry in desired.values())
+        for key, current in existing.items():
+            if key not in desired and (current['type'], current['kind']) in scopes:
+                deletions.append(key)
+                note(current, current, None)
+
+    summary = dict(
+        added=sum(len(domains) for domains in additions.values()),
+        updated=len(updates),
+        removed=len(deletions),
+        unchanged=unchanged,
+    )
+    result = dict(changed=bool(additions or updates or deletions), summary=summary, requested=len(desired))
+
+    if not module.check_mode:
+        # Removing first frees names an entry of another type or kind may take over
+        if deletions:
+            delete_domains(client, deletions, batch_size=batch_size)
+        for (domain_type, kind, comment, groups, enabled), domains in additions.items():
+            add_domains(client, domains, domain_type, kind, comment=comment, groups=list(groups), enabled=enabled,
+                        batch_size=batch_size)
+        for entry, after in updates:
+            update_domain(client, entry['domain'], entry['type'], entry['kind'], comment=after['comment'],
+                          groups=after['groups'], enabled=after['enabled'])
+
+    result.update(diff_result(module, diff))
+    return result
+
+
+def main():
+    module_args = dict(
+        domains=dict(
+            type='list',
+            elements='dict',
+            required=False,
+            options=dict(
+                domain=dict(type='str', required=True),
+                type=dict(type='str', required=False, choices=DOMAIN_TYPES),
+                kind=dict(type='str', required=False, choices=DOMAIN_KINDS),
+                comment=dict(type='str', required=False),
+                groups=dict(type='list', elements='str', required=False),
+                enabled=dict(type='bool', required=False),
+                state=dict(type='str', required=False, choices=['present', 'absent']),
+            ),
+        ),
+        path=dict(type='path', required=False),
+        type=dict(type='str', required=False, default='deny', choices=DOMAIN_TYPES),
+        kind=dict(type='str', required=False, default='exact', choices=DOMAIN_KINDS),
+        comment=dict(type='str', required=False),
+        groups=dict(type='list', elements='str', required=False),
+        enabled=dict(type='bool', required=False, default=True),
+        state=dict(type='str', required=False, default='present', choices=['present', 'absent']),
+        purge=dict(type='bool', required=False, default=False),
+        batch_size=dict(type='int', required=False, default=1000),
+        analyze=dict(type='bool', required=False, default=False),
+        drop_redundant=dict(type='bool', required=False, default=False),
+        slow_regex_threshold=dict(type='float', required=False, default=10.0),
+        url=dict(type='str', required=False),
+        password=dict(type='str', required=False, no_log=True),
+    )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
+    module_args.update(instances_argument_spec())
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+        required_one_of=INSTANCES_MODULE_KWARGS['required_one_of'] + [['domains', 'path']],
+        mutually_exclusive=INSTANCES_MODULE_KWARGS['mutually_exclusive'],
+        required_by=INSTANCES_MODULE_KWARGS['required_by'],
+    )
+
+    if not HAS_PIHOLE6API:
+        module.fail_json(msg='The pihole6api module is required')
+
+    try:
+        desired = normalize_entries(module.params)
+    except PiholeModuleError as e:
+        module.fail_json(msg=str(e))
+
+    result = {}
+    if module.params['analyze'] or module.params['drop_redundant']:
+        analysis, redundant = analyze_domains(desired.values(), slow_ms=module.params['slow_regex_threshold'])
+        analysis['dropped'] = 0
+        if module.params['drop_redundant']:
+            for entry in redundant:
+                desired.pop(domain_key(entry['domain'], entry['type'], entry['kind']), None)
+            analysis['dropped'] = len(redundant)
+        if analysis['truncated']:
+            module.warn('The domain analysis stopped early, so overlaps and covered domains may be incomplete')
+        result['analysis'] = analysis
+
+    run_on_instances(
+        module,
+        lambda client: sync_domains(module, client, desired),
+        'Error managing domains',
+        result=result,
+    )
+
+
+if __name__ == '__main__':
+    main()
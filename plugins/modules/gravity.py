@@ -0,0 +1,213 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: gravity
+short_description: Run Pi-hole gravity via Pi-hole v6 API.
+description:
+    - This module runs gravity on a Pi-hole v6 instance, which downloads the configured lists and rebuilds the gravity database.
+    - The gravity output is read while the run is in progress, so O(timeout) bounds the silence between two lines of output
+      rather than the whole run.
+    - With O(wait=false) the run is started in a detached background process and the module returns immediately with a
+      RV(job_id). Use M(sbarbett.pihole.gravity_status) to follow the progress and collect the result. This lets runs on
+      several instances overlap instead of holding a worker for each of them.
+version_added: "1.2.0"
+options:
+    wait:
+        description:
+            - Whether to wait for the gravity run to finish.
+            - When V(false), the module returns a RV(job_id) for M(sbarbett.pihole.gravity_status).
+            - Background runs must be polled on the same host that started them.
+        required: false
+        type: bool
+        default: true
+    timeout:
+        description:
+            - Seconds to wait for the next line of gravity output before the run is considered stalled.
+        required: false
+        type: int
+        default: 600
+    job_dir:
+        description:
+            - Directory holding the state of background gravity runs.
+            - Defaults to C(~/.ansible/pihole/gravity).
+        required: false
+        type: path
+    password:
+        description:
+            - The API password for the Pi-hole instance.
+        required: true
+        type: str
+        no_log: true
+    url:
+        description:
+            - The URL of the Pi-hole instance.
+        required: true
+        type: str
+extends_documentation_fragment:
+    - sbarbett.pihole.api
+seealso:
+    - module: sbarbett.pihole.gravity_status
+author:
+    - Shane Barbetta (@sbarbett)
+'''
+
+EXAMPLES = r'''
+- name: Run gravity and wait for it
+  sbarbett.pihole.gravity:
+    url: "https://your-pihole.example.com"
+    password: "{{ pihole_password }}"
+
+- name: Start gravity on every Pi-hole without waiting
+  sbarbett.pihole.gravity:
+    url: "{{ item.name }}"
+    password: "{{ item.password }}"
+    wait: false
+  loop: "{{ pihole_hosts }}"
+  register: gravity_jobs
+
+- name: Wait for all gravity runs to finish
+  sbarbett.pihole.gravity_status:
+    job_id: "{{ item.job_id }}"
+  loop: "{{ gravity_jobs.results }}"
+  register: gravity_result
+  until: gravity_result.finished
+  retries: 120
+  delay: 5
+'''
+
+RETURN = r'''
+job_id:
+    description: Id of the background run, to be passed to M(sbarbett.pihole.gravity_status).
+    type: str
+    returned: when wait is false
+    sample: 3f2a9c0d41b7e865
+finished:
+    description: Whether the gravity run has finished.
+    type: bool
+    returned: always
+duration:
+    description: Duration of the gravity run in seconds.
+    type: float
+    returned: when wait is true
+    sample: 42.317
+lists_processed:
+    description: Number of lists gravity downloaded or tried to download.
+    type: int
+    returned: when wait is true
+    sample: 12
+lists_failed:
+    description: Number of lists gravity could not retrieve.
+    type: int
+    returned: when wait is true
+    sample: 0
+domains:
+    description: Number of domains in the gravity database after the run, if reported by Pi-hole.
+    type: int
+    returned: when wait is true
+    sample: 184312
+unique_domains:
+    description: Number of unique domains in the gravity database after the run, if reported by Pi-hole.
+    type: int
+    returned: when wait is true
+    sample: 170054
+output:
+    description: The gravity output, one line per element, with terminal escape sequences removed.
+    type: list
+    elements: str
+    returned: when wait is true
+api_stats:
+    description:
+        - The API requests the module made, as described for O(api_stats).
+    type: dict
+    returned: when O(api_stats) is enabled
+    sample:
+        requests: 1
+        logins: 1
+        bytes_in: 18422
+        bytes_out: 0
+        total_seconds: 41.8127
+        p95_seconds: 41.8127
+        endpoints:
+            POST action/gravity: {count: 1, seconds: 41.8127}
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import api_argument_spec, get_client
+from ansible_collections.sbarbett.pihole.plugins.module_utils.gravity import (
+    DEFAULT_GRAVITY_TIMEOUT,
+    run_gravity,
+    start_gravity_job,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.stats import api_stats_result
+
+try:
+    from pihole6api import PiHole6Client
+    HAS_PIHOLE6API = True
+except ImportError:
+    HAS_PIHOLE6API = False
+
+
+def run_module():
+    module_args = dict(
+        wait=dict(type='bool', required=False, default=True),
+        timeout=dict(type='int', required=False, default=DEFAULT_GRAVITY_TIMEOUT),
+        job_dir=dict(type='path', required=False, default=None),
+        password=dict(type='str', required=True, no_log=True),
+        url=dict(type='str', required=True)
+    )
+    module_args.update(api_argument_spec())
+
+    result = dict(
+        changed=False,
+        finished=False,
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    if not HAS_PIHOLE6API:
+        module.fail_json(msg='The pihole6api module is required')
+
+    # A gravity run always rebuilds the database
+    result['changed'] = True
+
+    if module.check_mode:
+        module.exit_json(**result)
+
+    if not module.params['wait']:
+        try:
+            result['job_id'] = start_gravity_job(
+                lambda: get_client(module),
+                module.params['url'],
+                timeout=module.params['timeout'],
+                directory=module.params['job_dir'],
+            )
+        except Exception as e:
+            module.fail_json(msg=f"Error starting gravity: {e}", **result)
+        module.exit_json(**result)
+
+    client = None
+    try:
+        client = get_client(module)
+        result.update(run_gravity(client, timeout=module.params['timeout']))
+        result['finished'] = True
+        module.exit_json(**result, **api_stats_result(module))
+
+    except Exception as e:
+        module.fail_json(msg=f"Error running gravity: {e}", **result, **api_stats_result(module))
+    finally:
+        if client is not None:
+            client.close_session()
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()
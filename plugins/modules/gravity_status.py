@@ -0,0 +1,183 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: gravity_status
+short_description: Follow a background Pi-hole gravity run.
+description:
+    - This module reports the progress of a gravity run started by M(sbarbett.pihole.gravity) with O(sbarbett.pihole.gravity#module:wait=false).
+    - While the run is in progress it returns the output produced so far. Once it has finished it returns the duration,
+      the number of lists processed and the number of domains in the gravity database.
+    - Use it with C(until) to wait for a run to finish. It must run on the same host as the task that started the run.
+version_added: "1.2.0"
+options:
+    job_id:
+        description:
+            - The RV(sbarbett.pihole.gravity#module:job_id) returned by M(sbarbett.pihole.gravity).
+        required: true
+        type: str
+    mode:
+        description:
+            - V(status) reports the state of the run.
+            - V(cleanup) removes the state of a finished run, or of one whose background process is gone.
+        required: false
+        type: str
+        default: status
+        choices: ['status', 'cleanup']
+    job_dir:
+        description:
+            - Directory holding the state of background gravity runs.
+            - Must match O(sbarbett.pihole.gravity#module:job_dir) of the task that started the run.
+        required: false
+        type: path
+seealso:
+    - module: sbarbett.pihole.gravity
+author:
+    - Shane Barbetta (@sbarbett)
+'''
+
+EXAMPLES = r'''
+- name: Start gravity without waiting
+  sbarbett.pihole.gravity:
+    url: "https://your-pihole.example.com"
+    password: "{{ pihole_password }}"
+    wait: false
+  register: gravity_job
+
+- name: Wait for gravity to finish
+  sbarbett.pihole.gravity_status:
+    job_id: "{{ gravity_job.job_id }}"
+  register: gravity_result
+  until: gravity_result.finished
+  retries: 120
+  delay: 5
+
+- name: Remove the state of the finished run
+  sbarbett.pihole.gravity_status:
+    job_id: "{{ gravity_job.job_id }}"
+    mode: cleanup
+'''
+
+RETURN = r'''
+finished:
+    description: Whether the gravity run has finished.
+    type: bool
+    returned: always
+status:
+    description:
+        - One of C(running), C(finished) or C(failed).
+        - A run whose background process exited without recording a result, for example because it was killed,
+          is C(failed).
+    type: str
+    returned: always
+    sample: finished
+url:
+    description: The URL of the Pi-hole instance the run belongs to.
+    type: str
+    returned: always
+output:
+    description: The gravity output received so far, one line per element.
+    type: list
+    elements: str
+    returned: always
+duration:
+    description: Duration of the gravity run in seconds.
+    type: float
+    returned: when finished
+    sample: 42.317
+lists_processed:
+    description: Number of lists gravity downloaded or tried to download.
+    type: int
+    returned: when finished
+    sample: 12
+lists_failed:
+    description: Number of lists gravity could not retrieve.
+    type: int
+    returned: when finished
+    sample: 0
+domains:
+    description: Number of domains in the gravity database after the run, if reported by Pi-hole.
+    type: int
+    returned: when finished
+    sample: 184312
+unique_domains:
+    description: Number of unique domains in the gravity database after the run, if reported by Pi-hole.
+    type: int
+    returned: when finished
+    sample: 170054
+'''
+
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.sbarbett.pihole.plugins.module_utils.gravity import job_cache, job_process_alive
+
+
+def run_module():
+    module_args = dict(
+        job_id=dict(type='str', required=True),
+        mode=dict(type='str', required=False, default='status', choices=['status', 'cleanup']),
+        job_dir=dict(type='path', required=False, default=None),
+    )
+
+    result = dict(
+        changed=False,
+        finished=False,
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    job_id = module.params['job_id']
+    try:
+        job = job_cache(job_id, module.params['job_dir'])
+    except Exception as e:
+        module.fail_json(msg=str(e), **result)
+
+    if not os.path.exists(job.path):
+        module.fail_json(msg=f"Could not find gravity job {job_id}", **result)
+
+    data = job.read()
+    if data.get('status') == 'running' and not job_process_alive(data):
+        # The process records its result right before exiting, so read again before calling it dead
+        data = job.read()
+        if data.get('status') == 'running':
+            data.update(status='failed', msg=f"The gravity process {data['pid']} exited without recording a result")
+    result.update(
+        finished=data.get('status') != 'running',
+        status=data.get('status'),
+        url=data.get('url'),
+        output=data.get('output', []),
+    )
+    if result['finished']:
+        for key in ('duration', 'lists_processed', 'lists_failed', 'domains', 'unique_domains'):
+            result[key] = data.get(key)
+
+    if module.params['mode'] == 'cleanup':
+        if not result['finished']:
+            module.fail_json(msg=f"Gravity job {job_id} is still running", **result)
+        if not module.check_mode:
+            for path in (job.path, job.lock_path):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        result['changed'] = True
+        module.exit_json(**result)
+
+    if data.get('status') == 'failed':
+        module.fail_json(msg=f"Gravity run failed: {data.get('msg')}", **result)
+
+    module.exit_json(**result)
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,10 @@ short_description: Manage PiHole groups
 description:
   - Create, update, or delete PiHole groups.
 version_added: "1.0.0"
+extends_documentation_fragment:
+  - sbarbett.pihole.api
+  - sbarbett.pihole.instances
+  - sbarbett.pihole.current_state
 author:
   - Simon Barbett (@sbarbett)
 options:
@@ -50,13 +54,15 @@ options:
   url:
     description:
       - URL of the PiHole server.
+      - Required unless O(instances) is used.
     type: str
-    required: true
+    required: false
   password:
     description:
       - Password for the PiHole server.
+      - Required with O(url).
     type: str
-    required: true
+    required: false
 requirements:
   - pihole6api
 '''
@@ -78,6 +84,18 @@ EXAMPLES = r'''
         state: present
     url: "https://pihole.example.com"
     password: "admin_password"
+
+- name: Manage groups on several PiHoles at once
+  sbarbett.pihole.groups:
+    groups:
+      - name: IOT
+        comment: IOT VLAN
+        state: present
+    instances:
+      - url: "https://pihole1.example.com"
+        password: "admin_password"
+      - url: "https://pihole2.example.com"
+        password: "admin_password"
 '''
 
 RETURN = r'''
@@ -122,10 +140,49 @@ groups:
       returned: always
       type: str
       sample: present
+diff:
+  description:
+    - One entry per created, changed or deleted group with its C(comment) and C(enabled) state before and after.
+  returned: when diff mode is on
+  type: list
+  elements: dict
+instances:
+  description:
+    - One entry per instance when O(instances) is used, holding C(url), C(changed), C(failed), C(msg),
+      C(elapsed) and the RV(groups) list for that instance.
+  returned: when instances is used
+  type: list
+  elements: dict
+api_stats:
+  description:
+    - The API requests the module made, as described for O(api_stats).
+    - With O(instances) the requests of all instances added up.
+  type: dict
+  returned: when O(api_stats) is enabled
+  sample:
+    requests: 3
+    logins: 1
+    bytes_in: 2184
+    bytes_out: 96
+    total_seconds: 0.0412
+    p95_seconds: 0.0231
+    endpoints:
+      GET groups: {count: 1, seconds: 0.0118}
+      POST groups: {count: 1, seconds: 0.0231}
+      PUT groups/{item}: {count: 1, seconds: 0.0063}
 '''
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.common.text.converters import to_native
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError, api_argument_spec
+from ansible_collections.sbarbett.pihole.plugins.module_utils.diff import ItemDiff, diff_result
+from ansible_collections.sbarbett.pihole.plugins.module_utils.fanout import (
+    INSTANCES_MODULE_KWARGS,
+    instances_argument_spec,
+    run_on_instances,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.group_resolver import fetch_groups, invalidate_groups
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import current_state_argument_spec, snapshot_section
 
 try:
     from pihole6api import PiHole6Client
@@ -134,22 +191,26 @@ except ImportError:
     HAS_PIHOLE6API = False
 
 
-def get_existing_groups(client):
+def get_existing_groups(module, client):
     """
     Get existing groups from PiHole.
+
+    Uses the current_state snapshot when one is given for the instance.
+    Otherwise always asks the instance rather than the shared group cache,
+    since this module decides what to change from it. The fresh copy is
+    stored in the cache for the modules that resolve group names later on.
     
     Args:
+        module: AnsibleModule instance
         client: PiHole6Client instance
         
     Returns:
         dict: Mapping of group names to group details
     """
-    try:
-        response = client.group_management.get_groups()
-        groups = response.get('groups', [])
-        return {group['name']: group for group in groups}
-    except Exception as e:
-        return {}
+    groups = snapshot_section(module, client, 'groups')
+    if groups is None:
+        groups = fetch_groups(module, client)
+    return {group['name']: group for group in groups}
 
 
 def create_group(client, name, comment=None, enabled=True):
@@ -224,64 +285,49 @@ def batch_delete_groups(client, names):
         return {'error': to_native(e)}
 
 
-def main():
-    module_args = dict(
-        groups=dict(
-            type='list',
-            elements='dict',
-            required=True,
-            options=dict(
-                name=dict(type='str', required=True),
-                comment=dict(type='str', required=False, default=None),
-                enabled=dict(type='bool', required=False, default=True),
-                state=dict(type='str', required=True, choices=['present', 'absent']),
-            ),
-        ),
-        url=dict(type='str', required=True),
-        password=dict(type='str', required=True, no_log=True),
-    )
+def manage_groups(module, client, groups):
+    """
+    Apply the desired groups to one PiHole instance.
 
+    Args:
+        module: AnsibleModule instance
+        client: PiHole6Client instance
+        groups: List of desired group definitions
+
+    Returns:
+        dict: Result with 'changed' and 'groups'
+    """
     result = dict(
         changed=False,
         groups=[],
     )
 
-    module = AnsibleModule(
-        argument_spec=module_args,
-        supports_check_mode=True
-    )
-
-    if not HAS_PIHOLE6API:
-        module.fail_json(msg='The pihole6api module is required')
+    existing_groups = get_existing_groups(module, client)
+    diff = ItemDiff('group')
 
-    url = module.params['url']
-    password = module.params['password']
-    groups = module.params['groups']
+    def describe(data):
+        return dict(comment=data.get('comment'), enabled=data.get('enabled'))
 
-    client = None
     try:
-        client = PiHole6Client(url, password)
-        
-        existing_groups = get_existing_groups(client)
-        
         # Groups to delete (state: absent)
         groups_to_delete = [group['name'] for group in groups if group['state'] == 'absent' and group['name'] in existing_groups]
-        
+
         # Process groups
         for group in groups:
             name = group['name']
             state = group['state']
             comment = group.get('comment')
             enabled = group.get('enabled', True)
-            
+
             if state == 'present':
                 if name not in existing_groups:
                     # Create new group
                     if not module.check_mode:
                         response = create_group(client, name, comment, enabled)
                         if 'error' in response:
-                            module.fail_json(msg=f'Failed to create group {name}: {response["error"]}')
+                            raise PiholeModuleError(f'Failed to create group {name}: {response["error"]}')
                     result['changed'] = True
+                    diff.add(name, None, describe(dict(comment=comment, enabled=enabled)))
                     result['groups'].append({
                         'name': name,
                         'comment': comment,
@@ -292,19 +338,20 @@ def main():
                     # Check if update is needed
                     existing = existing_groups[name]
                     update_needed = False
-                    
+
                     if comment is not None and existing['comment'] != comment:
                         update_needed = True
-                    
+
                     if existing['enabled'] != enabled:
                         update_needed = True
-                    
+
                     if update_needed:
                         if not module.check_mode:
                             response = update_group(client, name, comment, enabled)
                             if 'error' in response:
-                                module.fail_json(msg=f'Failed to update group {name}: {response["error"]}')
+                                raise PiholeModuleError(f'Failed to update group {name}: {response["error"]}')
                         result['changed'] = True
+                        diff.add(name, describe(existing), describe(dict(comment=comment, enabled=enabled)))
                         result['groups'].append({
                             'name': name,
                             'comment': comment,
@@ -319,33 +366,72 @@ def main():
                             'enabled': existing['enabled'],
                             'state': 'unchanged'
                         })
-        
+
         # Delete groups
         if groups_to_delete:
             result['changed'] = True
             for name in groups_to_delete:
+                diff.add(name, describe(existing_groups[name]), None)
                 result['groups'].append({
                     'name': name,
                     'state': 'deleted'
                 })
-            
+
             if not module.check_mode:
                 if len(groups_to_delete) == 1:
                     response = delete_group(client, groups_to_delete[0])
                     if 'error' in response:
-                        module.fail_json(msg=f'Failed to delete group {groups_to_delete[0]}: {response["error"]}')
+                        raise PiholeModuleError(f'Failed to delete group {groups_to_delete[0]}: {response["error"]}')
                 else:
                     response = batch_delete_groups(client, groups_to_delete)
                     if 'error' in response:
-                        module.fail_json(msg=f'Failed to delete groups {", ".join(groups_to_delete)}: {response["error"]}')
-        
-        module.exit_json(**result)
-    except Exception as e:
-        module.fail_json(msg=f'Error managing groups: {to_native(e)}', **result)
+                        raise PiholeModuleError(f'Failed to delete groups {", ".join(groups_to_delete)}: {response["error"]}')
     finally:
-        if client is not None:
-            client.close_session()
+        # Resolvers in later tasks must not map names from the old group list
+        if result['changed'] and not module.check_mode:
+            invalidate_groups(module, client)
+
+    result.update(diff_result(module, diff))
+    return result
+
+
+def main():
+    module_args = dict(
+        groups=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                name=dict(type='str', required=True),
+                comment=dict(type='str', required=False, default=None),
+                enabled=dict(type='bool', required=False, default=True),
+                state=dict(type='str', required=True, choices=['present', 'absent']),
+            ),
+        ),
+        url=dict(type='str', required=False),
+        password=dict(type='str', required=False, no_log=True),
+    )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
+    module_args.update(instances_argument_spec())
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+        **INSTANCES_MODULE_KWARGS
+    )
+
+    if not HAS_PIHOLE6API:
+        module.fail_json(msg='The pihole6api module is required')
+
+    groups = module.params['groups']
+
+    run_on_instances(
+        module,
+        lambda client: manage_groups(module, client, groups),
+        'Error managing groups',
+    )
 
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
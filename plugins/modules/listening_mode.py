@@ -2,10 +2,10 @@
 # -*- coding: utf-8 -*-
 
 from ansible.module_utils.basic import AnsibleModule
-try:
-    from pihole6api import PiHole6Client
-except ImportError:
-    raise ImportError("The 'pihole6api' Python module is required. Run 'pip install pihole6api' to install it.")
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import HAS_PIHOLE6API, api_argument_spec, get_client
+from ansible_collections.sbarbett.pihole.plugins.module_utils.diff import ItemDiff, diff_result
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import config_section, current_state_argument_spec
+from ansible_collections.sbarbett.pihole.plugins.module_utils.stats import api_stats_result
 
 DOCUMENTATION = r'''
 ---
@@ -33,6 +33,9 @@ options:
             - The URL of the Pi-hole instance.
         required: true
         type: str
+extends_documentation_fragment:
+    - sbarbett.pihole.api
+    - sbarbett.pihole.current_state
 author:
     - Shane Barbetta (@sbarbett)
 '''
@@ -60,6 +63,28 @@ changed:
     description: Whether the listening mode was changed.
     type: bool
     returned: always
+diff:
+    description:
+        - The listening mode before and after, when it changes.
+        - Also returned in check mode, which reads the mode but makes no changes.
+    type: list
+    elements: dict
+    returned: when diff mode is on
+api_stats:
+    description:
+        - The API requests the module made, as described for O(api_stats).
+    type: dict
+    returned: when O(api_stats) is enabled
+    sample:
+        requests: 2
+        logins: 1
+        bytes_in: 1176
+        bytes_out: 52
+        total_seconds: 0.6504
+        p95_seconds: 0.6412
+        endpoints:
+            GET config/dns/listeningMode: {count: 1, seconds: 0.0092}
+            PATCH config: {count: 1, seconds: 0.6412}
 '''
 
 def run_module():
@@ -68,6 +93,8 @@ def run_module():
         password=dict(type='str', required=True, no_log=True),
         url=dict(type='str', required=True)
     )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
 
     result = dict(
         changed=False,
@@ -79,19 +106,19 @@ def run_module():
         supports_check_mode=True
     )
 
-    mode = module.params['mode'].upper()  # Convert to uppercase to match API response format
-    password = module.params['password']
-    url = module.params['url']
+    if not HAS_PIHOLE6API:
+        module.fail_json(msg='The pihole6api module is required')
 
-    if module.check_mode:
-        module.exit_json(**result)
+    mode = module.params['mode'].upper()  # Convert to uppercase to match API response format
 
+    client = None
     try:
-        client = PiHole6Client(url, password)
+        client = get_client(module)
 
         # Get current listening mode
-        current_config = client.config.get_config_section("dns/listeningMode")
+        current_config = config_section(module, client, "dns/listeningMode")
         current_mode = current_config.get("config", {}).get("dns", {}).get("listeningMode", "").upper()
+        diff = ItemDiff('setting')
 
         if current_mode == mode:
             # Already set, no changes needed
@@ -99,15 +126,17 @@ def run_module():
             result['result'] = {"msg": f"Listening mode already set to '{mode}'"}
         else:
             # Change listening mode
-            new_config = {"dns": {"listeningMode": mode}}
-            response = client.config.update_config(new_config)
+            if not module.check_mode:
+                new_config = {"dns": {"listeningMode": mode}}
+                result['result'] = client.config.update_config(new_config)
             result['changed'] = True
-            result['result'] = response
+            diff.add('dns.listeningMode', current_mode, mode)
 
-        module.exit_json(**result)
+        result.update(diff_result(module, diff))
+        module.exit_json(**result, **api_stats_result(module))
 
     except Exception as e:
-        module.fail_json(msg=f"Error updating listening mode: {e}", **result)
+        module.fail_json(msg=f"Error updating listening mode: {e}", **result, **api_stats_result(module))
     finally:
         if client is not None:
             client.close_session()
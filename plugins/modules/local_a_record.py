@@ -2,10 +2,11 @@
 # -*- coding: utf-8 -*-
 
 from ansible.module_utils.basic import AnsibleModule
-try:
-    from pihole6api import PiHole6Client
-except ImportError:
-    raise ImportError("The 'pihole6api' Python module is required. Run 'pip install pihole6api' to install it.")
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import HAS_PIHOLE6API, api_argument_spec, get_client
+from ansible_collections.sbarbett.pihole.plugins.module_utils.diff import ItemDiff, diff_result
+from ansible_collections.sbarbett.pihole.plugins.module_utils.records import FAMILIES, HostIndex, address_family, update_dns
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import config_list, current_state_argument_spec
+from ansible_collections.sbarbett.pihole.plugins.module_utils.stats import api_stats_result
 
 DOCUMENTATION = r'''
 ---
@@ -13,6 +14,8 @@ module: local_a_record
 short_description: Manage Pi-hole local A records via pihole v6 API.
 description:
     - This module adds or removes local A records on a Pi-hole instance using the piholev6api Python client.
+    - When the host already has an A record with another address, the entry is replaced in place with a single
+      write to C(dns.hosts), so the name keeps resolving and Pi-hole reloads once.
 options:
     host:
         description:
@@ -21,7 +24,7 @@ options:
         type: str
     ip:
         description:
-            - The IP address to associate with the hostname.
+            - The IPv4 address to associate with the hostname.
         required: true
         type: str
     state:
@@ -41,6 +44,9 @@ options:
             - The URL of the Pi-hole instance.
         required: true
         type: str
+extends_documentation_fragment:
+    - sbarbett.pihole.api
+    - sbarbett.pihole.current_state
 author:
     - Shane Barbetta (@sbarbett)
 '''
@@ -72,6 +78,28 @@ changed:
     description: Whether any change was made.
     type: bool
     returned: always
+diff:
+    description:
+        - The address of the record before and after, when it changes.
+        - Also returned in check mode, which reads the records but makes no changes.
+    type: list
+    elements: dict
+    returned: when diff mode is on
+api_stats:
+    description:
+        - The API requests the module made, as described for O(api_stats).
+    type: dict
+    returned: when O(api_stats) is enabled
+    sample:
+        requests: 2
+        logins: 1
+        bytes_in: 4318
+        bytes_out: 0
+        total_seconds: 0.6085
+        p95_seconds: 0.5931
+        endpoints:
+            GET config/dns/hosts: {count: 1, seconds: 0.0154}
+            PUT config/dns/hosts/{value}: {count: 1, seconds: 0.5931}
 '''
 
 def run_module():
@@ -82,6 +110,8 @@ def run_module():
         password=dict(type='str', required=True, no_log=True),
         url=dict(type='str', required=True)
     )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
 
     result = dict(
         changed=False,
@@ -93,58 +123,62 @@ def run_module():
         supports_check_mode=True
     )
 
+    if not HAS_PIHOLE6API:
+        module.fail_json(msg='The pihole6api module is required')
+
     host = module.params['host']
     ip = module.params['ip']
     state = module.params['state']
-    password = module.params['password']
-    url = module.params['url']
 
-    if module.check_mode:
-        module.exit_json(**result)
+    if address_family(ip) != FAMILIES['A']:
+        module.fail_json(msg=f"'{ip}' is not a valid IPv4 address for A record {host}", **result)
 
+    client = None
     try:
-        client = PiHole6Client(url, password)
-        current_config = client.config.get_config_section("dns/hosts")
-        hosts_list = current_config.get("config", {}).get("dns", {}).get("hosts", [])
-
-        existing_ip = None
-        for entry in hosts_list:
-            parts = entry.split(None, 1)  # expected format: "ip host"
-            if len(parts) == 2 and parts[1] == host:
-                # simply check if parts[0] is a valid IPv4 address (without regex)
-                if len(parts[0].split('.')) == 4:
-                    existing_ip = parts[0]
-                    break
+        client = get_client(module)
+        hosts = config_list(module, client, "dns/hosts")
+        current_config = {"config": {"dns": {"hosts": hosts}}}
+        index = HostIndex(hosts)
+
+        # Prefer the requested address when the host already has several
+        addresses = index.addresses(host, FAMILIES['A'])
+        existing_ip = ip if ip in addresses else next(iter(addresses), None)
+
+        diff = ItemDiff('record')
+        before = dict(address=existing_ip) if existing_ip is not None else None
 
         if state == 'present':
             if existing_ip is None:
                 # No record exists; add the new one.
-                add_response = client.config.add_local_a_record(host, ip)
+                if not module.check_mode:
+                    result['result'] = client.config.add_local_a_record(host, ip)
                 result['changed'] = True
-                result['result'] = add_response
+                diff.add(host, None, dict(address=ip))
             elif existing_ip != ip:
-                # A record exists but with a different IP; remove it first.
-                remove_response = client.config.remove_local_a_record(host, existing_ip)
-                add_response = client.config.add_local_a_record(host, ip)
+                # Swap the address in place with one write, so the name never stops resolving
+                if not module.check_mode:
+                    result['result'] = update_dns(client, "hosts", index.replace(host, existing_ip, ip))
                 result['changed'] = True
-                result['result'] = {'removed': remove_response, 'added': add_response}
+                diff.add(host, before, dict(address=ip))
             else:
                 result['changed'] = False
                 result['result'] = {"msg": "Record already exists with the desired IP", "current": current_config}
 
         elif state == 'absent':
             if existing_ip is not None:
-                remove_response = client.config.remove_local_a_record(host, existing_ip)
+                if not module.check_mode:
+                    result['result'] = client.config.remove_local_a_record(host, existing_ip)
                 result['changed'] = True
-                result['result'] = remove_response
+                diff.add(host, before, None)
             else:
                 result['changed'] = False
                 result['result'] = {"msg": "Record does not exist", "current": current_config}
 
-        module.exit_json(**result)
+        result.update(diff_result(module, diff))
+        module.exit_json(**result, **api_stats_result(module))
 
     except Exception as e:
-        module.fail_json(msg=f"Error managing local A record: {e}", **result)
+        module.fail_json(msg=f"Error managing local A record: {e}", **result, **api_stats_result(module))
     finally:
         if client is not None:
             client.close_session()
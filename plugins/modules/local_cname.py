@@ -2,10 +2,11 @@
 # -*- coding: utf-8 -*-
 
 from ansible.module_utils.basic import AnsibleModule
-try:
-    from pihole6api import PiHole6Client
-except ImportError:
-    raise ImportError("The 'pihole6api' Python module is required. Run 'pip install pihole6api' to install it.")
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import HAS_PIHOLE6API, api_argument_spec, get_client
+from ansible_collections.sbarbett.pihole.plugins.module_utils.diff import ItemDiff, diff_result
+from ansible_collections.sbarbett.pihole.plugins.module_utils.records import DEFAULT_CNAME_TTL, CnameIndex, cname_matches, update_dns
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import config_list, current_state_argument_spec
+from ansible_collections.sbarbett.pihole.plugins.module_utils.stats import api_stats_result
 
 DOCUMENTATION = r'''
 ---
@@ -13,6 +14,8 @@ module: local_cname
 short_description: Manage Pi-hole local CNAME records via the pihole v6 API.
 description:
     - This module adds or removes local CNAME records on a Pi-hole instance using the piholev6api Python client.
+    - When the alias already exists with another target or TTL, its entry is replaced in place with a single write to
+      C(dns.cnameRecords), so the alias keeps resolving and Pi-hole reloads once.
 options:
     host:
         description:
@@ -27,6 +30,7 @@ options:
     ttl:
         description:
             - The TTL (time-to-live) value for the record.
+            - An existing record stored without a TTL counts as having the default TTL.
         required: false
         type: int
         default: 300
@@ -47,6 +51,9 @@ options:
             - The URL of the Pi-hole instance.
         required: true
         type: str
+extends_documentation_fragment:
+    - sbarbett.pihole.api
+    - sbarbett.pihole.current_state
 author:
     - Shane Barbetta (@sbarbett)
 '''
@@ -80,17 +87,41 @@ changed:
     description: Whether any change was made.
     type: bool
     returned: always
+diff:
+    description:
+        - The target and TTL of the CNAME record before and after, when it changes.
+        - Also returned in check mode, which reads the records but makes no changes.
+    type: list
+    elements: dict
+    returned: when diff mode is on
+api_stats:
+    description:
+        - The API requests the module made, as described for O(api_stats).
+    type: dict
+    returned: when O(api_stats) is enabled
+    sample:
+        requests: 2
+        logins: 1
+        bytes_in: 1208
+        bytes_out: 0
+        total_seconds: 0.5886
+        p95_seconds: 0.5774
+        endpoints:
+            GET config/dns/cnameRecords: {count: 1, seconds: 0.0112}
+            PUT config/dns/cnameRecords/{value}: {count: 1, seconds: 0.5774}
 '''
 
 def run_module():
     module_args = dict(
         host=dict(type='str', required=True),
         target=dict(type='str', required=True),
-        ttl=dict(type='int', required=False, default=300),
+        ttl=dict(type='int', required=False, default=DEFAULT_CNAME_TTL),
         state=dict(type='str', choices=['present', 'absent'], required=True),
         password=dict(type='str', required=True, no_log=True),
         url=dict(type='str', required=True)
     )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
 
     result = dict(
         changed=False,
@@ -102,66 +133,58 @@ def run_module():
         supports_check_mode=True
     )
 
+    if not HAS_PIHOLE6API:
+        module.fail_json(msg='The pihole6api module is required')
+
     host = module.params['host']
     target = module.params['target']
     ttl = module.params['ttl']
     state = module.params['state']
-    password = module.params['password']
-    url = module.params['url']
-
-    if module.check_mode:
-        module.exit_json(**result)
 
+    client = None
     try:
-        client = PiHole6Client(url, password)
-        current_config = client.config.get_config_section("dns/cnameRecords")
-        cname_list = current_config.get("config", {}).get("dns", {}).get("cnameRecords", [])
-
-        existing_target = None
-        existing_ttl = None
-        for entry in cname_list:
-            # Each entry is expected to be "host,target,ttl"
-            parts = entry.split(',')
-            if len(parts) == 3:
-                rec_host, rec_target, rec_ttl = parts
-                try:
-                    rec_ttl = int(rec_ttl)
-                except ValueError:
-                    rec_ttl = rec_ttl
-                if rec_host == host:
-                    existing_target = rec_target
-                    existing_ttl = rec_ttl
-                    break
+        client = get_client(module)
+        cnames = config_list(module, client, "dns/cnameRecords")
+        current_config = {"config": {"dns": {"cnameRecords": cnames}}}
+        index = CnameIndex(cnames)
+
+        existing_target, existing_ttl = index.get(host) or (None, None)
+
+        diff = ItemDiff('record')
+        before = dict(target=existing_target, ttl=existing_ttl) if existing_target is not None else None
 
         if state == 'present':
             if existing_target is None:
                 # No record exists; add the new CNAME record.
-                add_response = client.config.add_local_cname(host, target, ttl=ttl)
+                if not module.check_mode:
+                    result['result'] = client.config.add_local_cname(host, target, ttl=ttl)
                 result['changed'] = True
-                result['result'] = add_response
-            elif existing_target != target or existing_ttl != ttl:
-                # Record exists but with different target or ttl; remove then re-add.
-                remove_response = client.config.remove_local_cname(host, existing_target, ttl=existing_ttl)
-                add_response = client.config.add_local_cname(host, target, ttl=ttl)
+                diff.add(host, None, dict(target=target, ttl=ttl))
+            elif not cname_matches((existing_target, existing_ttl), target, ttl):
+                # Swap the entry in place with one write, so the alias never stops resolving
+                if not module.check_mode:
+                    result['result'] = update_dns(client, "cnameRecords", index.replace(host, target, ttl))
                 result['changed'] = True
-                result['result'] = {'removed': remove_response, 'added': add_response}
+                diff.add(host, before, dict(target=target, ttl=ttl))
             else:
                 result['changed'] = False
                 result['result'] = {"msg": "CNAME record already exists with the desired target and ttl", "current": current_config}
 
         elif state == 'absent':
             if existing_target is not None:
-                remove_response = client.config.remove_local_cname(host, existing_target, ttl=existing_ttl)
+                if not module.check_mode:
+                    result['result'] = client.config.remove_local_cname(host, existing_target, ttl=existing_ttl)
                 result['changed'] = True
-                result['result'] = remove_response
+                diff.add(host, before, None)
             else:
                 result['changed'] = False
                 result['result'] = {"msg": "CNAME record does not exist", "current": current_config}
 
-        module.exit_json(**result)
+        result.update(diff_result(module, diff))
+        module.exit_json(**result, **api_stats_result(module))
 
     except Exception as e:
-        module.fail_json(msg=f"Error managing local CNAME record: {e}", **result)
+        module.fail_json(msg=f"Error managing local CNAME record: {e}", **result, **api_stats_result(module))
     finally:
         if client is not None:
             client.close_session()
@@ -0,0 +1,353 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: local_records
+short_description: Manage Pi-hole local A, AAAA and CNAME records in bulk
+description:
+  - Adds, updates or removes a batch of local DNS records on a Pi-hole instance using the pihole6api Python client.
+  - Reads C(dns.hosts) and C(dns.cnameRecords) once, computes the difference against the requested records
+    and writes all changes back in a single configuration PATCH, so Pi-hole reloads DNS once per run instead of once per record.
+  - A and AAAA records replace any other address of the same family for the same host, like M(sbarbett.pihole.local_a_record).
+    Listing several present records for one host and family keeps all of them.
+  - A CNAME record replaces the existing target and TTL of the same alias, like M(sbarbett.pihole.local_cname).
+  - Host entries and CNAME entries that are not touched by the requested records are written back unchanged.
+  - With O(purge), A and AAAA records of names and families the task does not list are removed in the same PATCH,
+    which makes O(records) the complete set of host records in the O(purge_suffix) domain.
+version_added: "1.2.0"
+options:
+  records:
+    description:
+      - List of records to manage.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      name:
+        description:
+          - The hostname (A and AAAA) or alias (CNAME) of the record.
+        type: str
+        required: true
+      type:
+        description:
+          - The record type.
+        type: str
+        required: true
+        choices: [ A, AAAA, CNAME ]
+      data:
+        description:
+          - The IP address (A and AAAA) or target host (CNAME) of the record.
+          - Required when the record is present.
+          - When an absent record has no C(data), every record of that type for the name is removed.
+        type: str
+        required: false
+      ttl:
+        description:
+          - The TTL of a CNAME record. Ignored for A and AAAA records.
+          - An existing CNAME stored without a TTL counts as having the default TTL.
+        type: int
+        required: false
+        default: 300
+      state:
+        description:
+          - Whether the record should exist or not.
+          - Defaults to the top-level O(state).
+        type: str
+        required: false
+        choices: [ present, absent ]
+  state:
+    description:
+      - Default state for records that do not set their own.
+    type: str
+    required: false
+    default: present
+    choices: [ present, absent ]
+  purge:
+    description:
+      - Remove the addresses of every name and family in C(dns.hosts) that has no present A or AAAA record in
+        O(records).
+      - Without O(purge_suffix) this applies to every host record on the instance. CNAME records are never purged.
+    type: bool
+    required: false
+    default: false
+  purge_suffix:
+    description:
+      - Domain the task owns, like V(lxc.example.com). O(purge) only removes records of this name and the names
+        under it, leaving records managed elsewhere alone.
+    type: str
+    required: false
+  url:
+    description:
+      - URL of the Pi-hole server.
+      - Required unless O(instances) is used.
+    type: str
+    required: false
+  password:
+    description:
+      - Password for the Pi-hole server.
+      - Required with O(url).
+    type: str
+    required: false
+extends_documentation_fragment:
+  - sbarbett.pihole.api
+  - sbarbett.pihole.instances
+  - sbarbett.pihole.current_state
+requirements:
+  - pihole6api
+author:
+  - Shane Barbetta (@sbarbett)
+'''
+
+EXAMPLES = r'''
+- name: Sync local records
+  sbarbett.pihole.local_records:
+    records:
+      - name: nas.example.com
+        type: A
+        data: 192.168.1.10
+      - name: nas.example.com
+        type: AAAA
+        data: 2001:db8::10
+      - name: files.example.com
+        type: CNAME
+        data: nas.example.com
+        ttl: 900
+      - name: old.example.com
+        type: A
+        state: absent
+    url: "https://pihole.example.com"
+    password: "{{ pihole_password }}"
+
+- name: Sync the same records to every Pi-hole concurrently
+  sbarbett.pihole.local_records:
+    records: "{{ pihole_records }}"
+    instances: "{{ pihole_hosts }}"
+
+- name: Make the listed records the only host records under lxc.example.com
+  sbarbett.pihole.local_records:
+    records: "{{ container_records }}"
+    purge: true
+    purge_suffix: lxc.example.com
+    instances: "{{ pihole_hosts }}"
+'''
+
+RETURN = r'''
+records:
+  description: The requested records and what happened to each of them.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    name:
+      description: The hostname or alias of the record.
+      returned: always
+      type: str
+      sample: nas.example.com
+    type:
+      description: The record type.
+      returned: always
+      type: str
+      sample: A
+    data:
+      description: The IP address or target of the record.
+      returned: always
+      type: str
+      sample: 192.168.1.10
+    state:
+      description: One of C(created), C(updated), C(deleted), C(unchanged) or C(absent_already).
+      returned: always
+      type: str
+      sample: created
+purged:
+  description: The A and AAAA records removed by O(purge).
+  returned: when O(purge) is enabled
+  type: list
+  elements: dict
+  sample:
+    - {name: ct105.lxc.example.com, type: A, data: 10.0.20.105}
+diff:
+  description:
+    - One entry per changed hostname with its addresses, or per changed alias with its target and TTL, before and after.
+  returned: when diff mode is on
+  type: list
+  elements: dict
+instances:
+  description:
+    - One entry per instance when O(instances) is used, holding C(url), C(changed), C(failed), C(msg),
+      C(elapsed) and the RV(records) and RV(purged) lists for that instance.
+  returned: when instances is used
+  type: list
+  elements: dict
+api_stats:
+  description:
+    - The API requests the module made, as described for O(api_stats).
+    - With O(instances) the requests of all instances added up.
+  type: dict
+  returned: when O(api_stats) is enabled
+  sample:
+    requests: 3
+    logins: 1
+    bytes_in: 48960
+    bytes_out: 52114
+    total_seconds: 0.7189
+    p95_seconds: 0.6752
+    endpoints:
+      GET config/dns/hosts: {count: 1, seconds: 0.0311}
+      GET config/dns/cnameRecords: {count: 1, seconds: 0.0126}
+      PATCH config: {count: 1, seconds: 0.6752}
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError, api_argument_spec
+from ansible_collections.sbarbett.pihole.plugins.module_utils.diff import ItemDiff, diff_result
+from ansible_collections.sbarbett.pihole.plugins.module_utils.fanout import (
+    INSTANCES_MODULE_KWARGS,
+    instances_argument_spec,
+    run_on_instances,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.records import (
+    DEFAULT_CNAME_TTL,
+    FAMILIES,
+    CnameIndex,
+    HostIndex,
+    diff_cnames,
+    diff_hosts,
+    normalize_records,
+    plan_cnames,
+    plan_hosts,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import config_list, current_state_argument_spec
+
+try:
+    from pihole6api import PiHole6Client
+    HAS_PIHOLE6API = True
+except ImportError:
+    HAS_PIHOLE6API = False
+
+
+def sync_records(module, client, records):
+    """
+    Apply the desired records to one Pi-hole instance.
+
+    Args:
+        module: AnsibleModule instance
+        client: PiHole6Client instance
+        records: List of validated record definitions
+
+    Returns:
+        dict: Result with 'changed' and 'records', and 'purged' with purge
+    """
+    result = dict(
+        changed=False,
+        records=[],
+    )
+
+    host_records = [record for record in records if record['type'] in FAMILIES]
+    cname_records = [record for record in records if record['type'] == 'CNAME']
+    dns_changes = {}
+    host_states = {}
+    cname_states = {}
+    diff = ItemDiff('record')
+
+    purge = module.params['purge']
+    if host_records or purge:
+        hosts = config_list(module, client, "dns/hosts")
+        # Parsed once for both the plan and the diff
+        index = HostIndex(hosts)
+        new_hosts, host_states = plan_hosts(index, host_records, purge=purge, suffix=module.params['purge_suffix'])
+        if new_hosts != hosts:
+            dns_changes['hosts'] = new_hosts
+            if module._diff:
+                diff_hosts(diff, index, new_hosts)
+
+    if cname_records:
+        cnames = config_list(module, client, "dns/cnameRecords")
+        index = CnameIndex(cnames)
+        new_cnames, cname_states = plan_cnames(index, cname_records)
+        if new_cnames != cnames:
+            dns_changes['cnameRecords'] = new_cnames
+            if module._diff:
+                diff_cnames(diff, index, new_cnames)
+
+    for record in records:
+        if record['type'] in FAMILIES:
+            state = host_states[(record['name'], FAMILIES[record['type']], record['data'])]
+        else:
+            state = cname_states[(record['name'], record['data'])]
+        result['records'].append({
+            'name': record['name'],
+            'type': record['type'],
+            'data': record['data'],
+            'state': state,
+        })
+
+    if purge:
+        requested = set((record['name'], FAMILIES[record['type']], record['data']) for record in host_records)
+        types = dict((family, record_type) for record_type, family in FAMILIES.items())
+        result['purged'] = [dict(name=name, type=types[family], data=ip)
+                            for (name, family, ip), state in sorted(host_states.items())
+                            if (name, family, ip) not in requested and state == 'deleted']
+
+    if dns_changes:
+        result['changed'] = True
+        if not module.check_mode:
+            # One PATCH for every section touched means one DNS reload
+            response = client.config.update_config({"dns": dns_changes})
+            if isinstance(response, dict) and 'error' in response:
+                raise PiholeModuleError(f"Failed to update local records: {response['error']}")
+
+    result.update(diff_result(module, diff))
+    return result
+
+
+def main():
+    module_args = dict(
+        records=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                name=dict(type='str', required=True),
+                type=dict(type='str', required=True, choices=['A', 'AAAA', 'CNAME']),
+                data=dict(type='str', required=False, default=None),
+                ttl=dict(type='int', required=False, default=DEFAULT_CNAME_TTL),
+                state=dict(type='str', required=False, choices=['present', 'absent']),
+            ),
+        ),
+        state=dict(type='str', required=False, default='present', choices=['present', 'absent']),
+        purge=dict(type='bool', required=False, default=False),
+        purge_suffix=dict(type='str', required=False),
+        url=dict(type='str', required=False),
+        password=dict(type='str', required=False, no_log=True),
+    )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
+    module_args.update(instances_argument_spec())
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+        **INSTANCES_MODULE_KWARGS
+    )
+
+    if not HAS_PIHOLE6API:
+        module.fail_json(msg='The pihole6api module is required')
+
+    try:
+        records = normalize_records(module.params['records'], module.params['state'])
+    except PiholeModuleError as e:
+        module.fail_json(msg=str(e))
+
+    run_on_instances(
+        module,
+        lambda client: sync_records(module, client, records),
+        'Error managing local records',
+    )
+
+
+if __name__ == '__main__':
+    main()
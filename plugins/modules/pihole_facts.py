@@ -0,0 +1,195 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: pihole_facts
+short_description: Collect a snapshot of Pi-hole state via Pi-hole v6 API.
+description:
+    - This module reads selected sections of a Pi-hole v6 instance concurrently and returns them as one snapshot.
+    - The snapshot can be passed to the O(current_state) option of other modules in this collection, which then skip
+      their own reads. A play that manages the whole configuration reads each instance once.
+    - Each section costs one GET. The C(dns) section holds local A/AAAA hosts, CNAME records and the listening mode.
+version_added: "1.2.0"
+options:
+    sections:
+        description:
+            - The sections to collect. V(all) collects every section.
+        required: false
+        type: list
+        elements: str
+        choices: ['all', 'groups', 'clients', 'lists', 'domains', 'dns', 'dhcp', 'leases', 'devices']
+        default: ['all']
+    url:
+        description:
+            - The URL of the Pi-hole instance.
+            - Required unless O(instances) is used.
+        required: false
+        type: str
+    password:
+        description:
+            - The API password for the Pi-hole instance.
+            - Required with O(url).
+        required: false
+        type: str
+extends_documentation_fragment:
+    - sbarbett.pihole.api
+    - sbarbett.pihole.instances
+author:
+    - Shane Barbetta (@sbarbett)
+'''
+
+EXAMPLES = r'''
+- name: Collect the state of a Pi-hole
+  sbarbett.pihole.pihole_facts:
+    url: "https://your-pihole.example.com"
+    password: "{{ pihole_password }}"
+  register: pihole_state
+
+- name: Manage groups without reading them again
+  sbarbett.pihole.groups:
+    groups: "{{ pihole_groups }}"
+    url: "https://your-pihole.example.com"
+    password: "{{ pihole_password }}"
+    current_state: "{{ pihole_state }}"
+
+- name: Collect lists and groups from every Pi-hole at once
+  sbarbett.pihole.pihole_facts:
+    sections: [groups, lists]
+    instances: "{{ pihole_hosts }}"
+  register: pihole_state
+
+- name: Manage block lists on every Pi-hole from the snapshots
+  sbarbett.pihole.block_list:
+    lists: "{{ block_lists }}"
+    instances: "{{ pihole_hosts }}"
+    current_state: "{{ pihole_state }}"
+'''
+
+RETURN = r'''
+state:
+    description: The snapshot of the instance.
+    type: dict
+    returned: when url is used
+    contains:
+        url:
+            description: The URL of the instance.
+            type: str
+        collected:
+            description: Epoch time at which collection started.
+            type: float
+        groups:
+            description: Groups as returned by C(GET /api/groups).
+            type: list
+            returned: when collected
+        clients:
+            description: Clients as returned by C(GET /api/clients).
+            type: list
+            returned: when collected
+        lists:
+            description: Allow and block lists as returned by C(GET /api/lists).
+            type: list
+            returned: when collected
+        domains:
+            description: Domains as returned by C(GET /api/domains).
+            type: list
+            returned: when collected
+        dns:
+            description: The C(dns) configuration section, including C(hosts), C(cnameRecords) and C(listeningMode).
+            type: dict
+            returned: when collected
+        dhcp:
+            description: The C(dhcp) configuration section.
+            type: dict
+            returned: when collected
+        leases:
+            description: Current DHCP leases.
+            type: list
+            returned: when collected
+        devices:
+            description: Devices of the network table as returned by C(GET /api/network/devices).
+            type: list
+            returned: when collected
+instances:
+    description:
+        - One entry per instance when O(instances) is used, holding C(url), C(changed), C(failed), C(msg),
+          C(elapsed) and the RV(state) of that instance.
+    type: list
+    elements: dict
+    returned: when instances is used
+api_stats:
+    description:
+        - The API requests the module made, as described for O(api_stats).
+        - With O(instances) the requests of all instances added up.
+    type: dict
+    returned: when O(api_stats) is enabled
+    sample:
+        requests: 8
+        logins: 1
+        bytes_in: 412876
+        bytes_out: 0
+        total_seconds: 0.3107
+        p95_seconds: 0.0912
+        endpoints:
+            GET groups: {count: 1, seconds: 0.0121}
+            GET clients: {count: 1, seconds: 0.0134}
+            GET lists: {count: 1, seconds: 0.0387}
+            GET domains: {count: 1, seconds: 0.0912}
+            GET config/dns: {count: 1, seconds: 0.0288}
+            GET config/dhcp: {count: 1, seconds: 0.0141}
+            GET dhcp/leases: {count: 1, seconds: 0.0457}
+            GET network/devices: {count: 1, seconds: 0.0667}
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import api_argument_spec
+from ansible_collections.sbarbett.pihole.plugins.module_utils.fanout import (
+    INSTANCES_MODULE_KWARGS,
+    instances_argument_spec,
+    run_on_instances,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import SECTIONS, take_snapshot
+
+try:
+    from pihole6api import PiHole6Client
+    HAS_PIHOLE6API = True
+except ImportError:
+    HAS_PIHOLE6API = False
+
+
+def main():
+    module_args = dict(
+        sections=dict(type='list', elements='str', required=False, default=['all'], choices=['all'] + SECTIONS),
+        url=dict(type='str', required=False),
+        password=dict(type='str', required=False, no_log=True),
+    )
+    module_args.update(api_argument_spec())
+    module_args.update(instances_argument_spec())
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+        **INSTANCES_MODULE_KWARGS
+    )
+
+    if not HAS_PIHOLE6API:
+        module.fail_json(msg='The pihole6api module is required')
+
+    requested = module.params['sections']
+    sections = SECTIONS if 'all' in requested else [section for section in SECTIONS if section in requested]
+
+    run_on_instances(
+        module,
+        lambda client: dict(
+            changed=False,
+            state=take_snapshot(client, sections),
+        ),
+        'Error collecting Pi-hole state',
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,778 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: pihole_state
+short_description: Reconcile the whole desired state of a Pi-hole instance in one task
+description:
+  - Takes the desired groups, clients, allow and block lists, local DNS records, DHCP options and listening mode of a
+    Pi-hole v6 instance, compares them against one read of the instance and applies the difference.
+  - Only the sections needed for the given options are read, concurrently and once each, or taken from O(current_state).
+  - The changes are applied in dependency order. New groups are created first so that clients and lists can reference
+    them, then clients and lists are converged, then all configuration changes (local records, DHCP options and listening
+    mode) are sent in a single configuration PATCH, and finally groups marked absent are removed.
+  - Items created with the same settings share one POST, absent items of a kind are removed with one batch delete, and
+    only items whose settings differ are updated.
+  - Sections that are not given are left untouched. Items that exist on the instance but are not listed are kept.
+  - In check mode the plan is computed and returned without being applied.
+version_added: "1.2.0"
+options:
+  groups:
+    description:
+      - Desired groups. Same fields as the O(sbarbett.pihole.groups#module:groups) option of M(sbarbett.pihole.groups).
+    type: list
+    elements: dict
+    required: false
+    suboptions:
+      name:
+        description: The name of the group.
+        type: str
+        required: true
+      comment:
+        description: A comment describing the group.
+        type: str
+      enabled:
+        description: Whether the group is enabled.
+        type: bool
+        default: true
+      state:
+        description: Whether the group should exist.
+        type: str
+        choices: [ present, absent ]
+        default: present
+  clients:
+    description:
+      - Desired clients. Same fields as the O(sbarbett.pihole.clients#module:clients) option of M(sbarbett.pihole.clients).
+    type: list
+    elements: dict
+    required: false
+    suboptions:
+      name:
+        description: The client IP address, CIDR range, MAC address or hostname.
+        type: str
+        required: true
+      comment:
+        description: A comment describing the client.
+        type: str
+      groups:
+        description:
+          - Names or IDs of the groups the client belongs to. IDs must be integers; strings are always group names.
+          - When empty, an existing client keeps its current groups.
+        type: list
+        elements: raw
+        default: []
+      state:
+        description: Whether the client should exist.
+        type: str
+        choices: [ present, absent ]
+        default: present
+  lists:
+    description:
+      - Desired allow and block lists.
+    type: list
+    elements: dict
+    required: false
+    suboptions:
+      address:
+        description: The URL of the list.
+        type: str
+        required: true
+      type:
+        description: The list type.
+        type: str
+        required: true
+        choices: [ allow, block ]
+      comment:
+        description: A comment describing the list.
+        type: str
+      groups:
+        description: Names or IDs of the groups the list is assigned to. IDs must be integers; strings are always group names.
+        type: list
+        elements: raw
+        default: []
+      enabled:
+        description: Whether the list is enabled.
+        type: bool
+        default: true
+      state:
+        description: Whether the list should exist.
+        type: str
+        choices: [ present, absent ]
+        default: present
+  records:
+    description:
+      - Desired local A, AAAA and CNAME records. Same fields and semantics as the O(sbarbett.pihole.local_records#module:records)
+        option of M(sbarbett.pihole.local_records).
+    type: list
+    elements: dict
+    required: false
+    suboptions:
+      name:
+        description: The hostname (A and AAAA) or alias (CNAME) of the record.
+        type: str
+        required: true
+      type:
+        description: The record type.
+        type: str
+        required: true
+        choices: [ A, AAAA, CNAME ]
+      data:
+        description: The IP address (A and AAAA) or target host (CNAME). Required when the record is present.
+        type: str
+      ttl:
+        description: The TTL of a CNAME record.
+        type: int
+        default: 300
+      state:
+        description: Whether the record should exist.
+        type: str
+        choices: [ present, absent ]
+        default: present
+  dhcp:
+    description:
+      - Desired DHCP server options. Same fields as the options of M(sbarbett.pihole.dhcp_config).
+      - Static reservations in C(dhcp.hosts) are left untouched.
+    type: dict
+    required: false
+    suboptions:
+      state:
+        description: V(present) enables and configures DHCP, V(absent) disables it.
+        type: str
+        required: true
+        choices: [ present, absent ]
+      start:
+        description: The start address of the DHCP range. Required when O(dhcp.state=present).
+        type: str
+      end:
+        description: The end address of the DHCP range. Required when O(dhcp.state=present).
+        type: str
+      router:
+        description: The default gateway handed out to clients. Required when O(dhcp.state=present).
+        type: str
+      netmask:
+        description: Optional subnet mask.
+        type: str
+        default: ''
+      lease_time:
+        description: DHCP lease time, for example C(24h).
+        type: str
+        default: ''
+      ipv6:
+        description: Whether DHCPv6 and RA are active.
+        type: bool
+        default: false
+      rapid_commit:
+        description: Whether DHCPv4 rapid commit is enabled.
+        type: bool
+        default: false
+      multi_dns:
+        description: Whether Pi-hole DNS is advertised multiple times.
+        type: bool
+        default: false
+      ignore_unknown_clients:
+        description: Whether only clients with a static reservation get an address.
+        type: bool
+        default: false
+  listening_mode:
+    description:
+      - Desired DNS listening mode.
+    type: str
+    required: false
+    choices: [ local, single, bind, all ]
+  url:
+    description:
+      - URL of the Pi-hole server.
+      - Required unless O(instances) is used.
+    type: str
+    required: false
+  password:
+    description:
+      - Password for the Pi-hole server.
+      - Required with O(url).
+    type: str
+    required: false
+extends_documentation_fragment:
+  - sbarbett.pihole.api
+  - sbarbett.pihole.instances
+  - sbarbett.pihole.current_state
+requirements:
+  - pihole6api
+author:
+  - Shane Barbetta (@sbarbett)
+'''
+
+EXAMPLES = r'''
+- name: Converge a Pi-hole to its complete desired state
+  sbarbett.pihole.pihole_state:
+    url: "https://pihole.example.com"
+    password: "{{ pihole_password }}"
+    groups:
+      - name: IOT
+        comment: "Internet of Things devices"
+      - name: OldGroup
+        state: absent
+    clients:
+      - name: 192.168.2.0/24
+        comment: "IOT network"
+        groups: [IOT]
+    lists:
+      - address: "https://raw.githubusercontent.com/StevenBlack/hosts/master/hosts"
+        type: block
+        comment: "StevenBlack hosts file"
+        groups: [Default, IOT]
+    records:
+      - name: nas.example.com
+        type: A
+        data: 192.168.1.10
+      - name: files.example.com
+        type: CNAME
+        data: nas.example.com
+    dhcp:
+      state: absent
+    listening_mode: local
+  register: pihole_result
+
+- name: Show how many API calls the run needed
+  ansible.builtin.debug:
+    msg: "{{ pihole_result.api_calls }} API calls, {{ pihole_result.plan | length }} write steps"
+
+- name: Converge every Pi-hole concurrently
+  sbarbett.pihole.pihole_state:
+    instances: "{{ pihole_hosts }}"
+    groups: "{{ pihole_groups }}"
+    clients: "{{ pihole_clients }}"
+    lists: "{{ pihole_lists }}"
+    records: "{{ pihole_records }}"
+'''
+
+RETURN = r'''
+plan:
+  description:
+    - The write steps in the order they were (or, in check mode, would be) applied.
+    - Every step is one API call.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    section:
+      description: One of C(groups), C(clients), C(lists) or C(config).
+      type: str
+      sample: groups
+    action:
+      description: One of C(create), C(update), C(delete) or C(patch).
+      type: str
+      sample: create
+    method:
+      description: The HTTP method of the call.
+      type: str
+      sample: POST
+    endpoint:
+      description: The API endpoint of the call, relative to C(/api/).
+      type: str
+      sample: groups
+    items:
+      description: The names, addresses or configuration keys the call covers.
+      type: list
+      elements: str
+      sample: [IOT, Guests]
+api_calls:
+  description: Number of API requests made for this instance, reads included and logins excluded.
+  returned: always
+  type: int
+  sample: 7
+gravity_needed:
+  description: Whether a list was added or removed or its enabled state changed, so gravity has to run for the change to take effect.
+  returned: always
+  type: bool
+records:
+  description: The requested records and what happened to each of them, as returned by M(sbarbett.pihole.local_records).
+  returned: when records is used
+  type: list
+  elements: dict
+instances:
+  description:
+    - One entry per instance when O(instances) is used, holding C(url), C(changed), C(failed), C(msg),
+      C(elapsed), RV(plan), RV(api_calls) and RV(gravity_needed) for that instance.
+  returned: when instances is used
+  type: list
+  elements: dict
+api_stats:
+  description:
+    - The API requests the module made, as described for O(api_stats).
+    - With O(instances) the requests of all instances added up.
+  type: dict
+  returned: when O(api_stats) is enabled
+  sample:
+    requests: 7
+    logins: 1
+    bytes_in: 96342
+    bytes_out: 1893
+    total_seconds: 0.9671
+    p95_seconds: 0.6819
+    endpoints:
+      GET groups: {count: 1, seconds: 0.0119}
+      GET clients: {count: 1, seconds: 0.0128}
+      GET lists: {count: 1, seconds: 0.0371}
+      GET config/dns: {count: 1, seconds: 0.0297}
+      GET config/dhcp: {count: 1, seconds: 0.0138}
+      POST lists: {count: 1, seconds: 0.1799}
+      PATCH config: {count: 1, seconds: 0.6819}
+'''
+
+import urllib.parse
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError, api_argument_spec
+from ansible_collections.sbarbett.pihole.plugins.module_utils.fanout import (
+    INSTANCES_MODULE_KWARGS,
+    instances_argument_spec,
+    run_on_instances,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.group_resolver import invalidate_groups
+from ansible_collections.sbarbett.pihole.plugins.module_utils.records import FAMILIES, normalize_records, plan_cnames, plan_hosts
+from ansible_collections.sbarbett.pihole.plugins.module_utils.snapshot import collect_sections, current_state_argument_spec
+
+try:
+    from pihole6api import PiHole6Client
+    HAS_PIHOLE6API = True
+except ImportError:
+    HAS_PIHOLE6API = False
+
+# dhcp option -> key in the dhcp configuration section
+DHCP_KEYS = {
+    'start': 'start',
+    'end': 'end',
+    'router': 'router',
+    'netmask': 'netmask',
+    'lease_time': 'leaseTime',
+    'ipv6': 'ipv6',
+    'rapid_commit': 'rapidCommit',
+    'multi_dns': 'multiDNS',
+    'ignore_unknown_clients': 'ignoreUnknownClients',
+}
+
+
+def quote(value):
+    return urllib.parse.quote(value, safe='')
+
+
+class Plan:
+    """
+    Ordered write steps for one instance.
+
+    Each step pairs what is reported to the user with the call that
+    performs it, so the same plan serves check mode and execution.
+    """
+
+    def __init__(self):
+        self.steps = []
+
+    def add(self, section, action, method, endpoint, items, call):
+        self.steps.append((dict(section=section, action=action, method=method, endpoint=endpoint, items=list(items)), call))
+
+    def report(self):
+        return [step for step, call in self.steps]
+
+    def execute(self):
+        for step, call in self.steps:
+            response = call()
+            if isinstance(response, dict) and 'error' in response:
+                raise PiholeModuleError(
+                    f"{step['method']} {step['endpoint']} failed for {', '.join(step['items'])}: {response['error']}"
+                )
+        self.steps = []
+
+
+def by_settings(items, key):
+    """Group items sharing the same settings so they can be created with one POST."""
+    batches = {}
+    for item in items:
+        batches.setdefault(key(item), []).append(item)
+    return batches
+
+
+class GroupIds:
+    """
+    Group name -> id lookups for the plan, including groups it creates.
+
+    Groups created by the plan get their id from the POST response. In check
+    mode they get a placeholder, which never equals an existing id, so
+    clients and lists referencing them are reported as changing.
+    """
+
+    def __init__(self, module, groups):
+        self.module = module
+        self.ids = {}
+        self.update(groups)
+
+    def update(self, groups):
+        for group in groups:
+            self.ids[group['name'].lower()] = group['id']
+
+    def planned(self, names):
+        for name in names:
+            self.ids.setdefault(name.lower(), f'new:{name}')
+
+    def resolve(self, items):
+        # As in GroupResolver, only ints are raw ids; strings are names, so a group called "2" is not id 2
+        group_ids = []
+        missing = []
+        for item in items:
+            if isinstance(item, int):
+                group_ids.append(item)
+            elif str(item).lower() in self.ids:
+                group_ids.append(self.ids[str(item).lower()])
+            else:
+                missing.append(str(item))
+        if missing:
+            self.module.warn(f"The following groups were not found and will be ignored: {', '.join(missing)}")
+        return group_ids
+
+
+def plan_groups(module, client, plan, desired, existing, group_ids):
+    """Plan group creates and updates. Deletes are planned last by plan_group_deletes."""
+    creates = []
+    for group in desired:
+        if group['state'] != 'present':
+            continue
+        current = existing.get(group['name'])
+        if current is None:
+            creates.append(group)
+        elif (group['comment'] is not None and current.get('comment') != group['comment']) \
+                or current.get('enabled') != group['enabled']:
+            comment = group['comment'] if group['comment'] is not None else current.get('comment')
+            plan.add('groups', 'update', 'PUT', f"groups/{quote(group['name'])}", [group['name']],
+                     lambda group=group, comment=comment: client.group_management.update_group(
+                         group['name'], comment=comment, enabled=group['enabled']))
+
+    for (comment, enabled), batch in by_settings(creates, lambda g: (g['comment'], g['enabled'])).items():
+        names = [group['name'] for group in batch]
+        group_ids.planned(names)
+
+        def create(names=names, comment=comment, enabled=enabled):
+            response = client.group_management.add_group(names, comment=comment, enabled=enabled)
+            if isinstance(response, dict):
+                group_ids.update(response.get('groups', []))
+            return response
+        plan.add('groups', 'create', 'POST', 'groups', names, create)
+
+
+def plan_group_deletes(client, plan, desired, existing):
+    names = [group['name'] for group in desired if group['state'] == 'absent' and group['name'] in existing]
+    if names:
+        plan.add('groups', 'delete', 'POST', 'groups:batchDelete', names,
+                 lambda: client.group_management.batch_delete_groups(names))
+
+
+def plan_clients(client, plan, desired, existing, group_ids):
+    creates = []
+    deletes = []
+    for item in desired:
+        name = item['name']
+        current = existing.get(name)
+        if item['state'] == 'absent':
+            if current is not None:
+                deletes.append(name)
+            continue
+        ids = group_ids.resolve(item['groups'])
+        if current is None:
+            creates.append(dict(item, group_ids=ids))
+        elif (item['comment'] is not None and current.get('comment') != item['comment']) \
+                or (ids and set(current.get('groups', [])) != set(ids)):
+            comment = item['comment'] if item['comment'] is not None else current.get('comment')
+            # Without groups in the task the client keeps the memberships it has, as lists do
+            ids = ids or current.get('groups', [])
+            plan.add('clients', 'update', 'PUT', f'clients/{quote(name)}', [name],
+                     lambda name=name, comment=comment, ids=ids: client.client_management.update_client(
+                         name, comment=comment, groups=ids))
+
+    for (comment, ids), batch in by_settings(creates, lambda c: (c['comment'], tuple(c['group_ids']))).items():
+        names = [item['name'] for item in batch]
+        plan.add('clients', 'create', 'POST', 'clients', names,
+                 lambda names=names, comment=comment, ids=ids: client.client_management.add_client(
+                     names, comment=comment, groups=list(ids)))
+
+    if deletes:
+        plan.add('clients', 'delete', 'POST', 'clients:batchDelete', deletes,
+                 lambda: client.client_management.batch_delete_clients([{'item': name} for name in deletes]))
+
+
+def plan_lists(client, plan, desired, existing, group_ids):
+    """
+    Plan list changes.
+
+    Returns:
+        bool: Whether the changes need a gravity run
+    """
+    creates = []
+    deletes = []
+    gravity_needed = False
+    for item in desired:
+        key = (item['address'], item['type'])
+        current = existing.get(key)
+        if item['state'] == 'absent':
+            if current is not None:
+                deletes.append(key)
+                gravity_needed = True
+            continue
+        ids = group_ids.resolve(item['groups'])
+        if current is None:
+            creates.append(dict(item, group_ids=ids))
+            gravity_needed = True
+        elif (item['comment'] is not None and current.get('comment') != item['comment']) \
+                or (ids and set(current.get('groups', [])) != set(ids)) \
+                or current.get('enabled') != item['enabled']:
+            if current.get('enabled') != item['enabled']:
+                gravity_needed = True
+            comment = item['comment'] if item['comment'] is not None else current.get('comment')
+            ids = ids or current.get('groups', [])
+            plan.add('lists', 'update', 'PUT', f"lists/{quote(item['address'])}?type={item['type']}", [item['address']],
+                     lambda item=item, comment=comment, ids=ids: client.list_management.update_list(
+                         item['address'], list_type=item['type'], comment=comment, groups=ids, enabled=item['enabled']))
+
+    settings = lambda l: (l['type'], l['comment'], tuple(l['group_ids']), l['enabled'])
+    for (list_type, comment, ids, enabled), batch in by_settings(creates, settings).items():
+        addresses = [item['address'] for item in batch]
+        plan.add('lists', 'create', 'POST', f'lists?type={list_type}', addresses,
+                 lambda addresses=addresses, list_type=list_type, comment=comment, ids=ids, enabled=enabled:
+                     client.list_management.add_list(addresses, list_type=list_type, comment=comment,
+                                                     groups=list(ids), enabled=enabled))
+
+    if deletes:
+        # One batch covers both list types
+        plan.add('lists', 'delete', 'POST', 'lists:batchDelete', [address for address, list_type in deletes],
+                 lambda: client.list_management.batch_delete_lists(
+                     [{'item': address, 'type': list_type} for address, list_type in deletes]))
+
+    return gravity_needed
+
+
+def plan_dhcp(module, desired, current):
+    """Return the dhcp keys that have to change."""
+    if desired['state'] == 'absent':
+        return {'active': False} if current.get('active') else {}
+
+    missing = [option for option in ('start', 'end', 'router') if not desired[option]]
+    if missing:
+        raise PiholeModuleError(f"Missing required DHCP options for state 'present': {missing}")
+
+    wanted = {'active': True}
+    wanted.update((key, desired[option]) for option, key in DHCP_KEYS.items())
+    return {key: value for key, value in wanted.items() if current.get(key) != value}
+
+
+def plan_config(module, desired, state, result):
+    """
+    Collect every configuration change, so they go out in one PATCH and FTL reloads once.
+
+    Returns:
+        dict: The changed keys per configuration section
+    """
+    config = {}
+    if 'dns' in state:
+        dns = state['dns']
+        dns_changes = {}
+        records = desired['records']
+        if records:
+            host_records = [record for record in records if record['type'] in FAMILIES]
+            cname_records = [record for record in records if record['type'] == 'CNAME']
+            host_states, cname_states = {}, {}
+            if host_records:
+                new_hosts, host_states = plan_hosts(dns.get('hosts', []), host_records)
+                if new_hosts != dns.get('hosts', []):
+                    dns_changes['hosts'] = new_hosts
+            if cname_records:
+                new_cnames, cname_states = plan_cnames(dns.get('cnameRecords', []), cname_records)
+                if new_cnames != dns.get('cnameRecords', []):
+                    dns_changes['cnameRecords'] = new_cnames
+            result['records'] = [
+                dict(name=record['name'], type=record['type'], data=record['data'],
+                     state=host_states[(record['name'], FAMILIES[record['type']], record['data'])]
+                     if record['type'] in FAMILIES else cname_states[(record['name'], record['data'])])
+                for record in records
+            ]
+        mode = desired['listening_mode']
+        if mode and str(dns.get('listeningMode', '')).upper() != mode.upper():
+            dns_changes['listeningMode'] = mode.upper()
+        if dns_changes:
+            config['dns'] = dns_changes
+    if 'dhcp' in state:
+        dhcp_changes = plan_dhcp(module, desired['dhcp'], state['dhcp'])
+        if dhcp_changes:
+            config['dhcp'] = dhcp_changes
+    return config
+
+
+def reconcile(module, client, desired):
+    """
+    Converge one Pi-hole instance to the desired state.
+
+    Returns:
+        dict: Result with 'changed', 'plan', 'api_calls' and 'gravity_needed'
+    """
+    connection = client.connection
+    calls_before = getattr(connection, 'calls', 0)
+
+    sections = set()
+    if desired['groups'] or desired['clients'] or desired['lists']:
+        sections.add('groups')
+    if desired['clients']:
+        sections.add('clients')
+    if desired['lists']:
+        sections.add('lists')
+    if desired['records'] or desired['listening_mode']:
+        sections.add('dns')
+    if desired['dhcp']:
+        sections.add('dhcp')
+    state = collect_sections(module, client, sorted(sections))
+
+    result = dict(changed=False, plan=[], api_calls=0, gravity_needed=False)
+    existing_groups = {group['name']: group for group in state.get('groups', [])}
+    group_ids = GroupIds(module, state.get('groups', []))
+
+    # Planned up front so invalid input fails before anything is written
+    config = plan_config(module, desired, state, result)
+
+    # Groups go first, so clients and lists can reference new groups by id.
+    # The ids of new groups are only known once the creates have run.
+    groups_plan = Plan()
+    plan_groups(module, client, groups_plan, desired['groups'], existing_groups, group_ids)
+    result['plan'].extend(groups_plan.report())
+
+    group_changes = bool(groups_plan.steps)
+    try:
+        if not module.check_mode:
+            groups_plan.execute()
+
+        plan = Plan()
+        plan_clients(client, plan, desired['clients'],
+                     {item['client']: item for item in state.get('clients', [])}, group_ids)
+        result['gravity_needed'] = plan_lists(
+            client, plan, desired['lists'],
+            {(item['address'], item['type']): item for item in state.get('lists', [])}, group_ids)
+        if config:
+            items = [f'{section}.{key}' for section, changes in config.items() for key in changes]
+            plan.add('config', 'patch', 'PATCH', 'config', items, lambda: client.config.update_config(config))
+        # Groups are removed last, once no client or list references them
+        plan_group_deletes(client, plan, desired['groups'], existing_groups)
+        result['plan'].extend(plan.report())
+
+        group_changes = group_changes or any(step['section'] == 'groups' for step in plan.report())
+        if not module.check_mode:
+            plan.execute()
+    finally:
+        if group_changes and not module.check_mode:
+            invalidate_groups(module, client)
+
+    result['changed'] = bool(result['plan'])
+    result['api_calls'] = getattr(connection, 'calls', 0) - calls_before
+    return result
+
+
+def main():
+    state_choice = dict(type='str', required=False, default='present', choices=['present', 'absent'])
+    module_args = dict(
+        groups=dict(
+            type='list',
+            elements='dict',
+            required=False,
+            default=[],
+            options=dict(
+                name=dict(type='str', required=True),
+                comment=dict(type='str', required=False, default=None),
+                enabled=dict(type='bool', required=False, default=True),
+                state=state_choice,
+            ),
+        ),
+        clients=dict(
+            type='list',
+            elements='dict',
+            required=False,
+            default=[],
+            options=dict(
+                name=dict(type='str', required=True),
+                comment=dict(type='str', required=False, default=None),
+                groups=dict(type='list', elements='raw', required=False, default=[]),
+                state=state_choice,
+            ),
+        ),
+        lists=dict(
+            type='list',
+            elements='dict',
+            required=False,
+            default=[],
+            options=dict(
+                address=dict(type='str', required=True),
+                type=dict(type='str', required=True, choices=['allow', 'block']),
+                comment=dict(type='str', required=False, default=None),
+                groups=dict(type='list', elements='raw', required=False, default=[]),
+                enabled=dict(type='bool', required=False, default=True),
+                state=state_choice,
+            ),
+        ),
+        records=dict(
+            type='list',
+            elements='dict',
+            required=False,
+            default=[],
+            options=dict(
+                name=dict(type='str', required=True),
+                type=dict(type='str', required=True, choices=['A', 'AAAA', 'CNAME']),
+                data=dict(type='str', required=False, default=None),
+                ttl=dict(type='int', required=False, default=300),
+                state=state_choice,
+            ),
+        ),
+        dhcp=dict(
+            type='dict',
+            required=False,
+            default=None,
+            options=dict(
+                state=dict(type='str', required=True, choices=['present', 'absent']),
+                start=dict(type='str', required=False),
+                end=dict(type='str', required=False),
+                router=dict(type='str', required=False),
+                netmask=dict(type='str', required=False, default=''),
+                lease_time=dict(type='str', required=False, default=''),
+                ipv6=dict(type='bool', required=False, default=False),
+                rapid_commit=dict(type='bool', required=False, default=False),
+                multi_dns=dict(type='bool', required=False, default=False),
+                ignore_unknown_clients=dict(type='bool', required=False, default=False),
+            ),
+        ),
+        listening_mode=dict(type='str', required=False, choices=['local', 'single', 'bind', 'all']),
+        url=dict(type='str', required=False),
+        password=dict(type='str', required=False, no_log=True),
+    )
+    module_args.update(api_argument_spec())
+    module_args.update(current_state_argument_spec())
+    module_args.update(instances_argument_spec())
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+        **INSTANCES_MODULE_KWARGS
+    )
+
+    if not HAS_PIHOLE6API:
+        module.fail_json(msg='The pihole6api module is required')
+
+    desired = {key: module.params[key] for key in ('groups', 'clients', 'lists', 'dhcp', 'listening_mode')}
+    try:
+        desired['records'] = normalize_records(module.params['records'], 'present')
+    except PiholeModuleError as e:
+        module.fail_json(msg=str(e))
+
+    run_on_instances(
+        module,
+        lambda client: reconcile(module, client, desired),
+        'Error reconciling Pi-hole state',
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: teleporter
+short_description: Export and import Pi-hole configuration archives via Pi-hole v6 API.
+description:
+    - This module exports the teleporter archive of a Pi-hole v6 instance, or imports an archive into one or more instances.
+    - An import replaces the selected parts of the target configuration in one request, which provisions a new instance much
+      faster than creating its groups, lists, clients and records one by one.
+    - With O(source) the archive is exported from a golden instance and imported into the targets in the same task.
+    - Every archive is identified by a checksum over the archive members the selected O(sections) import. Before
+      importing, each target is exported and the import is skipped when the checksum of its own archive matches, so a
+      rebuilt or drifted target is provisioned again. Use O(force) to import without comparing.
+version_added: "1.2.0"
+options:
+    mode:
+        description:
+            - V(export) downloads the archive of the instance given by O(url) to O(path).
+            - V(import) uploads the archive from O(path) or O(source) to O(url) or every entry of O(instances).
+        required: true
+        type: str
+        choices: ['export', 'import']
+    path:
+        description:
+            - With O(mode=export), the file the archive is written to. The file is only rewritten when the checksum of its
+              content changed.
+            - With O(mode=import), the archive to import. Required unless O(source) is given.
+        required: false
+        type: path
+    source:
+        description:
+            - The golden instance to export the archive from with O(mode=import).
+            - When O(path) is also given, the exported archive is saved there.
+        required: false
+        type: dict
+        suboptions:
+            url:
+                description: The URL of the golden instance.
+                type: str
+                required: true
+                aliases: ['name']
+            password:
+                description: The API password of the golden instance.
+                type: str
+                required: true
+    sections:
+        description:
+            - The parts of the archive to import. V(all) imports everything.
+            - V(config) is C(pihole.toml), including local DNS records and DHCP settings. V(groups), V(lists),
+              V(domains) and V(clients) are the corresponding gravity database tables; lists, domains and clients
+              include their group assignments.
+        required: false
+        type: list
+        elements: str
+        choices: ['all', 'config', 'dhcp_leases', 'groups', 'lists', 'domains', 'clients']
+        default: ['all']
+    force:
+        description:
+            - Import without exporting the target first to compare it with the archive.
+        required: false
+        type: bool
+        default: false
+    url:
+        description:
+            - The URL of the Pi-hole instance to export from or import into.
+            - Required unless O(instances) is used. O(mode=export) requires it.
+        required: false
+        type: str
+    password:
+        description:
+            - The API password for the Pi-hole instance.
+            - Required with O(url).
+        required: false
+        type: str
+extends_documentation_fragment:
+    - sbarbett.pihole.api
+    - sbarbett.pihole.instances
+notes:
+    - The recorded checksums follow O(session_cache); with caching disabled every import is performed.
+    - Pi-hole restarts its DNS resolver after an import.
+author:
+    - Shane Barbetta (@sbarbett)
+'''
+
+EXAMPLES = r'''
+- name: Save the archive of the golden Pi-hole
+  sbarbett.pihole.teleporter:
+    mode: export
+    path: /srv/pihole/golden.zip
+    url: "https://pihole-golden.example.com"
+    password: "{{ pihole_password }}"
+
+- name: Provision new Pi-holes from the saved archive
+  sbarbett.pihole.teleporter:
+    mode: import
+    path: /srv/pihole/golden.zip
+    instances:
+      - name: "https://pihole-1.example.com"
+        password: "{{ pihole_password }}"
+      - name: "https://pihole-2.example.com"
+        password: "{{ pihole_password }}"
+
+- name: Copy groups, lists and clients from the golden Pi-hole without touching local settings
+  sbarbett.pihole.teleporter:
+    mode: import
+    source:
+      url: "https://pihole-golden.example.com"
+      password: "{{ pihole_password }}"
+    sections: [groups, lists, clients]
+    instances: "{{ pihole_hosts }}"
+'''
+
+RETURN = r'''
+checksum:
+    description: The checksum of the archive over the selected sections.
+    type: str
+    returned: always
+    sample: 3f0c5d6e9a...
+size:
+    description: Size of the archive in bytes.
+    type: int
+    returned: always
+members:
+    description: Names of the files in the archive.
+    type: list
+    elements: str
+    returned: always
+    sample: ["etc/pihole/pihole.toml", "etc/pihole/gravity.db"]
+imported:
+    description: Whether the archive was imported into the target. False when the target already matched it.
+    type: bool
+    returned: with mode import and url
+files:
+    description: The files Pi-hole reported as imported.
+    type: list
+    elements: str
+    returned: with mode import and url, when the archive was imported
+instances:
+    description:
+        - One entry per instance with O(mode=import) and O(instances), holding C(url), C(changed), C(failed), C(msg),
+          C(elapsed), RV(checksum), RV(imported) and RV(files) for that instance.
+    type: list
+    elements: dict
+    returned: when instances is used
+api_stats:
+    description:
+        - The API requests the module made, as described for O(api_stats).
+        - With O(instances) the requests of all instances added up.
+    type: dict
+    returned: when O(api_stats) is enabled
+    sample:
+        requests: 1
+        logins: 1
+        bytes_in: 184320
+        bytes_out: 0
+        total_seconds: 1.2847
+        p95_seconds: 1.2847
+        endpoints:
+            GET teleporter: {count: 1, seconds: 1.2847}
+'''
+
+import os
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.sbarbett.pihole.plugins.module_utils.api import PiholeModuleError, api_argument_spec, get_client
+from ansible_collections.sbarbett.pihole.plugins.module_utils.fanout import (
+    INSTANCES_MODULE_KWARGS,
+    instances_argument_spec,
+    run_on_instances,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.teleporter import (
+    SECTIONS,
+    archive_checksum,
+    archive_members,
+    export_archive,
+    import_archive,
+)
+from ansible_collections.sbarbett.pihole.plugins.module_utils.stats import api_stats_result
+
+try:
+    from pihole6api import PiHole6Client
+    HAS_PIHOLE6API = True
+except ImportError:
+    HAS_PIHOLE6API = False
+
+
+def read_file(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def write_file(path, data):
+    """Write the archive atomically so a failed run never leaves half an archive behind."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.teleporter-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.rename(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_archive(module, data, checksum, sections):
+    """
+    Write the archive to the path option unless the file already holds the same content.
+
+    Returns:
+        bool: Whether the file was (or in check mode would be) written
+    """
+    path = module.params['path']
+    current = read_file(path)
+    if current is not None:
+        try:
+            if archive_checksum(current, sections) == checksum:
+                return False
+        except PiholeModuleError:
+            pass
+    if not module.check_mode:
+        write_file(path, data)
+    return True
+
+
+def import_into(module, client, data, checksum, sections):
+    """
+    Import the archive into one instance unless the instance already matches it.
+
+    The instance is exported and its checksum compared with the archive's,
+    so the decision follows the instance's current state.
+
+    Returns:
+        dict: Result with 'changed', 'imported' and 'files'
+    """
+    if not module.params['force'] and archive_checksum(export_archive(client), sections) == checksum:
+        return dict(changed=False, imported=False)
+    if module.check_mode:
+        return dict(changed=True, imported=False)
+    response = import_archive(client, data, sections)
+    return dict(changed=True, imported=True, files=response.get('files', []))
+
+
+def main():
+    module_args = dict(
+        mode=dict(type='str', required=True, choices=['export', 'import']),
+        path=dict(type='path', required=False),
+        source=dict(
+            type='dict',
+            required=False,
+            options=dict(
+                url=dict(type='str', required=True, aliases=['name']),
+                password=dict(type='str', required=True, no_log=True),
+            ),
+        ),
+        sections=dict(type='list', elements='str', required=False, default=['all'], choices=['all'] + SECTIONS),
+        force=dict(type='bool', required=False, default=False),
+        url=dict(type='str', required=False),
+        password=dict(type='str', required=False, no_log=True),
+    )
+    module_args.update(api_argument_spec())
+    module_args.update(instances_argument_spec())
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+        required_if=[('mode', 'export', ['path', 'url'])],
+        **INSTANCES_MODULE_KWARGS
+    )
+
+    if not HAS_PIHOLE6API:
+        module.fail_json(msg='The pihole6api module is required')
+
+    mode = module.params['mode']
+    requested = module.params['sections']
+    sections = SECTIONS if 'all' in requested else [section for section in SECTIONS if section in requested]
+    if mode == 'import' and not module.params['path'] and not module.params['source']:
+        module.fail_json(msg="mode=import requires either 'path' or 'source'")
+
+    result = dict(changed=False)
+
+    if mode == 'export':
+        client = None
+        try:
+            client = get_client(module)
+            data = export_archive(client)
+            result.update(checksum=archive_checksum(data, sections), size=len(data), members=archive_members(data))
+            result['changed'] = save_archive(module, data, result['checksum'], sections)
+        except Exception as e:
+            module.fail_json(msg=f"Error exporting teleporter archive: {e}", **result, **api_stats_result(module))
+        finally:
+            if client is not None:
+                client.close_session()
+        module.exit_json(**result, **api_stats_result(module))
+
+    # Export the golden instance once, then import into every target
+    source = module.params['source']
+    try:
+        if source:
+            client = get_client(module, url=source['url'], password=source['password'])
+            try:
+                data = export_archive(client)
+            finally:
+                client.close_session()
+        else:
+            data = read_file(module.params['path'])
+            if data is None:
+                raise PiholeModuleError(f"Cannot read archive {module.params['path']}")
+        checksum = archive_checksum(data, sections)
+        saved = bool(source and module.params['path']) and save_archive(module, data, checksum, sections)
+    except Exception as e:
+        module.fail_json(msg=f"Error reading teleporter archive: {e}", **result, **api_stats_result(module))
+
+    def worker(client):
+        outcome = import_into(module, client, data, checksum, sections)
+        outcome.update(checksum=checksum, size=len(data), members=archive_members(data))
+        outcome['changed'] = outcome['changed'] or saved
+        return outcome
+
+    run_on_instances(module, worker, 'Error importing teleporter archive')
+
+
+if __name__ == '__main__':
+    main()